@@ -1,6 +1,26 @@
+from typing import Any, Callable
 from pydantic import BaseModel
 import os
 
+def route_value(spec: str, route: str, cast: Callable[[str], Any], fallback: Any = None) -> Any:
+    """Per-route setting from a "default,route=value" list, e.g. route_value("30,chat.stream=15", "chat.stream", float).
+
+    A route without its own value uses its prefix before the first dot ("assistant"
+    covers "assistant.stream"), then the default, then `fallback`.
+    """
+    default, routes = None, {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        if not sep:
+            if name.strip():
+                default = cast(name.strip())
+        elif name.strip():
+            routes[name.strip()] = cast(value.strip())
+    for name in (route, route.split(".", 1)[0]):
+        if name in routes:
+            return routes[name]
+    return fallback if default is None else default
+
 class Settings(BaseModel):
     # server
     host: str = os.getenv("HOST", "0.0.0.0")
@@ -18,7 +38,110 @@ class Settings(BaseModel):
     # OpenAI
     openai_api_key: str | None = os.getenv("OPENAI_API_KEY")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    openai_base_url: str | None = os.getenv("OPENAI_BASE_URL") or None  # e.g. the local stub in bench/
     openai_timeout_s: int = int(os.getenv("OPENAI_TIMEOUT_S", "90"))
 
+    # OpenAI connection pool (shared per worker)
+    openai_max_connections: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    openai_max_keepalive_connections: int = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    openai_keepalive_expiry_s: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "30"))
+    openai_http2: bool = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+
+    # upstream call policy: "default,route=value" lists; routes are chat, chat.stream, assistant,
+    # assistant.stream, apply.stream, apply.polish, session.summary ("assistant" also covers "assistant.stream")
+    upstream_timeout_s: str = os.getenv("UPSTREAM_TIMEOUT_S", os.getenv("OPENAI_TIMEOUT_S", "90"))
+    # streams: time allowed until the first chunk (0 = only the timeout above)
+    upstream_first_token_timeout_s: str = os.getenv("UPSTREAM_FIRST_TOKEN_TIMEOUT_S", "30")
+    # retries after 429/5xx, with full-jitter exponential backoff
+    upstream_retries: str = os.getenv("UPSTREAM_RETRIES", "1")
+    upstream_backoff_base_ms: float = float(os.getenv("UPSTREAM_BACKOFF_BASE_MS", "250"))
+    upstream_backoff_max_ms: float = float(os.getenv("UPSTREAM_BACKOFF_MAX_MS", "4000"))
+    # hedging (opt-in, e.g. "assistant=0.95"): duplicate a request still unanswered at this quantile of recent latency
+    upstream_hedge_quantile: str = os.getenv("UPSTREAM_HEDGE_QUANTILE", "")
+    upstream_hedge_min_delay_ms: float = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY_MS", "200"))
+    upstream_hedge_min_samples: int = int(os.getenv("UPSTREAM_HEDGE_MIN_SAMPLES", "20"))
+    upstream_hedge_window: int = int(os.getenv("UPSTREAM_HEDGE_WINDOW", "200"))
+
+    # request deadlines: seconds from the DEADLINE_HEADER request header, capped by the route's
+    # REQUEST_DEADLINE_S ("default,route=value"; routes as above plus apply, apply.batch); empty = no deadline
+    deadline_header: str = os.getenv("DEADLINE_HEADER", "X-Request-Timeout")
+    request_deadline_s: str = os.getenv("REQUEST_DEADLINE_S", "")
+    # streams end with an error frame when upstream sends nothing for this long (0 = off)
+    stream_idle_timeout_s: float = float(os.getenv("STREAM_IDLE_TIMEOUT_S", "30"))
+
+    # upstream admission control (per worker)
+    llm_max_inflight: int = int(os.getenv("LLM_MAX_INFLIGHT", "32"))
+    llm_max_queue: int = int(os.getenv("LLM_MAX_QUEUE", "64"))
+    llm_queue_timeout_s: float = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "5"))
+    llm_retry_after_s: float = float(os.getenv("LLM_RETRY_AFTER_S", "2"))
+
+    # prompt budget for the encoded project summary (approx. tokens)
+    summary_token_budget: int = int(os.getenv("SUMMARY_TOKEN_BUDGET", "1500"))
+    apply_summary_token_budget: int = int(os.getenv("APPLY_SUMMARY_TOKEN_BUDGET", "1000"))
+
+    # assistant response cache (per worker; ttl 0 disables)
+    assistant_cache_ttl_s: float = float(os.getenv("ASSISTANT_CACHE_TTL_S", "300"))
+    assistant_cache_max_entries: int = int(os.getenv("ASSISTANT_CACHE_MAX_ENTRIES", "1024"))
+
+    # answer simple transport/mixer commands ("play", "mute drums") locally instead of calling the model
+    assistant_local_intents: bool = os.getenv("ASSISTANT_LOCAL_INTENTS", "true").lower() == "true"
+
+    # SSE: merge text deltas arriving within this window into one frame (0 = off)
+    sse_flush_window_ms: float = float(os.getenv("SSE_FLUSH_WINDOW_MS", "0"))
+
+    # server-side project state (per worker, LRU)
+    project_store_max_projects: int = int(os.getenv("PROJECT_STORE_MAX_PROJECTS", "1000"))
+    project_store_max_mb: int = int(os.getenv("PROJECT_STORE_MAX_MB", "64"))
+
+    # server-side conversation sessions (per worker); history over the budget is folded into a summary
+    session_max_entries: int = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+    session_ttl_s: float = float(os.getenv("SESSION_TTL_S", "3600"))
+    session_token_budget: int = int(os.getenv("SESSION_TOKEN_BUDGET", "3000"))
+    session_summary_tokens: int = int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))
+    # rewrite the folded summary with the LLM in the background
+    session_llm_compaction: bool = os.getenv("SESSION_LLM_COMPACTION", "true").lower() == "true"
+
+    # undo/redo log of applied plans (per worker)
+    undo_log_max_entries: int = int(os.getenv("UNDO_LOG_MAX_ENTRIES", "10000"))
+    undo_log_ttl_s: float = float(os.getenv("UNDO_LOG_TTL_S", "3600"))
+
+    # apply confirmations: the LLM rewording of the deterministic message is opt-in and runs in the background
+    apply_polish: bool = os.getenv("APPLY_POLISH", "false").lower() == "true"
+    apply_polish_max_pending: int = int(os.getenv("APPLY_POLISH_MAX_PENDING", "64"))
+    apply_message_ttl_s: float = float(os.getenv("APPLY_MESSAGE_TTL_S", "600"))
+    apply_message_max_entries: int = int(os.getenv("APPLY_MESSAGE_MAX_ENTRIES", "10000"))
+
+    # Idempotency-Key / client applyId replay window for /v1/apply and /v1/apply/stream (per worker)
+    idempotency_max_entries: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    idempotency_ttl_s: float = float(os.getenv("IDEMPOTENCY_TTL_S", "600"))
+
+    # append-only journal of applies/undo/redo/confirms; empty dir disables it
+    journal_dir: str = os.getenv("JOURNAL_DIR", "")
+    journal_segment_mb: int = int(os.getenv("JOURNAL_SEGMENT_MB", "64"))
+    # group commit: at most one fdatasync per interval, covering everything queued meanwhile
+    journal_fsync_interval_ms: float = float(os.getenv("JOURNAL_FSYNC_INTERVAL_MS", "50"))
+    journal_fsync: bool = os.getenv("JOURNAL_FSYNC", "true").lower() == "true"
+    journal_queue_size: int = int(os.getenv("JOURNAL_QUEUE_SIZE", "10000"))
+
+    # /v1/apply/batch
+    apply_batch_max_items: int = int(os.getenv("APPLY_BATCH_MAX_ITEMS", "200"))
+
+    # response compression for complete (non-streaming) bodies; 0 disables
+    compress_min_bytes: int = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+    # server preference; zstd/br are used only if `zstandard`/`brotli` are installed
+    compress_encodings: list[str] = os.getenv("COMPRESS_ENCODINGS", "zstd,br,gzip").split(",")
+    compress_gzip_level: int = int(os.getenv("COMPRESS_GZIP_LEVEL", "5"))
+    compress_zstd_level: int = int(os.getenv("COMPRESS_ZSTD_LEVEL", "3"))
+    compress_brotli_quality: int = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+    # logging: records go through a bounded queue to a writer thread (full queue = drop)
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    log_max_chars: int = int(os.getenv("LOG_MAX_CHARS", "2000"))
+    # per-logger overrides, e.g. "app.routers.assistant=500,httpx=200"
+    log_limits: str = os.getenv("LOG_LIMITS", "")
+    # keep only this fraction of oversized INFO/DEBUG records, e.g. "app.routers.assistant=0.1"
+    log_sample: str = os.getenv("LOG_SAMPLE", "")
+    log_requests: bool = os.getenv("LOG_REQUESTS", "true").lower() == "true"
+
 settings = Settings()
 
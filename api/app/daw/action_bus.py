@@ -1,195 +1,585 @@
-from typing import Any, Dict, List, Literal, Tuple
+from typing import Any, Callable, Dict, List, Literal, Optional, Set, Tuple
+import re
+import time
+from .validate import VALIDATORS
+from ..metrics import dispatch_total, plan_seconds
+from .optimize import coalesce_diffs
+from .state import MISSING, resolve, split_path
+from .tempo import TempoMap
+from .timeline import Timeline, TimelineView
+from ..deadline import Deadline
 
 Mode = Literal["dryRun", "apply"]
 Diff = Dict[str, Any]  # {op, path, value}
+Result = Tuple[Dict[str, Any], List[Diff]]
+Handler = Callable[["ActionBus", Dict[str, Any], Mode], Result]
 
 def beats_to_seconds(beat: float, bpm: float, beat_unit: int = 4) -> float:
     return max(0.0, beat) * (60.0 / bpm) * (4.0 / beat_unit)
 
+# action type -> handler, filled by @handles below at import time
+HANDLERS: Dict[str, Handler] = {}
+
+def handles(*types: str):
+    def register(fn: Handler) -> Handler:
+        for t in types:
+            HANDLERS[t] = fn
+        return fn
+    return register
+
+# top-level action fields that must name an existing entity when state is known
+_REFS = (("trackId", "/tracks/"), ("clipId", "/clips/"), ("aId", "/clips/"), ("bId", "/clips/"))
+
 class ActionBus:
-    def __init__(self, project_root: str = "", bpm: float = 120.0, beat_unit: int = 4):
+    def __init__(
+        self,
+        project_root: str = "",
+        bpm: float = 120.0,
+        beat_unit: int = 4,
+        state: Optional[Dict[str, Any]] = None,
+        tempo: Optional[TempoMap] = None,
+        timeline: Optional[Timeline] = None,
+    ):
         self.project_root = project_root
         self.bpm = bpm
         self.beat_unit = beat_unit
+        # Project tempo map; `tempo` is what the current plan sees (project.setMeta may change it)
+        self.base_tempo = tempo or TempoMap.constant(bpm, beat_unit)
+        self.tempo = self.base_tempo
+        # Read-only project state (see daw.state); changes made earlier in the
+        # current plan are tracked in an overlay so the state is never mutated
+        self.state = state
+        self._overlay: Dict[str, Any] = {}
+        # Clip interval index of `state` (built on first use unless given) and
+        # this plan's clip diffs, layered over it by `clips()`
+        self._timeline = timeline
+        self._timeline_state = state if timeline is not None else None
+        self._clip_diffs: List[Diff] = []
+        self._view: Optional[TimelineView] = None
+        self._view_seen = 0
+        self._new_ids: Set[str] = set()  # clip IDs handed out in this plan
+
+    def lookup(self, path: str) -> Any:
+        """Current value at `path` including earlier actions of this plan, or MISSING."""
+        if self.state is None:
+            return MISSING
+        if self._overlay:
+            segs = split_path(path)
+            for n in range(len(segs), 0, -1):
+                prefix = "/" + "/".join(segs[:n])
+                if prefix in self._overlay:
+                    v = self._overlay[prefix]
+                    if v is MISSING or n == len(segs):
+                        return v
+                    return resolve(v, "/" + "/".join(segs[n:]))
+        return resolve(self.state, path)
+
+    def clips(self) -> Optional[TimelineView]:
+        """Clip index of the state as changed by this plan so far (None without state)."""
+        if self.state is None:
+            return None
+        if self._timeline is None or self._timeline_state is not self.state:
+            self._timeline = Timeline.from_clips(self.state.get("clips"))
+            self._timeline_state = self.state
+            self._view = None
+        if self._view is None or self._view.base is not self._timeline:
+            self._view = TimelineView(self._timeline)
+            self._view_seen = 0
+        if self._view_seen < len(self._clip_diffs):
+            self._view.apply(self._clip_diffs[self._view_seen:])
+            self._view_seen = len(self._clip_diffs)
+        return self._view
+
+    def new_clip_id(self, base: str) -> str:
+        """`base`, else `base_2`, `base_3`, ...: the first ID not used by a known clip or earlier in this plan."""
+        view = self.clips()
+        n = 1
+        while True:
+            clip_id = base if n == 1 else f"{base}_{n}"
+            if clip_id not in self._new_ids and (view is None or view.fields(clip_id) is None):
+                self._new_ids.add(clip_id)
+                return clip_id
+            n += 1
+
+    def _record(self, diffs: List[Diff]) -> None:
+        for d in diffs:
+            path = d["path"]
+            if path.startswith("/clips"):
+                self._clip_diffs.append(d)
+            if d["op"] == "remove":
+                self._overlay[path] = MISSING
+                continue
+            value = d.get("value")
+            if path.endswith("/-"):
+                if not (isinstance(value, dict) and "id" in value):
+                    continue
+                path = path[:-1] + str(value["id"])
+            self._overlay[path] = value
 
-    def execute_plan(self, plan: List[Dict[str, Any]], mode: Mode = "apply") -> Tuple[List[Dict[str, Any]], List[Diff]]:
+    def execute_plan(
+        self,
+        plan: List[Dict[str, Any]],
+        mode: Mode = "apply",
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Diff]]:
+        """Run `plan` step by step; stops at the first failed action.
+
+        With a `deadline`, raises `DeadlineExceeded` (nothing is returned, so
+        nothing gets committed) once it passes between actions.
+        """
         results: List[Dict[str, Any]] = []
         diffs: List[Diff] = []
+        t0 = time.perf_counter()
         # begin tx (call core.tx.begin if you have it)
-        failed = False
+        step = self.step
+        self._overlay = {}
+        self._clip_diffs = []
+        self._view = None
+        self._new_ids = set()
+        self.tempo = self.base_tempo
 
         for a in plan:
-            r, ds = self.dispatch(a, mode)
+            if deadline is not None:
+                deadline.check()
+            r, ds = step(a, mode)
             results.append(r)
-            if r.get("ok") and ds:
-                diffs.extend(ds)
             if not r.get("ok"):
-                failed = True
                 break
+            if ds:
+                diffs.extend(ds)
 
         # commit/rollback here as needed
+        # One last-write-wins entry per path, so clients patch each value once
+        diffs = coalesce_diffs(diffs, self.state)
+        plan_seconds.labels(mode).observe(time.perf_counter() - t0)
         return results, diffs
 
-    def dispatch(self, action: Dict[str, Any], mode: Mode) -> Tuple[Dict[str, Any], List[Diff]]:
+    def step(self, action: Dict[str, Any], mode: Mode) -> Result:
+        """Dispatch one action as the next step of the current plan.
+
+        Unlike `dispatch`, later steps see the effects of earlier ones (when
+        state is known). Used by `execute_plan` and by streamed plan previews.
+        """
+        r, ds = self.dispatch(action, mode)
+        if ds and self.state is not None and r.get("ok"):
+            self._record(ds)
+        return r, ds
+
+    def dispatch(self, action: Dict[str, Any], mode: Mode) -> Result:
+        if not isinstance(action, dict):
+            return {"ok": False, "error": "action must be an object"}, []
         t = action.get("type")
         if not t:
             return {"ok": False, "error": "missing type"}, []
-
-        # NOTE: replace all branches below with real core calls
-        if t == "project.setTitle":
-            title = str(action["title"])
-            if mode == "dryRun":
-                return {"ok": True}, [{"op": "replace", "path": "/project/title", "value": title}]
-            # core.project.setMeta(title=title)
-            return {"ok": True}, [{"op": "replace", "path": "/project/title", "value": title}]
-
-        if t == "transport.play":
-            return {"ok": True}, [{"op": "replace", "path": "/transport/playing", "value": True}]
-
-        if t == "transport.stop":
-            return {"ok": True}, [{"op": "replace", "path": "/transport/playing", "value": False}]
-
-        if t == "loop.set":
-            sb = float(action["startBeat"]) ; lb = float(action["lengthBeats"])
-            if lb <= 0: return {"ok": False, "error": "lengthBeats must be > 0"}, []
-            return {"ok": True}, [
-                {"op": "replace", "path": "/loop/startBeat", "value": sb},
-                {"op": "replace", "path": "/loop/lengthBeats", "value": lb},
-            ]
-
-        if t == "track.add":
-            name = str(action["name"])
-            color = action.get("color")
-            new_id = "t_" + name.lower().replace(" ", "_")
-            track_value: Dict[str, Any] = {"id": new_id, "name": name}
-            if color is not None:
-                track_value["color"] = str(color)
-            return {"ok": True, "meta": {"trackId": new_id}}, [
-                {"op": "add", "path": "/tracks/-", "value": track_value}
-            ]
-
-        if t == "track.rename":
-            return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/name", "value": str(action["name"])}]
-
-        if t == "track.setGain":
-            gain = float(action["gain"])  # API changed to `gain`
-            return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/gain", "value": gain}]
-        if t == "track.setColor":
-            return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/color", "value": str(action["color"])}]
-
-        if t == "fx.setParam":
-            target = action["target"]
-            track_id = str(target["trackId"]) ; unit = str(target["unit"]) ; path = str(target["path"]) 
-            value_raw = action["value"]
-            value: Any
-            if isinstance(value_raw, (int, float)):
-                value = float(value_raw)
-            elif isinstance(value_raw, str):
-                # allow string for enums like slope or type
-                value = value_raw
-            else:
-                value = bool(value_raw)
-            return {"ok": True}, [{"op": "replace", "path": f"/fx/{track_id}/{unit}/{path}", "value": value}]
-
-        if t == "fx.setParams":
-            target = action.get("target", {})
-            track_id = str(target.get("trackId", action.get("trackId", "")))
-            unit = str(target.get("unit", action.get("unit", "reverb")))
-            params = action.get("params", {})
-            diffs: List[Diff] = []
-            for key, val in params.items():
-                if isinstance(val, (int, float, bool, str)):
-                    diffs.append({"op": "replace", "path": f"/fx/{track_id}/{unit}/{key}", "value": val})
-            return {"ok": True}, diffs
-
-        if t == "fx.addUnit":
-            track_id = str(action.get("trackId") or action.get("track_id") or "")
-            unit = str(action.get("unit", "reverb"))
-            slot = action.get("slot")
-            bypass = bool(action.get("bypass", False))
-            params = action.get("params", {}) or {}
-            fx_id = "fx_" + (track_id or "") + "_" + unit
-            value: Dict[str, Any] = {"id": fx_id, "unit": unit, "bypass": bypass}
-            diffs: List[Diff] = []
-            # Add unit
-            if slot is None:
-                diffs.append({"op": "add", "path": f"/fx/{track_id}/units/-", "value": value})
-            else:
-                diffs.append({"op": "add", "path": f"/fx/{track_id}/units/{int(slot)}", "value": value})
-            # Apply initial params
-            for key, val in params.items():
-                # EQ uses full paths like eq/bands/0/type
-                if unit == "eq" and isinstance(key, str) and key.startswith("eq/"):
-                    diffs.append({"op": "replace", "path": f"/fx/{track_id}/eq/{key[3:]}", "value": val})
-                else:
-                    diffs.append({"op": "replace", "path": f"/fx/{track_id}/{unit}/{key}", "value": val})
-            return {"ok": True, "meta": {"fxId": fx_id}}, diffs
-
-        if t == "fx.setBypass":
-            track_id = str(action.get("trackId") or action.get("track_id") or "")
-            fx_id = str(action.get("fxId") or action.get("fx_id") or "")
-            bypass = bool(action.get("bypass", False))
-            path = f"/fx/{track_id}/units/{fx_id}/bypass" if fx_id else f"/fx/{track_id}/reverb/bypass"
-            return {"ok": True}, [{"op": "replace", "path": path, "value": bypass}]
-
-        if t == "fx.removeUnit":
-            track_id = str(action.get("trackId") or action.get("track_id") or "")
-            fx_id = str(action.get("fxId") or action.get("fx_id") or "")
-            if fx_id:
-                return {"ok": True}, [{"op": "remove", "path": f"/fx/{track_id}/units/{fx_id}"}]
-            # fallback: bypass default reverb
-            return {"ok": True}, [{"op": "replace", "path": f"/fx/{track_id}/reverb/bypass", "value": True}]
-
-        if t == "eq.batchSet":
-            track_id = str(action.get("trackId") or action.get("track_id") or "")
-            changes = action.get("changes", [])
-            diffs: List[Diff] = []
-            for ch in changes:
-                p = ch.get("path"); v = ch.get("value")
-                if not isinstance(p, str):
+        fn = HANDLERS.get(t)
+        if fn is None:
+            return {"ok": False, "error": f"unsupported: {t}"}, []
+        dispatch_total.labels(t).inc()
+        err = VALIDATORS[t](action)
+        if err:
+            return {"ok": False, "error": f"{t}: {err}"}, []
+        if self.state is not None:
+            for key, prefix in _REFS:
+                ref = action.get(key)
+                # only check against collections the state actually carries
+                if ref is None or self.lookup(prefix[:-1]) is MISSING:
                     continue
-                # If path already includes unit prefix, use as-is; otherwise prefix with unit
-                full_path = p if p.startswith("/") else f"/fx/{track_id}/eq/{p}"
-                diffs.append({"op": "replace", "path": full_path, "value": v})
-            return {"ok": True}, diffs
-
-        if t == "eq.addUnit":
-            track_id = str(action.get("trackId") or action.get("track_id") or "")
-            slot = action.get("slot")
-            fx_id = "fx_" + (track_id or "") + "_eq"
-            value: Dict[str, Any] = {"id": fx_id, "unit": "eq", "bypass": False}
-            if slot is None:
-                return {"ok": True, "meta": {"fxId": fx_id}}, [{"op": "add", "path": f"/fx/{track_id}/units/-", "value": value}]
-            return {"ok": True, "meta": {"fxId": fx_id}}, [{"op": "add", "path": f"/fx/{track_id}/units/{int(slot)}", "value": value}]
-
-        if t == "eq.setParam":
-            track_id = str(action.get("trackId") or action.get("track_id") or "")
-            path = str(action.get("path") or "")
-            val = action.get("value")
-            if not path:
-                return {"ok": False, "error": "missing path"}, []
-            full_path = path if path.startswith("/") else f"/fx/{track_id}/eq/{path}"
-            return {"ok": True}, [{"op": "replace", "path": full_path, "value": val}]
-
-        if t == "track.toggleMute":
-            # In real code, read current mute from core; here we just flip to True as a placeholder
-            return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/mute", "value": True}]
-
-        if t == "clip.addAudio":
-            # path checks omitted for brevity; do project-root enforcement in real code
-            start_sec = beats_to_seconds(float(action["startBeat"]), self.bpm, self.beat_unit)
-            # core.clip.add(trackId, startSeconds, path)
-            clip_id = "c_" + str(abs(hash(action["path"])) % 10_000)
-            return {"ok": True, "meta": {"clipId": clip_id}}, [
-                {"op": "add", "path": "/clips/-", "value": {
-                    "id": clip_id, "trackId": action["trackId"],
-                    "startBeat": action["startBeat"], "path": action["path"]
-                }}
-            ]
-
-        if t == "clip.move":
-            return {"ok": True}, [{"op": "replace", "path": f"/clips/{action['clipId']}/startBeat", "value": float(action["startBeat"])}]
-
-        return {"ok": False, "error": f"unsupported: {t}"}, []
+                if self.lookup(prefix + str(ref)) is MISSING:
+                    return {"ok": False, "error": f"{t}: unknown {key} {ref}"}, []
+        return fn(self, action, mode)
+
+# NOTE: handlers below emit diffs only; replace with real core calls
+
+def _track_id(action: Dict[str, Any]) -> str:
+    target = action.get("target") or {}
+    return str(target.get("trackId") or action.get("trackId") or action.get("track_id") or "")
+
+def _fx_id(action: Dict[str, Any]) -> str:
+    target = action.get("target") or {}
+    return str(target.get("fxId") or action.get("fxId") or action.get("fx_id") or "")
+
+# --- project / transport ---
+
+@handles("project.setTitle")
+def _project_set_title(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    # core.project.setMeta(title=title) when mode == "apply"
+    return {"ok": True}, [{"op": "replace", "path": "/project/title", "value": str(action["title"])}]
+
+@handles("project.setMeta")
+def _project_set_meta(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    diffs: List[Diff] = []
+    if "title" in action:
+        diffs.append({"op": "replace", "path": "/project/title", "value": str(action["title"])})
+    result: Dict[str, Any] = {"ok": True}
+    if "tempo" in action:
+        tempo = float(action["tempo"])
+        if tempo <= 0:
+            return {"ok": False, "error": "project.setMeta: tempo must be > 0"}, []
+        diffs.append({"op": "replace", "path": "/project/tempo", "value": tempo})
+        if len(bus.tempo) > 1 or isinstance(bus.lookup("/tempoMap"), list):
+            # a project tempo replaces the tempo map
+            diffs.append({"op": "replace", "path": "/tempoMap", "value": [{"beat": 0.0, "bpm": tempo}]})
+        bus.tempo = TempoMap.constant(tempo, bus.beat_unit)
+        view = bus.clips()
+        if view is not None and isinstance(bus.lookup("/clips"), list):
+            # where every known clip (as changed by earlier actions of this plan) now sits in time
+            result["meta"] = {"clipSeconds": bus.tempo.clip_spans(dict(f, id=cid) for cid, f in view.items())}
+    if not diffs:
+        return {"ok": False, "error": "project.setMeta: nothing to set"}, []
+    return result, diffs
+
+@handles("project.save")
+def _project_save(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    # core.project.save(path) when mode == "apply"; no state change to report
+    return {"ok": True, "meta": {"path": action.get("path")}}, []
+
+@handles("project.open")
+def _project_open(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    # path checks omitted for brevity; do project-root enforcement in real code
+    return {"ok": True}, [{"op": "replace", "path": "/project/path", "value": str(action["path"])}]
+
+@handles("transport.play")
+def _transport_play(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": "/transport/playing", "value": True}]
+
+@handles("transport.stop")
+def _transport_stop(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": "/transport/playing", "value": False}]
+
+@handles("transport.set")
+def _transport_set(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": "/transport/beat", "value": float(action["beat"])}]
+
+@handles("loop.set")
+def _loop_set(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    sb = float(action["startBeat"]) ; lb = float(action["lengthBeats"])
+    return {"ok": True}, [
+        {"op": "replace", "path": "/loop/startBeat", "value": sb},
+        {"op": "replace", "path": "/loop/lengthBeats", "value": lb},
+    ]
+
+# --- tracks ---
+
+@handles("track.add")
+def _track_add(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    name = str(action["name"])
+    color = action.get("color")
+    new_id = "t_" + name.lower().replace(" ", "_")
+    track_value: Dict[str, Any] = {"id": new_id, "name": name}
+    if color is not None:
+        track_value["color"] = str(color)
+    return {"ok": True, "meta": {"trackId": new_id}}, [
+        {"op": "add", "path": "/tracks/-", "value": track_value}
+    ]
+
+@handles("track.delete")
+def _track_delete(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "remove", "path": f"/tracks/{action['trackId']}"}]
+
+@handles("track.rename")
+def _track_rename(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/name", "value": str(action["name"])}]
+
+@handles("track.setGain")
+def _track_set_gain(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    gain = float(action["gain"])  # API changed to `gain`
+    return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/gain", "value": gain}]
+
+@handles("track.setColor")
+def _track_set_color(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": f"/tracks/{action['trackId']}/color", "value": str(action["color"])}]
+
+@handles("track.toggleMute")
+def _track_toggle_mute(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    path = f"/tracks/{action['trackId']}/mute"
+    # Without known state there is nothing to flip; assume unmuted
+    current = bus.lookup(path)
+    return {"ok": True}, [{"op": "replace", "path": path, "value": not (current is not MISSING and bool(current))}]
+
+@handles("tracks.setActive")
+def _tracks_set_active(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    ids = [str(i) for i in action["ids"]]
+    return {"ok": True}, [{"op": "replace", "path": "/selection/trackIds", "value": ids}]
+
+# --- fx / eq ---
+
+@handles("fx.setParam")
+def _fx_set_param(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    target = action["target"]
+    track_id = str(target["trackId"]) ; unit = str(target["unit"]) ; path = str(target["path"])
+    value_raw = action["value"]
+    value: Any
+    if isinstance(value_raw, (int, float)) and not isinstance(value_raw, bool):
+        value = float(value_raw)
+    elif isinstance(value_raw, str):
+        # allow string for enums like slope or type
+        value = value_raw
+    else:
+        value = bool(value_raw)
+    return {"ok": True}, [{"op": "replace", "path": f"/fx/{track_id}/{unit}/{path}", "value": value}]
+
+@handles("fx.setParams")
+def _fx_set_params(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    target = action.get("target", {})
+    track_id = str(target.get("trackId", action.get("trackId", "")))
+    unit = str(target.get("unit", action.get("unit", "reverb")))
+    params = action.get("params", {})
+    diffs: List[Diff] = []
+    for key, val in params.items():
+        if isinstance(val, (int, float, bool, str)):
+            diffs.append({"op": "replace", "path": f"/fx/{track_id}/{unit}/{key}", "value": val})
+    return {"ok": True}, diffs
+
+@handles("fx.addUnit")
+def _fx_add_unit(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    track_id = _track_id(action)
+    unit = str(action.get("unit", "reverb"))
+    slot = action.get("slot")
+    bypass = bool(action.get("bypass", False))
+    params = action.get("params", {}) or {}
+    fx_id = "fx_" + (track_id or "") + "_" + unit
+    value: Dict[str, Any] = {"id": fx_id, "unit": unit, "bypass": bypass}
+    diffs: List[Diff] = []
+    # Add unit
+    if slot is None:
+        diffs.append({"op": "add", "path": f"/fx/{track_id}/units/-", "value": value})
+    else:
+        diffs.append({"op": "add", "path": f"/fx/{track_id}/units/{int(slot)}", "value": value})
+    # Apply initial params
+    for key, val in params.items():
+        # EQ uses full paths like eq/bands/0/type
+        if unit == "eq" and isinstance(key, str) and key.startswith("eq/"):
+            diffs.append({"op": "replace", "path": f"/fx/{track_id}/eq/{key[3:]}", "value": val})
+        else:
+            diffs.append({"op": "replace", "path": f"/fx/{track_id}/{unit}/{key}", "value": val})
+    return {"ok": True, "meta": {"fxId": fx_id}}, diffs
+
+@handles("fx.setBypass")
+def _fx_set_bypass(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    track_id = _track_id(action)
+    fx_id = _fx_id(action)
+    unit = str((action.get("target") or {}).get("unit") or "reverb")
+    bypass = bool(action.get("bypass", False))
+    path = f"/fx/{track_id}/units/{fx_id}/bypass" if fx_id else f"/fx/{track_id}/{unit}/bypass"
+    return {"ok": True}, [{"op": "replace", "path": path, "value": bypass}]
+
+@handles("fx.removeUnit")
+def _fx_remove_unit(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    track_id = _track_id(action)
+    fx_id = _fx_id(action)
+    if fx_id:
+        return {"ok": True}, [{"op": "remove", "path": f"/fx/{track_id}/units/{fx_id}"}]
+    # fallback: bypass the named (or default reverb) unit
+    unit = str(action.get("unit") or "reverb")
+    return {"ok": True}, [{"op": "replace", "path": f"/fx/{track_id}/{unit}/bypass", "value": True}]
+
+@handles("eq.batchSet")
+def _eq_batch_set(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    track_id = _track_id(action)
+    changes = action.get("changes", [])
+    diffs: List[Diff] = []
+    for ch in changes:
+        p = ch.get("path"); v = ch.get("value")
+        if not isinstance(p, str):
+            continue
+        # If path already includes unit prefix, use as-is; otherwise prefix with unit
+        full_path = p if p.startswith("/") else f"/fx/{track_id}/eq/{p}"
+        diffs.append({"op": "replace", "path": full_path, "value": v})
+    return {"ok": True}, diffs
+
+@handles("eq.addUnit")
+def _eq_add_unit(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    track_id = _track_id(action)
+    slot = action.get("slot")
+    fx_id = "fx_" + (track_id or "") + "_eq"
+    value: Dict[str, Any] = {"id": fx_id, "unit": "eq", "bypass": False}
+    if slot is None:
+        return {"ok": True, "meta": {"fxId": fx_id}}, [{"op": "add", "path": f"/fx/{track_id}/units/-", "value": value}]
+    return {"ok": True, "meta": {"fxId": fx_id}}, [{"op": "add", "path": f"/fx/{track_id}/units/{int(slot)}", "value": value}]
+
+@handles("eq.setParam")
+def _eq_set_param(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    track_id = _track_id(action)
+    path = str(action.get("path") or "")
+    val = action.get("value")
+    if not path:
+        return {"ok": False, "error": "missing path"}, []
+    full_path = path if path.startswith("/") else f"/fx/{track_id}/eq/{path}"
+    return {"ok": True}, [{"op": "replace", "path": full_path, "value": val}]
+
+# --- clips ---
+
+def _overlaps(bus: ActionBus, clip_id: str, track: Any, start: float, end: float) -> Dict[str, Any]:
+    """`{"overlaps": [...]}` naming other clips on `track` that [start, end) overlaps, if any."""
+    view = bus.clips()
+    if view is None or track is None:
+        return {}
+    ids = view.overlapping(str(track), start, end, exclude=clip_id)
+    return {"overlaps": ids} if ids else {}
+
+def _file_stem(path: Any) -> str:
+    """Lowercase file name without extension, reduced to [a-z0-9_], for readable clip IDs."""
+    name = str(path).replace("\\", "/").rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "audio"
+
+@handles("clip.addAudio")
+def _clip_add_audio(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    # path checks omitted for brevity; do project-root enforcement in real code
+    start = float(action["startBeat"])
+    start_sec = bus.tempo.seconds(start)
+    # core.clip.add(trackId, startSeconds, path)
+    clip_id = bus.new_clip_id("c_" + _file_stem(action["path"]))
+    meta = {"clipId": clip_id, "startSeconds": start_sec, **_overlaps(bus, clip_id, action["trackId"], start, start)}
+    return {"ok": True, "meta": meta}, [
+        {"op": "add", "path": "/clips/-", "value": {
+            "id": clip_id, "trackId": action["trackId"],
+            "startBeat": action["startBeat"], "path": action["path"]
+        }}
+    ]
+
+@handles("clip.move")
+def _clip_move(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    clip_id, start = str(action["clipId"]), float(action["startBeat"])
+    meta: Dict[str, Any] = {"startSeconds": bus.tempo.seconds(start)}
+    view = bus.clips()
+    span = view.span(clip_id) if view is not None else None
+    if span is not None:
+        meta.update(_overlaps(bus, clip_id, span[0], start, start + span[2] - span[1]))
+    return {"ok": True, "meta": meta}, [{"op": "replace", "path": f"/clips/{clip_id}/startBeat", "value": start}]
+
+@handles("clip.delete")
+def _clip_delete(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "remove", "path": f"/clips/{action['clipId']}"}]
+
+@handles("clips.deleteMany")
+def _clips_delete_many(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "remove", "path": f"/clips/{cid}"} for cid in action["ids"]]
+
+@handles("clip.duplicate")
+def _clip_duplicate(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    src = str(action["clipId"])
+    new_id = bus.new_clip_id(src + "_dup")
+    return {"ok": True, "meta": {"clipId": new_id}}, [
+        {"op": "add", "path": "/clips/-", "value": {"id": new_id, "sourceId": src}}
+    ]
+
+@handles("clip.splitAtBeat")
+def _clip_split_at_beat(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    src = str(action["clipId"])
+    beat = float(action["beat"])
+    diffs: List[Diff] = []
+    view = bus.clips()
+    span = view.span(src) if view is not None else None
+    if span is not None and span[2] > span[1] and not span[1] < beat < span[2]:
+        return {"ok": False, "error": f"clip.splitAtBeat: beat {beat:g} is outside clip {src} ({span[1]:g}-{span[2]:g})"}, []
+    new_id = bus.new_clip_id(src + "_r")
+    value: Dict[str, Any] = {"id": new_id, "sourceId": src, "startBeat": beat}
+    if span is not None and span[2] > span[1]:
+        track, start, end = span
+        # left part keeps the clip, the right part becomes the new one
+        value.update({"trackId": track, "lengthBeats": end - beat})
+        diffs.append({"op": "replace", "path": f"/clips/{src}/lengthBeats", "value": beat - start})
+    diffs.append({"op": "add", "path": "/clips/-", "value": value})
+    return {"ok": True, "meta": {"clipId": new_id}}, diffs
+
+@handles("clip.rename")
+def _clip_rename(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": f"/clips/{action['clipId']}/name", "value": str(action["name"])}]
+
+@handles("clip.setLayer")
+def _clip_set_layer(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "replace", "path": f"/clips/{action['clipId']}/layer", "value": int(action["layer"])}]
+
+@handles("clip.setBounds")
+def _clip_set_bounds(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    clip_id = action["clipId"]
+    diffs: List[Diff] = []
+    for key in ("startBeat", "lengthBeats", "fileOffsetSeconds"):
+        if key in action:
+            diffs.append({"op": "replace", "path": f"/clips/{clip_id}/{key}", "value": float(action[key])})
+    if not diffs:
+        return {"ok": False, "error": "clip.setBounds: nothing to set"}, []
+    if action.get("lengthBeats", 1) <= 0:
+        return {"ok": False, "error": "lengthBeats must be > 0"}, []
+    if action.get("startBeat", 0) < 0 or action.get("fileOffsetSeconds", 0) < 0:
+        return {"ok": False, "error": "startBeat and fileOffsetSeconds must be >= 0"}, []
+    result: Dict[str, Any] = {"ok": True}
+    view = bus.clips()
+    current = (view.fields(str(clip_id)) if view is not None else None) or {}
+    start = action.get("startBeat", current.get("startBeat"))
+    if isinstance(start, (int, float)):
+        length = action.get("lengthBeats", current.get("lengthBeats"))
+        meta = {"startSeconds": bus.tempo.seconds(float(start))}
+        if isinstance(length, (int, float)):
+            end = float(start) + float(length)
+            meta["endSeconds"] = bus.tempo.seconds(end)
+            meta.update(_overlaps(bus, str(clip_id), current.get("trackId"), float(start), end))
+        result["meta"] = meta
+    return result, diffs
+
+@handles("clip.setGainPan")
+def _clip_set_gain_pan(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    clip_id = action["clipId"]
+    diffs: List[Diff] = []
+    if "gain" in action:
+        diffs.append({"op": "replace", "path": f"/clips/{clip_id}/gain", "value": float(action["gain"])})
+    if "pan01" in action:
+        pan = float(action["pan01"])
+        if not 0.0 <= pan <= 1.0:
+            return {"ok": False, "error": "pan01 must be within [0, 1]"}, []
+        diffs.append({"op": "replace", "path": f"/clips/{clip_id}/pan01", "value": pan})
+    if not diffs:
+        return {"ok": False, "error": "clip.setGainPan: nothing to set"}, []
+    return {"ok": True}, diffs
+
+# --- crossfades ---
+
+@handles("xf.createOverlap")
+def _xf_create_overlap(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    a_id = str(action["aId"]) ; b_id = str(action["bId"])
+    if a_id == b_id:
+        return {"ok": False, "error": "aId and bId must differ"}, []
+    xf_id = f"xf_{a_id}_{b_id}"
+    value: Dict[str, Any] = {"id": xf_id, "aId": a_id, "bId": b_id}
+    if action.get("trackId") is not None:
+        value["trackId"] = str(action["trackId"])
+    meta: Dict[str, Any] = {"xfId": xf_id}
+    view = bus.clips()
+    a = view.span(a_id) if view is not None else None
+    b = view.span(b_id) if view is not None else None
+    if a is not None and b is not None and a[2] > a[1] and b[2] > b[1]:
+        if a[0] != b[0] or value.get("trackId", a[0]) != a[0]:
+            return {"ok": False, "error": f"xf.createOverlap: {a_id} and {b_id} are not on the same track"}, []
+        start, end = max(a[1], b[1]), min(a[2], b[2])
+        if end <= start:
+            return {"ok": False, "error": f"xf.createOverlap: {a_id} and {b_id} do not overlap"}, []
+        # the crossfade covers the overlap
+        value.update({"trackId": a[0], "startBeats": start, "lengthBeats": end - start})
+        meta.update({"startBeats": start, "lengthBeats": end - start})
+    return {"ok": True, "meta": meta}, [{"op": "add", "path": "/crossfades/-", "value": value}]
 
+@handles("xf.update")
+def _xf_update(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    xf_id = action["id"]
+    diffs: List[Diff] = []
+    for key in ("startBeats", "lengthBeats"):
+        if key in action:
+            diffs.append({"op": "replace", "path": f"/crossfades/{xf_id}/{key}", "value": float(action[key])})
+    if "curve" in action:
+        diffs.append({"op": "replace", "path": f"/crossfades/{xf_id}/curve", "value": action["curve"]})
+    if not diffs:
+        return {"ok": False, "error": "xf.update: nothing to set"}, []
+    if action.get("lengthBeats", 1) <= 0:
+        return {"ok": False, "error": "lengthBeats must be > 0"}, []
+    result: Dict[str, Any] = {"ok": True}
+    start = action.get("startBeats", bus.lookup(f"/crossfades/{xf_id}/startBeats"))
+    length = action.get("lengthBeats", bus.lookup(f"/crossfades/{xf_id}/lengthBeats"))
+    if isinstance(start, (int, float)) and isinstance(length, (int, float)):
+        # at tempo changes a crossfade's length in seconds depends on where it starts
+        begin = bus.tempo.seconds(float(start))
+        result["meta"] = {"startSeconds": begin, "lengthSeconds": bus.tempo.seconds(float(start) + float(length)) - begin}
+    return result, diffs
 
+@handles("xf.remove")
+def _xf_remove(bus: ActionBus, action: Dict[str, Any], mode: Mode) -> Result:
+    return {"ok": True}, [{"op": "remove", "path": f"/crossfades/{action['id']}"}]
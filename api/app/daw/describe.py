@@ -0,0 +1,126 @@
+"""Deterministic one-line descriptions of plans, e.g. for apply confirmations.
+
+One phrase template per action type (future and past tense); see `PHRASES`.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+Phrase = Union[Tuple[str, str], Callable[[Dict[str, Any], bool], str]]
+
+def _num(v: Any) -> str:
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return str(v)
+    return str(int(v)) if float(v).is_integer() else f"{v:g}"
+
+def _set_meta(f: Dict[str, Any], past: bool) -> str:
+    parts = []
+    if "title" in f:
+        parts.append(f"the title to '{f['title']}'")
+    if "tempo" in f:
+        parts.append(f"the tempo to {f['tempo']} BPM")
+    return "set " + (" and ".join(parts) or "project details")
+
+def _set_bypass(f: Dict[str, Any], past: bool) -> str:
+    if f.get("bypass") in (True, "True"):
+        return ("bypassed" if past else "bypass") + f" the {f['unit']} on track {f['track']}"
+    return ("re-enabled" if past else "re-enable") + f" the {f['unit']} on track {f['track']}"
+
+def _set_gain_pan(f: Dict[str, Any], past: bool) -> str:
+    parts = []
+    if "gain" in f:
+        parts.append(f"gain to {f['gain']} dB")
+    if "pan01" in f:
+        parts.append(f"pan to {f['pan01']}")
+    return f"set clip {f['clip']} " + (" and ".join(parts) or "gain/pan")
+
+# action type -> (future, past) template over the fields from `_fields`, or a function
+PHRASES: Dict[str, Phrase] = {
+    "project.setTitle": ("set the project title to '{title}'", "set the project title to '{title}'"),
+    "project.setMeta": _set_meta,
+    "project.save": ("save the project", "saved the project"),
+    "project.open": ("open project '{path}'", "opened project '{path}'"),
+    "transport.play": ("start playback", "started playback"),
+    "transport.stop": ("stop playback", "stopped playback"),
+    "transport.set": ("move the playhead to beat {beat}", "moved the playhead to beat {beat}"),
+    "loop.set": ("loop {lengthBeats} beats from beat {startBeat}", "set a {lengthBeats}-beat loop from beat {startBeat}"),
+    "track.add": ("add track '{name}'", "added track '{name}'"),
+    "track.delete": ("delete track {track}", "deleted track {track}"),
+    "track.rename": ("rename track {track} to '{name}'", "renamed track {track} to '{name}'"),
+    "track.setGain": ("set the gain of track {track} to {gain} dB", "set the gain of track {track} to {gain} dB"),
+    "track.setColor": ("set the color of track {track} to {color}", "set the color of track {track} to {color}"),
+    "track.toggleMute": ("toggle mute on track {track}", "toggled mute on track {track}"),
+    "tracks.setActive": ("select {count} track{s}", "selected {count} track{s}"),
+    "fx.setParam": ("set the {unit} {path} on track {track} to {value}", "set the {unit} {path} on track {track} to {value}"),
+    "fx.setParams": ("update {count} {unit} setting{s} on track {track}", "updated {count} {unit} setting{s} on track {track}"),
+    "fx.addUnit": ("add a {unit} to track {track}", "added a {unit} to track {track}"),
+    "fx.setBypass": _set_bypass,
+    "fx.removeUnit": ("remove the {unit} from track {track}", "removed the {unit} from track {track}"),
+    "eq.batchSet": ("adjust {count} EQ setting{s} on track {track}", "adjusted {count} EQ setting{s} on track {track}"),
+    "eq.addUnit": ("add an EQ to track {track}", "added an EQ to track {track}"),
+    "eq.setParam": ("set EQ {path} on track {track} to {value}", "set EQ {path} on track {track} to {value}"),
+    "clip.addAudio": ("add '{path}' to track {track} at beat {startBeat}", "added '{path}' to track {track} at beat {startBeat}"),
+    "clip.move": ("move clip {clip} to beat {startBeat}", "moved clip {clip} to beat {startBeat}"),
+    "clip.delete": ("delete clip {clip}", "deleted clip {clip}"),
+    "clips.deleteMany": ("delete {count} clip{s}", "deleted {count} clip{s}"),
+    "clip.duplicate": ("duplicate clip {clip}", "duplicated clip {clip}"),
+    "clip.splitAtBeat": ("split clip {clip} at beat {beat}", "split clip {clip} at beat {beat}"),
+    "clip.rename": ("rename clip {clip} to '{name}'", "renamed clip {clip} to '{name}'"),
+    "clip.setLayer": ("move clip {clip} to layer {layer}", "moved clip {clip} to layer {layer}"),
+    "clip.setBounds": ("trim clip {clip}", "trimmed clip {clip}"),
+    "clip.setGainPan": _set_gain_pan,
+    "xf.createOverlap": ("crossfade clips {aId} and {bId}", "crossfaded clips {aId} and {bId}"),
+    "xf.update": ("update crossfade {id}", "updated crossfade {id}"),
+    "xf.remove": ("remove crossfade {id}", "removed crossfade {id}"),
+}
+
+class _Fields(dict):
+    def __missing__(self, key: str) -> str:
+        return "?"
+
+def _names(summary: Optional[Dict[str, Any]], key: str) -> Dict[str, str]:
+    items = (summary or {}).get(key)
+    if not isinstance(items, list):
+        return {}
+    return {str(x["id"]): str(x["name"]) for x in items if isinstance(x, dict) and "id" in x and x.get("name")}
+
+def _fields(a: Dict[str, Any], tracks: Dict[str, str], clips: Dict[str, str]) -> _Fields:
+    f = _Fields()
+    target = a.get("target")
+    for src in (a, target if isinstance(target, dict) else {}):
+        for k, v in src.items():
+            if not isinstance(v, (dict, list)):
+                f[k] = _num(v)
+    items = a.get("ids") or a.get("changes") or a.get("params")
+    if isinstance(items, (list, dict)):
+        f["count"] = len(items)
+        f["s"] = "" if len(items) == 1 else "s"
+    f.setdefault("unit", "eq" if str(a.get("type", "")).startswith("eq.") else "effect")
+    if "trackId" in f:
+        f["track"] = f"'{tracks[f['trackId']]}'" if f["trackId"] in tracks else f["trackId"]
+    if "clipId" in f:
+        f["clip"] = f"'{clips[f['clipId']]}'" if f["clipId"] in clips else f["clipId"]
+    return f
+
+def describe_actions(plan: List[Dict[str, Any]], past: bool = True, summary: Optional[Dict[str, Any]] = None) -> List[str]:
+    """One phrase per action; track/clip IDs are replaced by names found in `summary`."""
+    tracks, clips = _names(summary, "tracks"), _names(summary, "clips")
+    out: List[str] = []
+    for a in plan:
+        if not isinstance(a, dict):
+            continue
+        phrase = PHRASES.get(a.get("type"))
+        if phrase is None:
+            continue
+        f = _fields(a, tracks, clips)
+        out.append(phrase(f, past) if callable(phrase) else phrase[past].format_map(f))
+    return out
+
+def describe_plan(plan: List[Dict[str, Any]], past: bool = True, summary: Optional[Dict[str, Any]] = None, limit: int = 6) -> str:
+    """"Renamed track 'Bass' to 'Sub', then started playback." (past) or "rename ..., then ..." (future)."""
+    parts = describe_actions(plan, past, summary)
+    if not parts:
+        return ""
+    more = len(parts) - limit
+    if more > 0:
+        parts = parts[:limit] + [f"{more} more change{'s' if more > 1 else ''}"]
+    text = ", then ".join(parts)
+    return text[0].upper() + text[1:] + "."
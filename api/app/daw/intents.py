@@ -0,0 +1,154 @@
+"""Local recognizer for simple transport/mixer commands, so they skip the model.
+
+`match_intent` turns prompts like "play", "loop bars 9-16", "mute drums" or
+"rename track t_bass to Bass" into a plan (or a short text reply when there is
+nothing to do), resolving tracks by ID or name from `project_summary`. It only
+emits `SAFE_ACTIONS` and only when the whole prompt matches one command and
+every track reference resolves to exactly one track; anything else returns
+None and goes to the model.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import re
+
+# Plans made only of these (and short) may be applied without a confirmation step
+SAFE_ACTIONS = frozenset({
+    "transport.play", "transport.stop", "loop.set",
+    "track.rename", "track.toggleMute", "track.setGain", "project.setTitle",
+})
+
+Outcome = Dict[str, Any]  # {"type":"plan","plan"} or {"type":"text","content"}
+
+_FILLER = re.compile(r"^(?:please|can you|could you|hey)\s+|\s+(?:please|now|thanks)$", re.I)
+_QUOTES = "'\"“”‘’`"
+_NUM = r"(-?\d+(?:\.\d+)?)"
+
+def _clean(prompt: str) -> str:
+    text = " ".join(prompt.split()).rstrip(".!?")
+    prev = None
+    while prev != text:
+        prev, text = text, _FILLER.sub("", text).strip()
+    return text
+
+def _unquote(s: str) -> str:
+    return s.strip().strip(_QUOTES).strip()
+
+def _tracks(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    tracks = summary.get("tracks")
+    return [t for t in tracks if isinstance(t, dict) and "id" in t] if isinstance(tracks, list) else []
+
+def resolve_track(ref: str, summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The single track whose ID or name is `ref` (case-insensitive, plural 's' tolerated)."""
+    ref = _unquote(ref)
+    tracks = _tracks(summary)
+    for t in tracks:
+        if str(t["id"]) == ref:
+            return t
+    key = ref.lower()
+    if key.startswith("the "):
+        key = key[4:]
+    if key.endswith(" track"):
+        key = key[:-6]
+    forms = {key, key[:-1] if key.endswith("s") else key + "s"}
+    hits = [t for t in tracks if str(t["id"]).lower() == key or str(t.get("name", "")).strip().lower() in forms]
+    return hits[0] if len(hits) == 1 else None
+
+def _beats_per_bar(summary: Dict[str, Any]) -> float:
+    ts = summary.get("timeSig")
+    n = ts.get("numerator", 4) if isinstance(ts, dict) else 4
+    return float(n) if isinstance(n, (int, float)) and n > 0 else 4.0
+
+def _plan(*actions: Dict[str, Any]) -> Outcome:
+    return {"type": "plan", "plan": list(actions)}
+
+def _play(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    return _plan({"type": "transport.play"})
+
+def _stop(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    return _plan({"type": "transport.stop"})
+
+def _loop_bars(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    first, last = int(m.group(1)), int(m.group(2) or m.group(1))
+    if first < 1 or last < first:
+        return None
+    bar = _beats_per_bar(summary)
+    return _plan({"type": "loop.set", "startBeat": (first - 1) * bar, "lengthBeats": (last - first + 1) * bar})
+
+def _loop_count(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    count, first = int(m.group(1)), int(m.group(2) or 1)
+    if count < 1 or first < 1:
+        return None
+    bar = _beats_per_bar(summary)
+    return _plan({"type": "loop.set", "startBeat": (first - 1) * bar, "lengthBeats": count * bar})
+
+def _loop_beats(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    start, end = float(m.group(1)), float(m.group(2))
+    if start < 0 or end <= start:
+        return None
+    return _plan({"type": "loop.set", "startBeat": start, "lengthBeats": end - start})
+
+def _mute(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    track = resolve_track(m.group(2), summary)
+    if track is None:
+        return None
+    want = not m.group(1)
+    current = track.get("mute")
+    if current is None and not want:
+        # toggleMute assumes unmuted when the state is unknown; let the model handle it
+        return None
+    if bool(current) == want:
+        return {"type": "text", "content": f"Track '{track.get('name', track['id'])}' is already {'muted' if want else 'unmuted'}."}
+    return _plan({"type": "track.toggleMute", "trackId": track["id"]})
+
+def _rename(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    track, name = resolve_track(m.group(1), summary), _unquote(m.group(2))
+    if track is None or not name:
+        return None
+    return _plan({"type": "track.rename", "trackId": track["id"], "name": name})
+
+# A bare number is only taken as dB in the usual fader range ("volume to 80" is likely a
+# percentage); with a dB unit the wider range is accepted. Anything else goes to the model.
+_GAIN_BARE_DB = (-60.0, 12.0)
+_GAIN_DB = (-96.0, 24.0)
+
+def _gain(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    gain = float(m.group("gain"))
+    low, high = _GAIN_DB if m.group("unit") else _GAIN_BARE_DB
+    if not low <= gain <= high:
+        return None
+    track = resolve_track(m.group("track"), summary)
+    if track is None:
+        return None
+    return _plan({"type": "track.setGain", "trackId": track["id"], "gain": gain})
+
+def _title(m: "re.Match", summary: Dict[str, Any]) -> Optional[Outcome]:
+    title = _unquote(m.group(1))
+    return _plan({"type": "project.setTitle", "title": title}) if title else None
+
+_DB = r"\s*(?P<unit>db|decibels?)?"
+
+# (intent, full-match pattern, builder); first match wins, so more specific patterns go first
+_RULES: List[Tuple[str, "re.Pattern", Callable[["re.Match", Dict[str, Any]], Optional[Outcome]]]] = [
+    ("play", re.compile(r"(?:play|start(?: playback| playing)?|resume)(?: it| the song| the project)?", re.I), _play),
+    ("stop", re.compile(r"(?:stop|pause|halt)(?: playback| playing)?(?: it)?", re.I), _stop),
+    ("loop", re.compile(r"loop (?:bars?|measures?) (\d+)(?:\s*(?:-|–|to|through)\s*(\d+))?", re.I), _loop_bars),
+    ("loop", re.compile(r"loop (?:the )?(?:first )?(\d+) (?:bars|measures)(?: (?:from|starting at) (?:bar|measure) (\d+))?", re.I), _loop_count),
+    ("loop", re.compile(r"loop beats? " + _NUM + r"\s*(?:-|–|to)\s*" + _NUM, re.I), _loop_beats),
+    ("title", re.compile(r"(?:set (?:the )?(?:project )?title to|rename (?:the )?project to|call (?:the|this) project) (.+)", re.I), _title),
+    ("mute", re.compile(r"(un)?mute (.+)", re.I), _mute),
+    ("rename", re.compile(r"rename (?:track )?(.+?) to (.+)", re.I), _rename),
+    ("gain", re.compile(r"(?:set )?(?:the )?(?:gain|volume|level) (?:of|on|for) (?P<track>.+?) to " + "(?P<gain>-?\\d+(?:\\.\\d+)?)" + _DB, re.I), _gain),
+    ("gain", re.compile(r"(?:set )?(?P<track>.+?)(?:'s)? (?:gain|volume|level) (?:to )?" + "(?P<gain>-?\\d+(?:\\.\\d+)?)" + _DB, re.I), _gain),
+]
+
+def match_intent(prompt: str, project_summary: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Outcome]]:
+    """(intent name, outcome) for a recognized command, else None."""
+    text = _clean(prompt)
+    if not text or len(text) > 200:
+        return None
+    summary = project_summary or {}
+    for name, pattern, build in _RULES:
+        m = pattern.fullmatch(text)
+        if m is not None:
+            outcome = build(m, summary)
+            return (name, outcome) if outcome is not None else None
+    return None
@@ -0,0 +1,189 @@
+"""Plan and diff optimizations that keep the final project state unchanged.
+
+`coalesce_diffs` collapses a diff list so each JSON Pointer path keeps only its
+last write, and drops writes that do not change the known state.
+`optimize_plan` rewrites a validated plan: repeated setters collapse to the
+last one and per-parameter fx/eq sets fold into `fx.setParams` / `eq.batchSet`.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from .state import MISSING, resolve
+
+Diff = Dict[str, Any]
+
+def _positional(path: str) -> bool:
+    return any(seg.isdigit() or seg == "-" for seg in path[1:].split("/"))
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    return type(a) is type(b) and a == b
+
+def coalesce_diffs(diffs: List[Diff], state: Optional[Dict[str, Any]] = None) -> List[Diff]:
+    """Last-write-wins per path; with `state`, also drop writes that are no-ops against it.
+
+    A replace (or remove) of a path makes earlier writes at or below that path
+    dead. List elements are assumed to be objects, addressed by `id` or index.
+    """
+    if len(diffs) < 2 and state is None:
+        return diffs
+    # Walk backwards: a diff is dead if a later write replaced or removed its path or an ancestor
+    killers = set()
+    kept: List[Diff] = []
+    for d in reversed(diffs):
+        path = d["path"]
+        op = d.get("op")
+        cut = path.rfind("/")
+        last = path[cut + 1:]
+        structural = op == "remove" or (op == "add" and (last == "-" or last.isdigit()))
+        value = d.get("value")
+        # Writing an object whose id differs from the segment may re-point `path` itself
+        renames = isinstance(value, dict) and value.get("id") != last
+        # so for those (and inserts/removes) only a write to an ancestor hides this diff
+        p = path[:cut] if structural or renames else path
+        while p:
+            if p in killers:
+                break
+            p = p[:p.rfind("/")]
+        if p:
+            continue
+        kept.append(d)
+        if structural or isinstance(value, dict):
+            # Inserts, removes and whole-element writes can change which element a
+            # sibling path (`/clips/3`, `/clips/c_1`) names, so later writes under
+            # this parent no longer hide earlier ones
+            parent = path[:cut + 1]
+            for k in [k for k in killers if k.startswith(parent)]:
+                killers.discard(k)
+        if not (structural and op == "add"):
+            killers.add(path)
+    kept.reverse()
+
+    if state is None:
+        return kept
+
+    # Drop writes whose path no other surviving diff touches and whose value is already there
+    counts: Dict[str, int] = {}
+    under: Dict[str, int] = {}  # ancestor path -> number of kept diffs below it
+    for d in kept:
+        p = d["path"]
+        counts[p] = counts.get(p, 0) + 1
+        while True:
+            p = p[:p.rfind("/")]
+            if not p:
+                break
+            under[p] = under.get(p, 0) + 1
+
+    def untouched(path: str) -> bool:
+        if counts[path] != 1 or path in under or _positional(path):
+            return False
+        p = path
+        while True:
+            p = p[:p.rfind("/")]
+            if not p:
+                return True
+            # another diff at an ancestor, or elsewhere in the same list (ids and indexes alias)
+            if p in counts or (under[p] > 1 and isinstance(resolve(state, p), list)):
+                return False
+
+    result: List[Diff] = []
+    for d in kept:
+        if untouched(d["path"]):
+            current = resolve(state, d["path"])
+            if d.get("op") == "remove":
+                # apply_patch creates missing parents even for a remove, so keep those
+                if current is MISSING and resolve(state, d["path"].rsplit("/", 1)[0] or "/") is not MISSING:
+                    continue
+            elif current is not MISSING and _same(current, d.get("value")):
+                continue
+        result.append(d)
+    return result
+
+# action type -> (group, key field); a later action with the same group/key
+# overwrites exactly the same paths as an earlier one
+_SETTERS: Dict[str, Tuple[str, Optional[str]]] = {
+    "transport.play": ("transport.playing", None),
+    "transport.stop": ("transport.playing", None),
+    "transport.set": ("transport.beat", None),
+    "loop.set": ("loop", None),
+    "project.setTitle": ("project.title", None),
+    "tracks.setActive": ("selection", None),
+    "track.rename": ("track.name", "trackId"),
+    "track.setGain": ("track.gain", "trackId"),
+    "track.setColor": ("track.color", "trackId"),
+    "clip.move": ("clip.startBeat", "clipId"),
+    "clip.rename": ("clip.name", "clipId"),
+    "clip.setLayer": ("clip.layer", "clipId"),
+}
+
+def _param_value(v: Any) -> Any:
+    # same coercion as the fx.setParam handler
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return float(v)
+    if isinstance(v, str):
+        return v
+    return bool(v)
+
+def _fold_key(a: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    t = a.get("type")
+    if t == "fx.setParam":
+        target = a.get("target") or {}
+        return str(target.get("trackId")), str(target.get("unit"))
+    if t == "eq.setParam" and not str(a.get("path", "")).startswith("/"):
+        return str(a.get("trackId")), "eq"
+    return None
+
+def _folded(track_id: str, unit: str, members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for a in members:
+        if a["type"] == "fx.setParam":
+            key, value = str(a["target"]["path"]), _param_value(a["value"])
+        else:
+            key, value = str(a["path"]), a["value"]
+        # re-insert so a later parent write still lands after its children
+        params.pop(key, None)
+        params[key] = value
+    if any(a["type"] == "eq.setParam" for a in members):
+        return {"type": "eq.batchSet", "trackId": track_id, "changes": [{"path": k, "value": v} for k, v in params.items()]}
+    return {"type": "fx.setParams", "target": {"trackId": track_id, "unit": unit}, "params": params}
+
+def _optimize_run(run: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Actions in a run write disjoint path sets per group, so order across groups is free
+    slots: Dict[Any, int] = {}
+    members: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for i, a in enumerate(run):
+        fold = _fold_key(a)
+        if fold is not None:
+            members.setdefault(fold, []).append(a)
+            slots[("fold",) + fold] = i
+        else:
+            group, field = _SETTERS[a["type"]]
+            slots[(group, a.get(field) if field else None)] = i
+    out: List[Tuple[int, Dict[str, Any]]] = []
+    for key, i in slots.items():
+        if key[0] == "fold":
+            group = members[key[1:]]
+            out.append((i, group[0] if len(group) == 1 else _folded(key[1], key[2], group)))
+        else:
+            out.append((i, run[i]))
+    out.sort(key=lambda x: x[0])
+    return [a for _, a in out]
+
+def optimize_plan(plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Shorter plan with the same final effect. Only call this for plans that
+    executed without errors: dropping an overwritten action could otherwise
+    change where execution stops."""
+    out: List[Dict[str, Any]] = []
+    run: List[Dict[str, Any]] = []
+    for a in plan:
+        if isinstance(a, dict) and (a.get("type") in _SETTERS or _fold_key(a) is not None):
+            run.append(a)
+            continue
+        if run:
+            out.extend(_optimize_run(run))
+            run = []
+        out.append(a)
+    if run:
+        out.extend(_optimize_run(run))
+    return out
@@ -0,0 +1,81 @@
+"""Incremental parser for streamed `execute_actions` tool arguments.
+
+The model streams the arguments JSON in arbitrary fragments. `PlanItemParser`
+scans each character once and returns every element of the top-level `plan`
+array as soon as its closing brace arrives, so previews can start before the
+whole tool call has been received.
+"""
+from typing import Any, Dict, List, Optional
+import orjson
+
+class PlanItemParser:
+    __slots__ = ("_buf", "_pos", "_depth", "_in_str", "_esc", "_str_start",
+                 "_last_key", "_plan_depth", "_item_start", "count")
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = -1
+        self._last_key: Optional[str] = None
+        self._plan_depth = -1  # depth inside the plan array, -1 when outside
+        self._item_start = -1
+        self.count = 0
+
+    def feed(self, fragment: str) -> List[Dict[str, Any]]:
+        """Consume a fragment and return the plan items it completed."""
+        items: List[Dict[str, Any]] = []
+        buf = self._buf = self._buf + fragment
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            c = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        self._last_key = buf[self._str_start + 1:i]
+            elif c == '"':
+                self._in_str = True
+                self._str_start = i
+            elif c in "{[":
+                if c == "[" and self._depth == 1 and self._last_key == "plan" and self._plan_depth < 0:
+                    self._plan_depth = 2
+                elif c == "{" and self._depth == self._plan_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if c == "}" and self._depth == self._plan_depth and self._item_start >= 0:
+                    try:
+                        item = orjson.loads(buf[self._item_start:i + 1])
+                    except orjson.JSONDecodeError:
+                        item = None
+                    self._item_start = -1
+                    if isinstance(item, dict):
+                        items.append(item)
+                        self.count += 1
+                elif c == "]" and self._depth == 1 and self._plan_depth > 0:
+                    self._plan_depth = -1
+            i += 1
+        self._pos = i
+        # Drop text that can no longer be part of a pending item or key
+        if self._item_start >= 0:
+            keep = self._item_start
+        elif self._in_str:
+            keep = self._str_start
+        else:
+            keep = i
+        if keep > 0:
+            self._buf = buf[keep:]
+            self._pos -= keep
+            self._str_start -= keep
+            if self._item_start >= 0:
+                self._item_start -= keep
+        return items
@@ -0,0 +1,251 @@
+"""In-memory project state, kept in sync by applying ActionBus diffs.
+
+Diff paths are JSON Pointers where a list segment may name an element by its
+`id` (e.g. `/tracks/t_bass/name`) as well as by index or `-` (append).
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import orjson
+from ..config import settings
+from .timeline import Timeline
+
+MISSING = object()
+
+class PatchError(ValueError):
+    pass
+
+class VersionConflict(Exception):
+    def __init__(self, current: int):
+        super().__init__(f"stale project version (current={current})")
+        self.current = current
+
+def split_path(path: str) -> List[str]:
+    if not path.startswith("/"):
+        raise PatchError(f"bad path: {path}")
+    return [s.replace("~1", "/").replace("~0", "~") for s in path[1:].split("/")]
+
+def _list_index(items: List[Any], seg: str) -> int:
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and item.get("id") == seg:
+            return i
+    if seg.isdigit() and int(seg) < len(items):
+        return int(seg)
+    return -1
+
+def _child(node: Any, seg: str) -> Any:
+    if isinstance(node, dict):
+        return node.get(seg, MISSING)
+    if isinstance(node, list):
+        i = _list_index(node, seg)
+        return node[i] if i >= 0 else MISSING
+    return MISSING
+
+def resolve(doc: Any, path: str) -> Any:
+    """Return the value at `path`, or MISSING."""
+    node = doc
+    for seg in split_path(path):
+        node = _child(node, seg)
+        if node is MISSING:
+            return MISSING
+    return node
+
+def _escape(seg: str) -> str:
+    return seg.replace("~", "~0").replace("/", "~1")
+
+def _ref(items: List[Any], i: int) -> str:
+    """Path segment naming `items[i]`: its `id` when that resolves back to it, else the index."""
+    item = items[i]
+    if isinstance(item, dict):
+        ident = item.get("id")
+        if isinstance(ident, str) and _list_index(items, ident) == i:
+            return _escape(ident)
+    return str(i)
+
+def apply_patch(doc: Dict[str, Any], diffs: Iterable[Dict[str, Any]], undo: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Apply diffs to `doc` in place. Missing parents are created: a list when
+    the next segment is `-` or an index, otherwise an object.
+
+    With `undo`, the inverse of each change is appended to it; applying
+    `reversed(undo)` restores the original doc. Like forward diffs, it names list
+    elements by `id` (by index only when they have none); re-inserting a removed
+    element uses its index, as that is a position rather than an element.
+    """
+    for d in diffs:
+        op = d.get("op")
+        segs = split_path(d["path"])
+        parent: Any = doc
+        at = ""  # escaped path of `parent`, list elements named as by `_ref`
+        for k, seg in enumerate(segs[:-1]):
+            nxt = _child(parent, seg)
+            if nxt is MISSING:
+                if not isinstance(parent, dict):
+                    raise PatchError(f"no such element: {d['path']}")
+                following = segs[k + 1]
+                nxt = parent[seg] = [] if following == "-" or following.isdigit() else {}
+                if undo is not None:
+                    undo.append({"op": "remove", "path": f"{at}/{_escape(seg)}"})
+            if undo is not None:
+                at += "/" + (_ref(parent, _list_index(parent, seg)) if isinstance(parent, list) else _escape(seg))
+            parent = nxt
+        last = segs[-1]
+        if op in ("add", "replace"):
+            value = d.get("value")
+            if isinstance(parent, dict):
+                if undo is not None:
+                    prior = parent.get(last, MISSING)
+                    path = f"{at}/{_escape(last)}"
+                    undo.append({"op": "remove", "path": path} if prior is MISSING else {"op": "replace", "path": path, "value": prior})
+                parent[last] = value
+            elif isinstance(parent, list):
+                if last == "-":
+                    parent.append(value)
+                    if undo is not None:
+                        undo.append({"op": "remove", "path": f"{at}/{_ref(parent, len(parent) - 1)}"})
+                    continue
+                i = _list_index(parent, last)
+                if op == "add" and last.isdigit() and i < 0 and int(last) == len(parent):
+                    parent.append(value)
+                    if undo is not None:
+                        undo.append({"op": "remove", "path": f"{at}/{_ref(parent, len(parent) - 1)}"})
+                elif i < 0:
+                    raise PatchError(f"no such element: {d['path']}")
+                elif op == "add" and last.isdigit():
+                    parent.insert(i, value)
+                    if undo is not None:
+                        undo.append({"op": "remove", "path": f"{at}/{_ref(parent, i)}"})
+                else:
+                    prior = parent[i]
+                    parent[i] = value
+                    if undo is not None:
+                        # Named after the new element, which is what the undo finds there
+                        undo.append({"op": "replace", "path": f"{at}/{_ref(parent, i)}", "value": prior})
+            else:
+                raise PatchError(f"cannot set into scalar: {d['path']}")
+        elif op == "remove":
+            if isinstance(parent, dict):
+                prior = parent.pop(last, MISSING)
+                if undo is not None and prior is not MISSING:
+                    undo.append({"op": "add", "path": f"{at}/{_escape(last)}", "value": prior})
+            elif isinstance(parent, list):
+                i = _list_index(parent, last)
+                if i >= 0:
+                    prior = parent.pop(i)
+                    if undo is not None:
+                        undo.append({"op": "add", "path": f"{at}/{i}", "value": prior})
+        else:
+            raise PatchError(f"unsupported op: {op}")
+    return doc
+
+def invert_patch(doc: Dict[str, Any], diffs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Inverse of `diffs` against `doc`, without modifying `doc`."""
+    undo: List[Dict[str, Any]] = []
+    apply_patch(orjson.loads(orjson.dumps(doc)), diffs, undo)
+    undo.reverse()
+    return undo
+
+def _size(value: Any) -> int:
+    return len(orjson.dumps(value))
+
+class _Entry:
+    __slots__ = ("doc", "version", "size", "timeline")
+
+    def __init__(self, doc: Dict[str, Any], version: int, size: int):
+        self.doc = doc
+        self.version = version
+        self.size = size
+        self.timeline: Optional[Timeline] = None  # built on first use
+
+class ProjectStore:
+    """LRU map of project ID -> (state, version), bounded by count and approximate bytes."""
+
+    def __init__(self, max_projects: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_projects = max_projects
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, project_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        e = self._entries.get(project_id)
+        if e is None:
+            return None
+        self._entries.move_to_end(project_id)
+        return e.doc, e.version
+
+    def timeline(self, project_id: str) -> Optional[Timeline]:
+        """Clip interval index of the stored state, kept current by `apply`."""
+        e = self._entries.get(project_id)
+        if e is None:
+            return None
+        if e.timeline is None:
+            e.timeline = Timeline.from_clips(e.doc.get("clips"))
+        return e.timeline
+
+    def put(self, project_id: str, doc: Dict[str, Any]) -> int:
+        """Store a full snapshot; returns the new version."""
+        old = self._entries.pop(project_id, None)
+        version = old.version + 1 if old else 1
+        if old:
+            self.total_bytes -= old.size
+        e = _Entry(doc, version, _size(doc))
+        self._entries[project_id] = e
+        self.total_bytes += e.size
+        self._evict()
+        return version
+
+    def apply(
+        self,
+        project_id: str,
+        diffs: List[Dict[str, Any]],
+        base_version: Optional[int] = None,
+        undo: Optional[List[Dict[str, Any]]] = None,
+    ) -> int:
+        """Apply diffs incrementally; returns the new version. Fills `undo` with the inverse patch."""
+        e = self._entries.get(project_id)
+        if e is None:
+            raise KeyError(project_id)
+        if base_version is not None and base_version != e.version:
+            raise VersionConflict(e.version)
+        if not diffs:
+            return e.version
+        # The inverse holds every value the patch replaced or removed, for the size update
+        inverse = undo if undo is not None else []
+        first = len(inverse)
+        try:
+            apply_patch(e.doc, diffs, inverse)
+        except PatchError:
+            # State is now partially patched; force the client to re-upload
+            self.drop(project_id)
+            raise
+        if e.timeline is not None and not e.timeline.apply(diffs):
+            e.timeline = None  # e.g. a patch addressing clips without IDs by index
+        # Approximate the new size from the values added and dropped instead of re-serializing the doc
+        added = sum(_size(d.get("value")) for d in diffs if d.get("op") in ("add", "replace"))
+        dropped = sum(_size(u["value"]) for u in inverse[first:] if "value" in u)
+        size = max(0, e.size + added - dropped)
+        self.total_bytes += size - e.size
+        e.size = size
+        if undo is not None:
+            undo.reverse()
+        e.version += 1
+        self._entries.move_to_end(project_id)
+        self._evict()
+        return e.version
+
+    def drop(self, project_id: str) -> None:
+        e = self._entries.pop(project_id, None)
+        if e:
+            self.total_bytes -= e.size
+
+    def _evict(self) -> None:
+        # Never evict the most recent entry, even if it alone exceeds the cap
+        while len(self._entries) > 1 and (len(self._entries) > self.max_projects or self.total_bytes > self.max_bytes):
+            _, e = self._entries.popitem(last=False)
+            self.total_bytes -= e.size
+
+project_store = ProjectStore(
+    max_projects=settings.project_store_max_projects,
+    max_bytes=settings.project_store_max_mb * 1024 * 1024,
+)
@@ -0,0 +1,92 @@
+"""Compact, token-budgeted encoding of `project_summary` for prompts.
+
+IDs, tempo and time signature always go first; full track/clip detail and the
+remaining keys are added while they fit. Output is always valid JSON and is
+memoized per (summary hash, budget).
+"""
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Dict, List, Tuple
+import orjson
+
+CHARS_PER_TOKEN = 4  # rough average for JSON-ish text
+
+_HEAD_KEYS = ("title", "bpm", "tempo", "timeSig", "projectRoot")
+_TRACK_KEYS = ("id", "name")
+_CLIP_KEYS = ("id", "trackId", "startBeat", "lengthBeats")
+
+_CACHE_MAX = 256
+_cache: "OrderedDict[Tuple[bytes, int], str]" = OrderedDict()
+
+def _size(value: Any) -> int:
+    return len(orjson.dumps(value))
+
+def _skeleton(items: List[Any], keys: Tuple[str, ...]) -> List[Any]:
+    return [{k: it[k] for k in keys if k in it} if isinstance(it, dict) else it for it in items]
+
+def _encode(summary: Dict[str, Any], budget_chars: int) -> str:
+    out: Dict[str, Any] = {k: summary[k] for k in _HEAD_KEYS if k in summary}
+    used = _size(out)
+
+    # 1) ID skeletons; tracks before clips, trim clips from the end if needed
+    skeletons: Dict[str, List[Any]] = {}
+    for key, keys in (("tracks", _TRACK_KEYS), ("clips", _CLIP_KEYS)):
+        if not isinstance(summary.get(key), list):
+            continue
+        items = _skeleton(summary[key], keys)
+        kept: List[Any] = []
+        used += len(key) + 5
+        for it in items:
+            n = _size(it) + 1
+            if used + n > budget_chars:
+                break
+            kept.append(it)
+            used += n
+        skeletons[key] = kept
+        out[key] = kept
+        if len(kept) < len(items):
+            out[key + "Omitted"] = len(items) - len(kept)
+
+    # 2) upgrade skeleton entries to full objects while they fit
+    for key in ("tracks", "clips"):
+        full = summary.get(key)
+        kept = skeletons.get(key)
+        if not kept or not isinstance(full, list):
+            continue
+        for i in range(len(kept)):
+            extra = _size(full[i]) - _size(kept[i])
+            if extra <= 0:
+                continue
+            if used + extra > budget_chars:
+                break
+            kept[i] = full[i]
+            used += extra
+
+    # 3) any remaining top-level keys, smallest first
+    rest = [(k, v) for k, v in summary.items() if k not in out]
+    for k, v in sorted(rest, key=lambda kv: _size(kv[1])):
+        n = _size(v) + len(k) + 4
+        if used + n > budget_chars:
+            out.setdefault("omittedKeys", []).append(k)
+            continue
+        out[k] = v
+        used += n
+
+    return orjson.dumps(out).decode()
+
+def encode_summary(summary: Dict[str, Any] | None, budget_tokens: int) -> str:
+    """Return `summary` as compact JSON that fits roughly `budget_tokens` tokens."""
+    if not summary:
+        return "{}"
+    raw = orjson.dumps(summary, option=orjson.OPT_SORT_KEYS)
+    key = (blake2b(raw, digest_size=16).digest(), budget_tokens)
+    hit = _cache.get(key)
+    if hit is not None:
+        _cache.move_to_end(key)
+        return hit
+    budget_chars = budget_tokens * CHARS_PER_TOKEN
+    text = raw.decode() if len(raw) <= budget_chars else _encode(summary, budget_chars)
+    _cache[key] = text
+    if len(_cache) > _CACHE_MAX:
+        _cache.popitem(last=False)
+    return text
@@ -0,0 +1,119 @@
+"""Tempo map: piecewise-constant tempo over beats, with beat <-> seconds conversion.
+
+Segment i starts at `beats[i]` with tempo `bpms[i]`; the time at which it
+starts is precomputed in `secs[i]`, so converting one value is a bisect plus a
+multiply-add; batch conversions (whole clip lists) do one per value.
+
+Beats are in units of the time signature denominator and tempo is in quarter
+notes per minute, as in `ActionBus`.
+"""
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+
+def _number(v: Any) -> Optional[float]:
+    """`v` as a finite float, or None."""
+    if isinstance(v, bool):
+        return None
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return f if math.isfinite(f) else None
+
+class TempoMap:
+    __slots__ = ("beat_unit", "beats", "bpms", "secs", "spb")
+
+    def __init__(self, events: Iterable[Tuple[float, float]], beat_unit: int = 4):
+        self.beat_unit = beat_unit
+        by_beat: Dict[float, float] = {}
+        for beat, bpm in events:
+            if bpm > 0 and math.isfinite(bpm):
+                by_beat[max(0.0, float(beat))] = float(bpm)  # last event at a beat wins
+        points = sorted(by_beat.items()) or [(0.0, 120.0)]
+        if points[0][0] > 0:
+            points.insert(0, (0.0, points[0][1]))
+        scale = 240.0 / beat_unit  # seconds per beat = scale / bpm
+        self.beats: List[float] = []
+        self.bpms: List[float] = []
+        self.secs: List[float] = []
+        self.spb: List[float] = []
+        t = 0.0
+        for i, (beat, bpm) in enumerate(points):
+            if i:
+                t += (beat - self.beats[-1]) * self.spb[-1]
+            self.beats.append(beat)
+            self.bpms.append(bpm)
+            self.secs.append(t)
+            self.spb.append(scale / bpm)
+
+    @classmethod
+    def constant(cls, bpm: float, beat_unit: int = 4) -> "TempoMap":
+        return cls([(0.0, bpm)], beat_unit)
+
+    @classmethod
+    def from_summary(cls, summary: Dict[str, Any], beat_unit: Optional[int] = None) -> "TempoMap":
+        """`tempoMap: [{beat, bpm}]` if present, else `project.tempo`, else `bpm` (default 120).
+
+        Events without a positive numeric bpm (or with a non-numeric beat) are skipped.
+        """
+        if beat_unit is None:
+            time_sig = summary.get("timeSig")
+            unit = _number(time_sig.get("denominator")) if isinstance(time_sig, dict) else None
+            beat_unit = int(unit) if unit is not None and unit >= 1 else 4
+        events = summary.get("tempoMap")
+        if isinstance(events, list):
+            points = []
+            for e in events:
+                if isinstance(e, dict):
+                    beat, bpm = _number(e.get("beat", 0)), _number(e.get("bpm"))
+                    if beat is not None and bpm is not None and bpm > 0:
+                        points.append((beat, bpm))
+            if points:
+                return cls(points, beat_unit)
+        project = summary.get("project")
+        for bpm in (project.get("tempo") if isinstance(project, dict) else None, summary.get("bpm")):
+            bpm = _number(bpm)
+            if bpm is not None and bpm > 0:
+                return cls.constant(bpm, beat_unit)
+        return cls.constant(120.0, beat_unit)
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        """Hashable identity, e.g. for sharing buses between plans."""
+        return (self.beat_unit, tuple(self.beats), tuple(self.bpms))
+
+    def __len__(self) -> int:
+        return len(self.beats)
+
+    def seconds(self, beat: float) -> float:
+        beat = max(0.0, beat)
+        i = bisect_right(self.beats, beat) - 1
+        return self.secs[i] + (beat - self.beats[i]) * self.spb[i]
+
+    def beats_at(self, seconds: float) -> float:
+        seconds = max(0.0, seconds)
+        i = bisect_right(self.secs, seconds) - 1
+        return self.beats[i] + (seconds - self.secs[i]) / self.spb[i]
+
+    def seconds_many(self, beats: Sequence[float]) -> List[float]:
+        seconds = self.seconds
+        return [seconds(b) for b in beats]
+
+    def beats_many(self, seconds: Sequence[float]) -> List[float]:
+        beats_at = self.beats_at
+        return [beats_at(s) for s in seconds]
+
+    def clip_spans(self, clips: Iterable[Any]) -> Dict[str, List[float]]:
+        """clip id -> [startSeconds, endSeconds] for clips with `startBeat` (and `lengthBeats`)."""
+        ids: List[str] = []
+        points: List[float] = []
+        for c in clips:
+            if isinstance(c, dict) and "id" in c and isinstance(c.get("startBeat"), (int, float)):
+                start = float(c["startBeat"])
+                length = c.get("lengthBeats")
+                ids.append(str(c["id"]))
+                points.append(start)
+                points.append(start + float(length) if isinstance(length, (int, float)) else start)
+        secs = self.seconds_many(points)
+        return {cid: [secs[2 * k], secs[2 * k + 1]] for k, cid in enumerate(ids)}
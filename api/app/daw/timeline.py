@@ -0,0 +1,220 @@
+"""Per-track clip interval index over beats.
+
+Each track keeps its clips in parallel lists sorted by start beat, plus the
+longest clip length seen on the track. Clips overlapping [a, b) can only start
+in [a - longest, b), so a query is two bisects plus a scan of that window:
+O(log n + k) when clip lengths are comparable. Inserts and removals are a
+bisect and a list insert/delete.
+
+`Timeline` indexes a project's clip list and follows applied diffs
+(`ProjectStore` keeps one per project); `TimelineView` layers one plan's
+uncommitted changes over it without touching the shared index.
+"""
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+Span = Tuple[str, float, float]  # (trackId, startBeat, endBeat); end == start when the length is unknown
+
+_FIELDS = ("trackId", "startBeat", "lengthBeats")
+
+def _num(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def clip_fields(clip: Any) -> Dict[str, Any]:
+    return {k: clip[k] for k in _FIELDS if k in clip} if isinstance(clip, dict) else {}
+
+def span_of(fields: Optional[Dict[str, Any]]) -> Optional[Span]:
+    if not fields:
+        return None
+    track, start, length = fields.get("trackId"), fields.get("startBeat"), fields.get("lengthBeats")
+    if track is None or not _num(start):
+        return None
+    end = start + length if _num(length) and length > 0 else start
+    return (str(track), float(start), float(end))
+
+def hits(span: Span, start: float, end: float) -> bool:
+    """Does `span` overlap [start, end)? A span of unknown length counts as a point.
+
+    An empty query (start == end) is a point: it hits spans containing it and points at it.
+    """
+    s, e = span[1], span[2]
+    if start == end:
+        return s <= start and (start < e or s == start)
+    return s < end and (e > start or (s == e and s >= start))
+
+class TrackIndex:
+    __slots__ = ("starts", "ends", "ids", "longest")
+
+    def __init__(self):
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        self.ids: List[str] = []
+        self.longest = 0.0  # upper bound; not lowered on removal
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def insert(self, clip_id: str, start: float, end: float) -> None:
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, clip_id)
+        if end - start > self.longest:
+            self.longest = end - start
+
+    def remove(self, clip_id: str, start: float) -> None:
+        i = bisect_left(self.starts, start)
+        while i < len(self.ids) and self.starts[i] == start:
+            if self.ids[i] == clip_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                return
+            i += 1
+
+    def overlapping(self, start: float, end: float) -> List[str]:
+        lo = bisect_left(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end) if end > start else bisect_right(self.starts, start)
+        starts, ends = self.starts, self.ends
+        return [self.ids[i] for i in range(lo, hi) if hits(("", starts[i], ends[i]), start, end)]
+
+    def containing(self, beat: float) -> List[str]:
+        lo = bisect_left(self.starts, beat - self.longest)
+        hi = bisect_right(self.starts, beat)
+        return [self.ids[i] for i in range(lo, hi) if self.starts[i] <= beat < self.ends[i]]
+
+# None: not a clip diff; False: cannot be mapped to a clip ID (the caller rebuilds)
+Change = Union[None, bool, Tuple[str, Optional[Dict[str, Any]]]]
+
+def clip_change(diff: Dict[str, Any], current: Callable[[str], Optional[Dict[str, Any]]]) -> Change:
+    """(clip ID, new indexed fields or None if removed) for a diff under /clips."""
+    path = diff.get("path", "")
+    if path == "/clips":
+        return False
+    if not path.startswith("/clips/"):
+        return None
+    segs = [s.replace("~1", "/").replace("~0", "~") for s in path[7:].split("/")]
+    seg, op, value = segs[0], diff.get("op"), diff.get("value")
+    if len(segs) == 1:
+        if op == "remove":
+            return (seg, None) if current(seg) is not None else False
+        if seg == "-" or op == "add":
+            if not isinstance(value, dict):
+                return False
+            return (str(value["id"]), clip_fields(value)) if "id" in value else None
+        if current(seg) is None or not isinstance(value, dict) or str(value.get("id", seg)) != seg:
+            return False
+        return (seg, clip_fields(value))
+    fields = current(seg)
+    if fields is None:
+        return False
+    if segs[1] not in _FIELDS:
+        return None
+    if len(segs) > 2:
+        return False
+    fields = dict(fields)
+    if op == "remove":
+        fields.pop(segs[1], None)
+    else:
+        fields[segs[1]] = value
+    return (seg, fields)
+
+class Timeline:
+    """Clip ID -> indexed fields and span, plus a `TrackIndex` per track."""
+
+    def __init__(self):
+        self.fields: Dict[str, Dict[str, Any]] = {}
+        self.spans: Dict[str, Span] = {}
+        self.tracks: Dict[str, TrackIndex] = {}
+
+    @classmethod
+    def from_clips(cls, clips: Any) -> "Timeline":
+        tl = cls()
+        if isinstance(clips, list):
+            for c in clips:
+                if isinstance(c, dict) and "id" in c:
+                    tl.set(str(c["id"]), clip_fields(c))
+        return tl
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def set(self, clip_id: str, fields: Optional[Dict[str, Any]]) -> None:
+        old = self.spans.pop(clip_id, None)
+        if old is not None:
+            self.tracks[old[0]].remove(clip_id, old[1])
+        if fields is None:
+            self.fields.pop(clip_id, None)
+            return
+        self.fields[clip_id] = fields
+        span = span_of(fields)
+        if span is not None:
+            self.spans[clip_id] = span
+            track = self.tracks.get(span[0])
+            if track is None:
+                track = self.tracks[span[0]] = TrackIndex()
+            track.insert(clip_id, span[1], span[2])
+
+    def apply(self, diffs: Iterable[Dict[str, Any]]) -> bool:
+        """Follow applied diffs; False if one could not be mapped (rebuild from the doc)."""
+        for d in diffs:
+            change = clip_change(d, self.fields.get)
+            if change is False:
+                return False
+            if change is not None:
+                self.set(*change)
+        return True
+
+    def span(self, clip_id: str) -> Optional[Span]:
+        return self.spans.get(clip_id)
+
+    def overlapping(self, track: str, start: float, end: float) -> List[str]:
+        idx = self.tracks.get(track)
+        return idx.overlapping(start, end) if idx is not None else []
+
+    def containing(self, track: str, beat: float) -> List[str]:
+        idx = self.tracks.get(track)
+        return idx.containing(beat) if idx is not None else []
+
+class TimelineView:
+    """A `Timeline` plus one plan's changes so far; the base is never modified."""
+
+    def __init__(self, base: Timeline):
+        self.base = base
+        self.changes: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def fields(self, clip_id: str) -> Optional[Dict[str, Any]]:
+        return self.changes[clip_id] if clip_id in self.changes else self.base.fields.get(clip_id)
+
+    def apply(self, diffs: Iterable[Dict[str, Any]]) -> None:
+        for d in diffs:
+            change = clip_change(d, self.fields)
+            if change:
+                self.changes[change[0]] = change[1]
+
+    def span(self, clip_id: str) -> Optional[Span]:
+        if clip_id in self.changes:
+            return span_of(self.changes[clip_id])
+        return self.base.spans.get(clip_id)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for cid, f in self.base.fields.items():
+            if cid not in self.changes:
+                yield cid, f
+        for cid, f in self.changes.items():
+            if f is not None:
+                yield cid, f
+
+    def _query(self, base_ids: List[str], track: str, match: Callable[[Span], bool], exclude: str) -> List[str]:
+        changes = self.changes
+        out = [c for c in base_ids if c not in changes and c != exclude]
+        for cid, f in changes.items():
+            span = span_of(f)
+            if cid != exclude and span is not None and span[0] == track and match(span):
+                out.append(cid)
+        return out
+
+    def overlapping(self, track: str, start: float, end: float, exclude: str = "") -> List[str]:
+        """IDs of clips on `track` overlapping [start, end), except `exclude`."""
+        return self._query(self.base.overlapping(track, start, end), track, lambda s: hits(s, start, end), exclude)
+
+    def containing(self, track: str, beat: float, exclude: str = "") -> List[str]:
+        return self._query(self.base.containing(track, beat), track, lambda s: s[1] <= beat < s[2], exclude)
@@ -0,0 +1,138 @@
+"""Compile the `execute_actions` JSON schema into plain-Python validators.
+
+Only the subset of JSON schema used in `schema.py` is supported. Validators are
+built once at import and return an error string, or None when the value is ok.
+Unknown top-level keys on an action are tolerated so older clients that send
+aliases (e.g. `track_id`) keep working.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from .schema import execute_actions_tool
+
+Validator = Callable[[Any], Optional[str]]
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "number": _is_number,
+    "integer": lambda v: _is_number(v) and float(v).is_integer(),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+}
+
+def compile_schema(schema: Dict[str, Any], where: str = "", top_level: bool = False) -> Validator:
+    checks: List[Validator] = []
+
+    types = schema.get("type")
+    if types is not None:
+        names = [types] if isinstance(types, str) else list(types)
+        fns = [_TYPE_CHECKS[n] for n in names]
+        expected = "|".join(names)
+        def check_type(v: Any) -> Optional[str]:
+            for fn in fns:
+                if fn(v):
+                    return None
+            return f"{where or 'value'}: expected {expected}"
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = frozenset(schema["enum"])
+        def check_enum(v: Any) -> Optional[str]:
+            if v not in allowed:
+                return f"{where or 'value'}: must be one of {sorted(allowed)}"
+            return None
+        checks.append(check_enum)
+
+    if "minimum" in schema or "exclusiveMinimum" in schema:
+        lo = schema.get("minimum")
+        xlo = schema.get("exclusiveMinimum")
+        def check_min(v: Any) -> Optional[str]:
+            if not _is_number(v):
+                return None
+            if lo is not None and v < lo:
+                return f"{where}: must be >= {lo}"
+            if xlo is not None and v <= xlo:
+                return f"{where}: must be > {xlo}"
+            return None
+        checks.append(check_min)
+
+    if "properties" in schema or "required" in schema:
+        required = tuple(schema.get("required", ()))
+        props = {
+            k: compile_schema(sub, f"{where}.{k}" if where else k)
+            for k, sub in schema.get("properties", {}).items()
+        }
+        extra = schema.get("additionalProperties", True)
+        strict = extra is False and not top_level
+        extra_check = compile_schema(extra, where) if isinstance(extra, dict) else None
+        def check_object(v: Any) -> Optional[str]:
+            if not isinstance(v, dict):
+                return None
+            for k in required:
+                if k not in v:
+                    return f"missing {where + '.' if where else ''}{k}"
+            for k, val in v.items():
+                fn = props.get(k)
+                if fn is not None:
+                    err = fn(val)
+                elif strict:
+                    err = f"{where}: unexpected key {k}"
+                else:
+                    err = None
+                if err:
+                    return err
+            return None
+        checks.append(check_object)
+    elif isinstance(schema.get("additionalProperties"), dict):
+        value_check = compile_schema(schema["additionalProperties"], where)
+        def check_values(v: Any) -> Optional[str]:
+            if not isinstance(v, dict):
+                return None
+            for val in v.values():
+                err = value_check(val)
+                if err:
+                    return err
+            return None
+        checks.append(check_values)
+
+    if schema.get("type") == "array":
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+        item_check = compile_schema(schema["items"], f"{where}[]") if "items" in schema else None
+        def check_array(v: Any) -> Optional[str]:
+            if not isinstance(v, list):
+                return None
+            if min_items is not None and len(v) < min_items:
+                return f"{where}: needs at least {min_items} item(s)"
+            if max_items is not None and len(v) > max_items:
+                return f"{where}: at most {max_items} item(s)"
+            if item_check is not None:
+                for item in v:
+                    err = item_check(item)
+                    if err:
+                        return err
+            return None
+        checks.append(check_array)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(v: Any) -> Optional[str]:
+        for fn in checks:
+            err = fn(v)
+            if err:
+                return err
+        return None
+    return validate
+
+def compile_action_validators(tool: Dict[str, Any]) -> Dict[str, Validator]:
+    """Map each action `type` in the tool schema to its compiled validator."""
+    validators: Dict[str, Validator] = {}
+    for item in tool["parameters"]["properties"]["plan"]["items"]["anyOf"]:
+        for t in item["properties"]["type"]["enum"]:
+            validators[t] = compile_schema(item, top_level=True)
+    return validators
+
+VALIDATORS: Dict[str, Validator] = compile_action_validators(execute_actions_tool)
@@ -0,0 +1,54 @@
+"""Per-request deadlines.
+
+A deadline comes from the `DEADLINE_HEADER` request header (seconds, e.g.
+`X-Request-Timeout: 10`) capped by the route's `REQUEST_DEADLINE_S`. Handlers
+pass it on to the upstream slot wait, every upstream call (`upstream.create`,
+`upstream.guard`) and `ActionBus.execute_plan`, so work stops once the client
+has given up. Running out raises `DeadlineExceeded` (504).
+"""
+from typing import Awaitable, Callable, Optional
+import time
+from fastapi import Request
+from .config import route_value, settings
+
+class DeadlineExceeded(Exception):
+    def __init__(self):
+        super().__init__("deadline exceeded")
+
+class Deadline:
+    __slots__ = ("budget_s", "at")
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.at = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def check(self) -> float:
+        """Seconds left; raises `DeadlineExceeded` if none."""
+        left = self.at - time.monotonic()
+        if left <= 0:
+            raise DeadlineExceeded()
+        return left
+
+def request_deadline(request: Request, route: str) -> Optional[Deadline]:
+    budget = route_value(settings.request_deadline_s, route, float)
+    raw = request.headers.get(settings.deadline_header) if settings.deadline_header else None
+    if raw:
+        try:
+            asked = float(raw)
+        except ValueError:
+            asked = 0.0
+        if asked > 0 and (budget is None or asked < budget):
+            budget = asked
+    return Deadline(budget) if budget is not None and budget > 0 else None
+
+def deadline_dependency(route: str) -> Callable[[Request], Awaitable[Optional[Deadline]]]:
+    """`deadline: Optional[Deadline] = Depends(deadline_dependency("chat"))`"""
+    async def dependency(request: Request) -> Optional[Deadline]:
+        return request_deadline(request, route)
+    return dependency
@@ -1,12 +1,15 @@
 from fastapi import Header, HTTPException, status
 from .config import settings
 
-async def auth_dependency(authorization: str | None = Header(default=None)):
+async def auth_dependency(authorization: str | None = Header(default=None)) -> str | None:
+    """Returns the bearer token (if any); also used as the caller key for upstream fairness."""
+    token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization.split(" ", 1)[1].strip() or None
     if not settings.require_auth:
-        return
-    if not authorization or not authorization.lower().startswith("bearer "):
+        return token
+    if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
     # TODO: Verify JWT if you have a real issuer/audience
-    # token = authorization.split(" ", 1)[1]
-    return
+    return token
 
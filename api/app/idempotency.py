@@ -0,0 +1,143 @@
+"""Idempotent replay for apply requests (per worker).
+
+A request carrying an idempotency key executes once. Repeats within the TTL
+get the stored JSON result, or the recorded SSE frames, without executing
+again. A repeat that arrives while the first request is still running waits
+for its result (JSON) or follows its frames as they are produced (SSE).
+
+The store lives in the worker process. The guarantee only holds when repeats
+reach the same worker: run one worker per instance or route sticky.
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+from .cache import TTLCache
+from .config import settings
+from .sse import DONE, sse_error
+
+class KeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+class _Recording:
+    """SSE frames of one execution; followers replay them and wait for more until done."""
+
+    __slots__ = ("frames", "done", "started", "_wake")
+
+    def __init__(self):
+        self.frames: List[bytes] = []
+        self.done = False
+        self.started = False
+        self._wake = asyncio.Event()
+
+    def push(self, frame: bytes) -> None:
+        self.frames.append(frame)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self._notify()
+
+    def _notify(self) -> None:
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    async def follow(self) -> AsyncIterator[bytes]:
+        i = 0
+        while True:
+            while i < len(self.frames):
+                yield self.frames[i]
+                i += 1
+            if self.done:
+                return
+            await self._wake.wait()
+
+class IdempotencyStore:
+    """Results by key: `run` for JSON handlers, `stream` for SSE generators.
+
+    Each key is stored with a fingerprint of its request; reusing a key for a
+    different request raises `KeyReused`. Failed JSON executions are not stored,
+    so they can be retried.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 600.0):
+        self._done: TTLCache[Tuple[bytes, Any]] = TTLCache(max_entries=max_entries, ttl_s=ttl_s)
+        self._running: Dict[Hashable, Tuple[bytes, Any]] = {}
+
+    def lookup(self, key: Hashable, fingerprint: bytes) -> Optional[Any]:
+        hit = self._running.get(key) or self._done.get(key)
+        if hit is None:
+            return None
+        if hit[0] != fingerprint:
+            raise KeyReused()
+        return hit[1]
+
+    async def run(self, key: Hashable, fingerprint: bytes, fn: Callable[[], Awaitable[Any]]) -> Any:
+        hit = self.lookup(key, fingerprint)
+        if isinstance(hit, asyncio.Future):
+            return await asyncio.shield(hit)
+        if hit is not None:
+            return hit
+        fut = asyncio.get_running_loop().create_future()
+        self._running[key] = (fingerprint, fut)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            # Concurrent duplicates see the same error; nothing is stored
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody is waiting
+            raise
+        finally:
+            self._running.pop(key, None)
+        fut.set_result(result)
+        self._done.set(key, (fingerprint, result))
+        return result
+
+    def stream(
+        self, key: Hashable, fingerprint: bytes, frames: Callable[[], AsyncIterator[bytes]]
+    ) -> Tuple[AsyncIterator[bytes], Callable[[], None]]:
+        """The frames to send and a callback for the response's `on_close`.
+
+        The callback releases the key if the frames were never iterated (the
+        client went away before the first one), so repeats run the request
+        instead of waiting for a recording that never ends.
+        """
+        hit = self.lookup(key, fingerprint)
+        if hit is not None:
+            return hit.follow(), lambda: None
+        rec = _Recording()
+        self._running[key] = (fingerprint, rec)
+        return self._record(key, fingerprint, rec, frames()), lambda: self._abandon(key, rec)
+
+    def _abandon(self, key: Hashable, rec: _Recording) -> None:
+        if rec.started or rec.done:
+            return
+        if self._running.get(key, (None, None))[1] is rec:
+            del self._running[key]
+        # Nothing ran; followers that joined meanwhile are told to retry
+        rec.push(sse_error("request closed before it started; retry"))
+        rec.push(DONE)
+        rec.finish()
+
+    async def _record(self, key: Hashable, fingerprint: bytes, rec: _Recording, frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        rec.started = True
+        completed = False
+        try:
+            async for frame in frames:
+                rec.push(frame)
+                yield frame
+            completed = True
+        finally:
+            if not completed:
+                # The first client went away mid-stream; replays still get a terminated stream
+                await frames.aclose()
+                rec.push(DONE)
+            rec.finish()
+            self._running.pop(key, None)
+            self._done.set(key, (fingerprint, rec))
+
+idempotency = IdempotencyStore(
+    max_entries=settings.idempotency_max_entries,
+    ttl_s=settings.idempotency_ttl_s,
+)
@@ -0,0 +1,217 @@
+"""Append-only journal of applies, undo/redo and client confirms on local disk.
+
+Records are orjson payloads framed as `<u32 length><u32 crc32><payload>` in
+segment files named `<start ms>-<pid>-<seq>.jnl`, so several workers can share
+one directory. Callers only encode and enqueue; a writer thread appends
+whatever has queued up in one write and one fdatasync (group commit), at most
+once per `JOURNAL_FSYNC_INTERVAL_MS`. A full queue drops records (counted)
+rather than making requests wait on disk.
+
+Offline replay: `python -m app.journal DIR [--mmap] [--type apply]` prints the
+records as NDJSON, oldest segment first. A torn record at a segment tail ends
+that segment's replay.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import atexit
+import logging
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+import orjson
+from .config import settings
+from .metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+_HEAD = struct.Struct("<II")
+_SUFFIX = ".jnl"
+_MAX_BATCH = 4096
+
+# Written by the writer thread (records, fsync) and by any thread appending (dropped)
+journal_records = Counter("journal_records_total", "Journal records written", ("type",))
+journal_dropped = Counter("journal_records_dropped_total", "Journal records dropped because the writer queue was full", shared=True)
+journal_fsync_seconds = Histogram("journal_fsync_seconds", "Journal group commit (write + fdatasync) duration")
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    payload = orjson.dumps(record, default=str)
+    return _HEAD.pack(len(payload), zlib.crc32(payload)) + payload
+
+class Journal:
+    """Background group-commit writer; disabled when `directory` is empty."""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync_interval_s: float = 0.05,
+        queue_size: int = 10000,
+        fsync: bool = True,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval_s = fsync_interval_s
+        self.fsync = fsync
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._fd = -1
+        self._size = 0
+        self._seq = 0
+        self._prefix = ""
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def append(self, record: Dict[str, Any]) -> bool:
+        """Encode on the caller (records may reference live state) and enqueue; never blocks."""
+        if self._thread is None:
+            return False
+        record.setdefault("ts", round(time.time(), 3))
+        try:
+            self._queue.put_nowait((record.get("type", ""), encode_record(record)))
+            return True
+        except queue.Full:
+            journal_dropped.inc()
+            return False
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._prefix = f"{int(time.time() * 1000):013d}-{os.getpid()}"
+        self._seq = 0
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write out everything queued, then close the segment."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join()
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _open_segment(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+        self._seq += 1
+        path = os.path.join(self.directory, f"{self._prefix}-{self._seq:06d}{_SUFFIX}")
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+        self._size = 0
+
+    def _run(self) -> None:
+        last_sync = 0.0
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            # Let records pile up until the next commit slot, then take all of them
+            wait = last_sync + self.fsync_interval_s - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            batch = [first]
+            while len(batch) < _MAX_BATCH:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            last_sync = time.monotonic()
+            try:
+                self._commit(batch)
+            except OSError as e:
+                logger.error("journal.write_failed %d records lost: %s", len(batch), e)
+            journal_fsync_seconds.observe(time.monotonic() - last_sync)
+
+    def _commit(self, batch: List[tuple]) -> None:
+        data = b"".join(b for _, b in batch)
+        if self._size and self._size + len(data) > self.segment_bytes:
+            self._open_segment()
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        self._size += len(data)
+        if self.fsync:
+            os.fdatasync(self._fd)
+        counts: Dict[str, int] = {}
+        for kind, _ in batch:
+            counts[kind] = counts.get(kind, 0) + 1
+        for kind, n in counts.items():
+            journal_records.labels(kind).inc(n)
+
+def segments(directory: str) -> List[str]:
+    """Segment paths, oldest first (per worker: start time, pid, sequence)."""
+    names = sorted(n for n in os.listdir(directory) if n.endswith(_SUFFIX))
+    return [os.path.join(directory, n) for n in names]
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Sequential buffered reader."""
+    with open(path, "rb", buffering=1 << 20) as f:
+        while True:
+            head = f.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                return
+            n, crc = _HEAD.unpack(head)
+            payload = f.read(n)
+            if len(payload) < n or zlib.crc32(payload) != crc:
+                return
+            yield orjson.loads(payload)
+
+def mmap_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Zero-copy reader: payloads are parsed straight out of the mapped file."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            off = 0
+            while off + _HEAD.size <= size:
+                n, crc = _HEAD.unpack_from(m, off)
+                start, end = off + _HEAD.size, off + _HEAD.size + n
+                if end > size:
+                    return
+                with memoryview(m)[start:end] as payload:
+                    if zlib.crc32(payload) != crc:
+                        return
+                    record = orjson.loads(payload)
+                yield record
+                off = end
+
+def replay(directory: str, use_mmap: bool = False) -> Iterator[Dict[str, Any]]:
+    read = mmap_segment if use_mmap else read_segment
+    for path in segments(directory):
+        yield from read(path)
+
+journal = Journal(
+    settings.journal_dir,
+    segment_bytes=settings.journal_segment_mb * 1024 * 1024,
+    fsync_interval_s=settings.journal_fsync_interval_ms / 1000.0,
+    queue_size=settings.journal_queue_size,
+    fsync=settings.journal_fsync,
+)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Dump journal records as NDJSON")
+    ap.add_argument("directory", nargs="?", default=settings.journal_dir)
+    ap.add_argument("--mmap", action="store_true", help="read segments via mmap")
+    ap.add_argument("--type", help="only records of this type (apply, undo, redo, confirm)")
+    args = ap.parse_args()
+    out = sys.stdout.buffer
+    for rec in replay(args.directory, use_mmap=args.mmap):
+        if args.type is None or rec.get("type") == args.type:
+            out.write(orjson.dumps(rec) + b"\n")
@@ -0,0 +1,134 @@
+"""Per-worker admission control for upstream LLM calls.
+
+At most `max_inflight` calls run at once. Extra callers wait in a bounded
+queue; freed slots are handed out round-robin across users so one client
+cannot starve the others. Callers that cannot be queued, or wait longer than
+`queue_timeout_s`, are shed with `Overloaded` (surfaced as 503 + Retry-After).
+A wait cut short by the caller's request deadline raises `DeadlineExceeded` (504).
+"""
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Optional
+import asyncio
+from fastapi import HTTPException, status
+from .config import settings
+from .deadline import Deadline, DeadlineExceeded
+
+class Overloaded(Exception):
+    def __init__(self, retry_after_s: float):
+        super().__init__("upstream capacity exhausted")
+        self.retry_after_s = retry_after_s
+
+class AdmissionController:
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout_s: float, retry_after_s: float = 1.0):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.retry_after_s = retry_after_s
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    async def acquire(self, user: Optional[str] = None, timeout_s: Optional[float] = None) -> Callable[[], None]:
+        """Wait for a slot (at most `timeout_s` if shorter than the queue timeout); returns an idempotent release callback.
+
+        Raises `DeadlineExceeded` instead of `Overloaded` when `timeout_s` (the request deadline) ended the wait.
+        """
+        if self.in_flight < self.max_inflight and not self.queued:
+            self.in_flight += 1
+            return self._releaser()
+        if self.queued >= self.max_queue:
+            raise Overloaded(self.retry_after_s)
+
+        key = user or ""
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(fut)
+        self.queued += 1
+        by_deadline = timeout_s is not None and timeout_s < self.queue_timeout_s
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout_s if by_deadline else self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # A slot was handed over just as we gave up; pass it on
+                self._release()
+            else:
+                fut.cancel()
+                self._forget(key, fut)
+            if isinstance(e, asyncio.TimeoutError):
+                if by_deadline:
+                    raise DeadlineExceeded()
+                raise Overloaded(self.retry_after_s)
+            raise
+        return self._releaser()
+
+    def try_acquire(self) -> Optional[Callable[[], None]]:
+        """A slot only if one is free with nobody queued (for optional work such as hedged requests)."""
+        if self.in_flight < self.max_inflight and not self.queued:
+            self.in_flight += 1
+            return self._releaser()
+        return None
+
+    def _forget(self, key: str, fut: asyncio.Future) -> None:
+        q = self._waiters.get(key)
+        if q is None:
+            return
+        try:
+            q.remove(fut)
+            self.queued -= 1
+        except ValueError:
+            pass
+        if not q:
+            del self._waiters[key]
+
+    def _releaser(self) -> Callable[[], None]:
+        released = False
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release()
+        return release
+
+    def _release(self) -> None:
+        # Hand the slot to the next waiting user in round-robin order
+        while self._waiters:
+            key, q = next(iter(self._waiters.items()))
+            fut = q.popleft()
+            self.queued -= 1
+            if q:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+llm_gate = AdmissionController(
+    max_inflight=settings.llm_max_inflight,
+    max_queue=settings.llm_max_queue,
+    queue_timeout_s=settings.llm_queue_timeout_s,
+    retry_after_s=settings.llm_retry_after_s,
+)
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Upstream capacity exhausted, retry shortly",
+        headers={"Retry-After": str(max(1, round(e.retry_after_s)))},
+    )
+
+async def acquire_llm_slot(user: Optional[str], deadline: Optional[Deadline] = None) -> Callable[[], None]:
+    """Take an upstream slot or raise 503 (`DeadlineExceeded` past the deadline); for streaming routes that release later."""
+    try:
+        return await llm_gate.acquire(user, deadline.check() if deadline is not None else None)
+    except Overloaded as e:
+        raise overloaded_error(e)
+
+@asynccontextmanager
+async def llm_slot(user: Optional[str], deadline: Optional[Deadline] = None):
+    release = await acquire_llm_slot(user, deadline)
+    try:
+        yield
+    finally:
+        release()
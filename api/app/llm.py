@@ -0,0 +1,39 @@
+import httpx
+from openai import AsyncOpenAI
+from .config import settings
+
+_client: AsyncOpenAI | None = None
+
+def _http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.openai_max_connections,
+        max_keepalive_connections=settings.openai_max_keepalive_connections,
+        keepalive_expiry=settings.openai_keepalive_expiry_s,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=settings.openai_timeout_s,
+        http2=settings.openai_http2,
+    )
+
+def init_client() -> AsyncOpenAI:
+    """Create the per-worker OpenAI client (called from the app lifespan)."""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            timeout=settings.openai_timeout_s,
+            http_client=_http_client(),
+        )
+    return _client
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def get_client() -> AsyncOpenAI:
+    # Lazily create the client when running without the lifespan (e.g. scripts)
+    return _client or init_client()
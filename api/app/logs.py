@@ -0,0 +1,219 @@
+"""Structured JSON logging that never blocks the event loop.
+
+Records are frozen on the calling thread (message rendered with bounded
+size, request context attached) and handed to a bounded queue; a background
+thread does the JSON encoding and the write to stdout. When the sink backs up
+the queue fills and further records are dropped and counted instead of
+stalling requests.
+"""
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+import atexit
+import logging
+import queue
+import random
+import reprlib
+import sys
+import time
+import uuid
+import orjson
+from .config import settings
+from .metrics import Counter
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+request_start_var: ContextVar[Optional[float]] = ContextVar("request_start", default=None)
+
+# Logging calls come from any thread (the journal writer, executor threads)
+log_dropped = Counter("log_records_dropped_total", "Log records dropped because the writer queue was full", shared=True)
+
+# Standard LogRecord attributes; anything else passed via `extra=` is emitted as a field
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+def _parse_map(spec: str, cast) -> Dict[str, object]:
+    """"app.routers.assistant=1000,httpx=200" -> {"app.routers.assistant": 1000, "httpx": 200}"""
+    out: Dict[str, object] = {}
+    for part in spec.split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = cast(value.strip())
+    return out
+
+class _Limits:
+    """Per-logger message size and oversize sample rate, resolved by longest name prefix."""
+
+    def __init__(self, default_chars: int, chars: Dict[str, object], sample: Dict[str, object]):
+        self.default_chars = default_chars
+        self.chars = chars
+        self.sample = sample
+        self._cache: Dict[str, Tuple[int, float]] = {}
+
+    def _lookup(self, table: Dict[str, object], name: str, default):
+        while name:
+            if name in table:
+                return table[name]
+            name = name.rpartition(".")[0]
+        return default
+
+    def for_logger(self, name: str) -> Tuple[int, float]:
+        hit = self._cache.get(name)
+        if hit is None:
+            hit = self._cache[name] = (
+                int(self._lookup(self.chars, name, self.default_chars)),
+                float(self._lookup(self.sample, name, 1.0)),
+            )
+        return hit
+
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+
+def _bounded_repr(limit: int) -> reprlib.Repr:
+    r = reprlib.Repr()
+    r.maxlevel = 4
+    r.maxdict = r.maxlist = r.maxtuple = r.maxset = 32
+    r.maxstring = r.maxother = r.maxlong = max(16, limit)
+    return r
+
+class BoundedQueueHandler(QueueHandler):
+    """Freeze and bound records on the caller thread, then enqueue without blocking."""
+
+    def __init__(self, q: "queue.Queue", limits: _Limits):
+        super().__init__(q)
+        self.limits = limits
+        self._reprs: Dict[int, reprlib.Repr] = {}
+
+    def _render(self, record: logging.LogRecord, limit: int) -> str:
+        msg = str(record.msg)
+        if record.args:
+            # Large args (plans, tool arguments) are rendered with a bounded repr,
+            # so the cost here does not grow with the payload
+            r = self._reprs.get(limit) or self._reprs.setdefault(limit, _bounded_repr(limit))
+
+            def bound(a):
+                if isinstance(a, (int, float)):
+                    return a
+                if isinstance(a, _CONTAINERS):
+                    return r.repr(a)
+                return str(a)[:limit + 1]
+
+            if isinstance(record.args, dict):
+                # logging unpacks a lone mapping argument; it is a payload unless the format uses %(key)s
+                args = {k: bound(v) for k, v in record.args.items()} if "%(" in msg else (r.repr(record.args),)
+            else:
+                args = tuple(bound(a) for a in record.args)
+            try:
+                msg = msg % args
+            except (TypeError, ValueError, KeyError):
+                msg = msg + " " + str(args)
+        return msg
+
+    def prepare(self, record: logging.LogRecord) -> Optional[logging.LogRecord]:
+        limit, rate = self.limits.for_logger(record.name)
+        msg = self._render(record, limit)
+        if len(msg) > limit:
+            if rate < 1.0 and record.levelno < logging.WARNING and random.random() >= rate:
+                return None
+            record.truncated = True
+            msg = msg[:limit]
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg, record.args, record.message = msg, None, msg
+        record.request_id = request_id_var.get()
+        start = request_start_var.get()
+        if start is not None:
+            record.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            prepared = self.prepare(record)
+            if prepared is not None:
+                self.queue.put_nowait(prepared)
+        except queue.Full:
+            log_dropped.inc()
+        except Exception:
+            self.handleError(record)
+
+class ORJSONLogger(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "name": record.name,
+        }
+        for k, v in record.__dict__.items():
+            if k not in _RESERVED and v is not None:
+                payload[k] = v
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return orjson.dumps(payload, default=str).decode()
+
+_listener: Optional[QueueListener] = None
+_atexit_registered = False
+
+def setup_logging() -> None:
+    global _listener, _atexit_registered
+    stop_logging()
+    if not _atexit_registered:
+        atexit.register(stop_logging)
+        _atexit_registered = True
+    sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(ORJSONLogger())
+    q: "queue.Queue" = queue.Queue(maxsize=settings.log_queue_size)
+    limits = _Limits(
+        settings.log_max_chars,
+        _parse_map(settings.log_limits, int),
+        _parse_map(settings.log_sample, float),
+    )
+    root = logging.getLogger()
+    root.handlers = [BoundedQueueHandler(q, limits)]
+    root.setLevel(logging.INFO)
+    _listener = QueueListener(q, sink, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging() -> None:
+    """Drain the queue and stop the writer thread (shutdown, or before re-setup)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+_access = logging.getLogger("app.access")
+
+class RequestContextMiddleware:
+    """Tag each request with an id (X-Request-ID, echoed back) and start time for log records."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rid = None
+        for k, v in scope["headers"]:
+            if k == b"x-request-id":
+                rid = v.decode("latin-1")[:128]
+                break
+        rid = rid or uuid.uuid4().hex
+        t0 = time.perf_counter()
+        id_token = request_id_var.set(rid)
+        start_token = request_start_var.set(t0)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if settings.log_requests:
+                _access.info("request.done", extra={
+                    "method": scope["method"], "path": scope["path"], "status": status[0],
+                    "duration_ms": round((time.perf_counter() - t0) * 1000, 2),
+                })
+            request_start_var.reset(start_token)
+            request_id_var.reset(id_token)
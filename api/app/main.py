@@ -1,28 +1,36 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import logging, sys, orjson
+from fastapi.responses import JSONResponse
 from .config import settings
-from .routers import chat, health, assistant
-
-class ORJSONLogger(logging.Formatter):
-    def format(self, record):
-        payload = {
-            "level": record.levelname,
-            "msg": record.getMessage(),
-            "name": record.name,
-        }
-        return orjson.dumps(payload).decode()
-
-def setup_logging():
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(ORJSONLogger())
-    root = logging.getLogger()
-    root.handlers = [handler]
-    root.setLevel(logging.INFO)
+from .deadline import DeadlineExceeded
+from .journal import journal
+from .llm import init_client, close_client
+from .logs import RequestContextMiddleware, setup_logging
+from .metrics import MetricsMiddleware
+from .responses import CompressionMiddleware
+from .routers import chat, health, assistant, metrics, sessions
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled OpenAI client per worker process. Without a key the client is
+    # created lazily so health checks still come up and LLM routes report the error.
+    if settings.openai_api_key:
+        init_client()
+    journal.start()
+    try:
+        yield
+    finally:
+        await close_client()
+        journal.stop()
+
+async def _deadline_exceeded(request: Request, exc: DeadlineExceeded) -> JSONResponse:
+    return JSONResponse({"detail": str(exc)}, status_code=504)
 
 def create_app() -> FastAPI:
     setup_logging()
-    app = FastAPI(title="Egg API", version="1.0.0")
+    app = FastAPI(title="Egg API", version="1.0.0", lifespan=lifespan)
+    app.add_exception_handler(DeadlineExceeded, _deadline_exceeded)
 
     app.add_middleware(
         CORSMiddleware,
@@ -31,10 +39,19 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(
+        CompressionMiddleware,
+        min_size=settings.compress_min_bytes,
+        preference=tuple(e.strip() for e in settings.compress_encodings if e.strip()),
+    )
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(RequestContextMiddleware)
 
     app.include_router(health.router)
+    app.include_router(metrics.router)
     app.include_router(chat.router)
     app.include_router(assistant.router)
+    app.include_router(sessions.router)
     return app
 
 app = create_app()
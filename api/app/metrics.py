@@ -0,0 +1,215 @@
+"""In-process counters and histograms, exposed in Prometheus text format at /metrics.
+
+Recording is a dict lookup plus a bisect and two integer adds, without locks:
+each metric is updated from one thread (normally the event loop). Creating a
+labelled child and rendering take a lock, so the journal and log writer threads
+can add children while /metrics iterates them; counters those threads share
+with others are created with `shared=True` and lock each increment. Numbers are
+per worker.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+
+_lock = threading.Lock()
+
+LabelValues = Tuple[str, ...]
+
+# seconds: 0.5 ms .. ~65 s
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(0.0005 * 2 ** i for i in range(18))
+RATE_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+class _SharedCounterChild(_CounterChild):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with _lock:
+            self.value += amount
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with _lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _items(self) -> List[Tuple[LabelValues, object]]:
+        with _lock:
+            return list(self._children.items())
+
+    def _label_str(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), shared: bool = False):
+        self.shared = shared
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> _CounterChild:
+        return _SharedCounterChild() if self.shared else _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def render(self, out: List[str]) -> None:
+        for values, child in self._items():
+            out.append(f"{self.name}{self._label_str(values)} {child.value}")
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self, out: List[str]) -> None:
+        for values, child in self._items():
+            acc = 0
+            for bound, n in zip(self.buckets, child.counts):
+                acc += n
+                le = 'le="%g"' % bound
+                out.append(f"{self.name}_bucket{self._label_str(values, le)} {acc}")
+            acc += child.counts[-1]
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{self._label_str(values, le)} {acc}")
+            out.append(f"{self.name}_sum{self._label_str(values)} {child.sum}")
+            out.append(f"{self.name}_count{self._label_str(values)} {acc}")
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY: List[_Metric] = []
+
+def render_prometheus() -> str:
+    out: List[str] = []
+    for m in REGISTRY:
+        out.append(f"# HELP {m.name} {m.help}")
+        out.append(f"# TYPE {m.name} {m.kind}")
+        m.render(out)
+    return "\n".join(out) + "\n"
+
+# --- metrics recorded by the app ---
+
+http_request_seconds = Histogram("http_request_duration_seconds", "Request latency (streams: until the last byte)", ("route", "method", "status"))
+stream_ttft_seconds = Histogram("stream_time_to_first_token_seconds", "Time from request to first upstream token", ("route",))
+stream_tokens_per_second = Histogram("stream_tokens_per_second", "Upstream token rate after the first token", ("route",), buckets=RATE_BUCKETS)
+upstream_seconds = Histogram("upstream_request_duration_seconds", "OpenAI call latency (streams: until headers)", ("model",))
+upstream_errors = Counter("upstream_errors_total", "OpenAI call failures", ("model", "error"))
+upstream_retries = Counter("upstream_retries_total", "OpenAI calls retried after 429/5xx", ("route", "status"))
+upstream_hedges = Counter("upstream_hedges_total", "Hedged OpenAI requests (started, won, no_slot)", ("route", "outcome"))
+plan_seconds = Histogram("actionbus_execute_plan_seconds", "ActionBus.execute_plan duration", ("mode",))
+dispatch_total = Counter("actionbus_dispatch_total", "Actions dispatched", ("type",))
+local_intents = Counter("assistant_local_intents_total", "Prompts answered by the local command recognizer, by intent (none/rejected: sent to the model)", ("intent",))
+sse_frames = Counter("sse_frames_total", "SSE frames sent", ("route",))
+sse_bytes = Counter("sse_bytes_total", "SSE bytes sent", ("route",))
+
+class upstream_timer:
+    """`with upstream_timer(model): await client.chat.completions.create(...)`"""
+    __slots__ = ("model", "t0")
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def __enter__(self) -> "upstream_timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        upstream_seconds.labels(self.model).observe(time.perf_counter() - self.t0)
+        if isinstance(exc, Exception):
+            upstream_errors.labels(self.model, type(exc).__name__).inc()
+
+class StreamTimer:
+    """Time-to-first-token and tokens/sec for one streaming response."""
+    __slots__ = ("route", "t0", "first", "tokens")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.t0 = time.perf_counter()
+        self.first: Optional[float] = None
+        self.tokens = 0
+
+    def token(self) -> None:
+        if self.first is None:
+            self.first = time.perf_counter()
+            stream_ttft_seconds.labels(self.route).observe(self.first - self.t0)
+        self.tokens += 1
+
+    def done(self) -> None:
+        if self.first is None or self.tokens < 2:
+            return
+        dt = time.perf_counter() - self.first
+        if dt > 0:
+            stream_tokens_per_second.labels(self.route).observe((self.tokens - 1) / dt)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency per matched route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.labels(path, scope["method"], str(status[0])).observe(time.perf_counter() - t0)
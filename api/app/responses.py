@@ -0,0 +1,152 @@
+"""Response encoding: orjson for plain JSON payloads, negotiated compression.
+
+`ORJSONRoute` makes routes that return a plain dict/list skip FastAPI's
+`jsonable_encoder` pass and serialize once with orjson. `CompressionMiddleware`
+compresses complete (single-body) responses above a size threshold with the
+best encoding the client accepts; streamed bodies (SSE, NDJSON) pass through.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import functools
+import gzip
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from .config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+class ORJSONRoute(APIRoute):
+    """APIRoute whose dict/list results are wrapped in an ORJSONResponse directly."""
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            status_code = self.status_code or 200
+
+            @functools.wraps(call)
+            async def endpoint(**values):
+                result = await call(**values)
+                if type(result) is dict or type(result) is list:
+                    return ORJSONResponse(result, status_code=status_code)
+                return result
+
+            self.dependant.call = endpoint
+        return super().get_route_handler()
+
+def _compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    out: Dict[str, Callable[[bytes], bytes]] = {
+        "gzip": lambda b: gzip.compress(b, compresslevel=settings.compress_gzip_level, mtime=0),
+    }
+    if zstandard is not None:
+        zc = zstandard.ZstdCompressor(level=settings.compress_zstd_level)
+        out["zstd"] = zc.compress
+    if brotli is not None:
+        out["br"] = lambda b: brotli.compress(b, quality=settings.compress_brotli_quality)
+    return out
+
+COMPRESSORS = _compressors()
+
+def choose_encoding(accept: str, preference: List[str]) -> Optional[str]:
+    """Pick the first server-preferred encoding the Accept-Encoding header allows."""
+    accepted: Dict[str, float] = {}
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for enc in preference:
+        if accepted.get(enc, wildcard) > 0 and enc in COMPRESSORS:
+            return enc
+    return None
+
+def _vary(start: dict) -> dict:
+    """The response start message with Accept-Encoding added to its Vary header."""
+    headers = list(start.get("headers", []))
+    for i, (k, v) in enumerate(headers):
+        if k == b"vary":
+            if v.strip() == b"*" or b"accept-encoding" in v.lower():
+                return start
+            headers[i] = (k, v + b", Accept-Encoding")
+            break
+    else:
+        headers.append((b"vary", b"Accept-Encoding"))
+    return {**start, "headers": headers}
+
+class CompressionMiddleware:
+    """Compress complete responses of at least `min_size` bytes (not event streams)."""
+
+    def __init__(self, app, min_size: int = 1024, preference: Tuple[str, ...] = ("zstd", "br", "gzip")):
+        self.app = app
+        self.min_size = min_size
+        self.preference = list(preference)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.min_size <= 0:
+            return await self.app(scope, receive, send)
+        accept = ""
+        for k, v in scope["headers"]:
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1")
+                break
+        encoding = choose_encoding(accept, self.preference) if accept else None
+        start: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                skip = any(
+                    (k == b"content-encoding")
+                    or (k == b"content-type" and (v.startswith(b"text/event-stream") or v.startswith(b"application/x-ndjson")))
+                    for k, v in headers
+                )
+                if skip:
+                    passthrough = True
+                    await send(message)
+                elif encoding is None:
+                    # Not compressed, but another Accept-Encoding could have changed that
+                    passthrough = True
+                    await send(_vary(message))
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            if start is not None:
+                body = message.get("body", b"")
+                head, start = start, None
+                if message.get("more_body", False) or len(body) < self.min_size:
+                    # Streaming or small: send as is
+                    passthrough = True
+                    await send(_vary(head))
+                    await send(message)
+                    return
+                body = COMPRESSORS[encoding](body)
+                headers = [(k, v) for k, v in _vary(head)["headers"] if k != b"content-length"]
+                headers += [
+                    (b"content-encoding", encoding.encode()),
+                    (b"content-length", str(len(body)).encode()),
+                ]
+                await send({**head, "headers": headers})
+                await send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
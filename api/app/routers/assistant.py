@@ -1,16 +1,36 @@
+import asyncio
 import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, Body, Depends, Request
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
 from openai import AsyncOpenAI
+import orjson
 from ..deps import auth_dependency
 from ..config import settings
+from ..deadline import Deadline, DeadlineExceeded, deadline_dependency
+from ..llm import get_client
+from ..limiter import Overloaded, acquire_llm_slot, llm_gate, llm_slot
+from ..cache import TTLCache, hash_key
+from ..idempotency import KeyReused, idempotency
+from ..journal import journal
+from ..metrics import StreamTimer, local_intents, upstream_timer
+from .. import upstream
+from ..responses import ORJSONRoute
+from ..sessions import Session, compact, session_store
+from ..sse import DONE, DeltaCoalescer, DisconnectWatch, event_stream, sse, sse_delta, sse_error
 from ..daw.schema import execute_actions_tool
 from ..daw.action_bus import ActionBus
+from ..daw.describe import describe_plan
+from ..daw.intents import SAFE_ACTIONS, match_intent
+from ..daw.optimize import coalesce_diffs, optimize_plan
+from ..daw.plan_stream import PlanItemParser
+from ..daw.summary import CHARS_PER_TOKEN, encode_summary
+from ..daw.tempo import TempoMap
+from ..daw.state import PatchError, VersionConflict, invert_patch, project_store
 
-router = APIRouter(prefix="/v1", tags=["assistant"])
+router = APIRouter(prefix="/v1", tags=["assistant"], route_class=ORJSONRoute)
 logger = logging.getLogger(__name__)
 
 SYSTEM = (
@@ -19,6 +39,23 @@ SYSTEM = (
     "Use only IDs provided in the project summary."
 )
 
+# Model outcomes ({"type":"text","content"} or {"type":"plan","plan"}) keyed by prompt hash
+response_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    max_entries=settings.assistant_cache_max_entries,
+    ttl_s=settings.assistant_cache_ttl_s,
+)
+
+# applyId -> orjson entry {project_id, user, version, undone, diffs, inverse}; serialized so
+# later patches to the live project state cannot alias into the log
+undo_log: TTLCache[bytes] = TTLCache(
+    max_entries=settings.undo_log_max_entries,
+    ttl_s=settings.undo_log_ttl_s,
+)
+
+def _cache_key(model: str, messages: List[Dict[str, str]]) -> bytes:
+    # Whitespace-insensitive so UI retries of the "same" prompt still hit
+    return hash_key(model, execute_actions_tool["name"], [(m["role"], " ".join(m["content"].split())) for m in messages])
+
 def _map_conversation(conversation: Optional[List[Dict[str, Any]]]) -> List[Dict[str, str]]:
     if not conversation:
         return []
@@ -35,189 +72,529 @@ def _map_conversation(conversation: Optional[List[Dict[str, Any]]]) -> List[Dict
         mapped.append({"role": role, "content": text})
     return mapped
 
-def make_messages(project_summary: Dict[str, Any], user_prompt: str, conversation: Optional[List[Dict[str, Any]]] = None):
+def _load_project(
+    project_id: Optional[str],
+    version: Optional[int],
+    project_summary: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], Optional[int]]:
+    """Resolve the project for a request.
+
+    With `project_id`, an uploaded `project_summary` replaces the stored snapshot;
+    otherwise the stored state is used and `version` (if given) must match it.
+    Returns (summary, version); version is None for stateless requests.
+    """
+    if not project_id:
+        return project_summary or {}, None
+    if project_summary is not None:
+        return project_summary, project_store.put(project_id, project_summary)
+    found = project_store.get(project_id)
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown project_id; re-send project_summary")
+    doc, current = found
+    if version is not None and version != current:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"error": "stale project version", "version": current})
+    return doc, current
+
+def _commit_project(
+    project_id: Optional[str],
+    diffs: List[Dict[str, Any]],
+    version: Optional[int],
+    undo: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[int]:
+    """Apply diffs to the stored project state; returns the new version."""
+    if not project_id or version is None:
+        return None
+    try:
+        return project_store.apply(project_id, diffs, base_version=version, undo=undo)
+    except VersionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"error": "stale project version", "version": e.current})
+    except (KeyError, PatchError) as e:
+        logger.warning("assistant.project_store.drop %s: %s", project_id, e)
+        return None
+
+def _owner(user: Optional[str]) -> Optional[str]:
+    return hash_key(user).hex() if user else None
+
+def _commit_apply(
+    apply_id: str,
+    project_id: Optional[str],
+    diffs: List[Dict[str, Any]],
+    version: Optional[int],
+    project_summary: Dict[str, Any],
+    user: Optional[str],
+    plan: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[int]:
+    """Commit an applied plan, journal it and log its inverse patch under `apply_id`; returns the new version.
+
+    With server-side state the inverse is recorded while patching it. Stateless
+    applies are inverted against the uploaded summary, so their undo is only as
+    complete as that summary; without one nothing is logged. A plan that changed
+    nothing is neither journaled nor logged.
+    """
+    if not diffs:
+        return _commit_project(project_id, diffs, version)
+    inverse: List[Dict[str, Any]] = []
+    stateful = bool(project_id) and version is not None
+    new_version = _commit_project(project_id, diffs, version, inverse)
+    journal.append({
+        "type": "apply", "applyId": apply_id, "project_id": project_id, "user": _owner(user),
+        "base_version": version, "version": new_version, "plan": plan, "diffs": diffs,
+    })
+    if stateful and new_version is None:
+        return None
+    if not stateful:
+        if not project_summary:
+            return new_version
+        try:
+            inverse = invert_patch(project_summary, diffs)
+        except PatchError as e:
+            logger.warning("assistant.undo.skip %s: %s", apply_id, e)
+            return new_version
+    undo_log.set(apply_id, orjson.dumps({
+        "project_id": project_id if stateful else None,
+        "user": _owner(user),
+        "version": new_version,
+        "undone": False,
+        "diffs": diffs,
+        "inverse": inverse,
+    }))
+    return new_version
+
+def _local_outcome(
+    prompt: str,
+    project_summary: Dict[str, Any],
+    project_id: Optional[str],
+    version: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """Plan/text for a recognized simple command that passes a dry run, else None (ask the model).
+
+    A plan outcome carries that dry run as `preview` (a `_PlanPreview`), so callers need not repeat it.
+    """
+    if not settings.assistant_local_intents:
+        return None
+    hit = match_intent(prompt, project_summary)
+    if hit is None:
+        local_intents.labels("none").inc()
+        return None
+    intent, outcome = hit
+    if outcome["type"] == "plan":
+        preview = _PlanPreview.of(_bus_for(project_summary, project_id), outcome["plan"], version)
+        if preview.failed:
+            local_intents.labels("rejected").inc()
+            return None
+        outcome = {**outcome, "preview": preview}
+    local_intents.labels(intent).inc()
+    return outcome
+
+def _bus_for(project_summary: Dict[str, Any], project_id: Optional[str] = None, tempo: Optional[TempoMap] = None) -> ActionBus:
+    """A bus for the summary; with `project_id` it checks against the stored state and its clip index."""
+    tempo = tempo or TempoMap.from_summary(project_summary)
+    stateful = project_id is not None
+    return ActionBus(
+        project_root=project_summary.get("projectRoot",""),
+        bpm=tempo.bpms[0],
+        beat_unit=tempo.beat_unit,
+        state=project_summary if stateful else None,
+        tempo=tempo,
+        timeline=project_store.timeline(project_id) if stateful else None,
+    )
+
+def make_messages(
+    project_summary: Dict[str, Any],
+    user_prompt: str,
+    conversation: Optional[List[Dict[str, Any]]] = None,
+    session: Optional[Session] = None,
+):
     msgs: List[Dict[str, str]] = [
         {"role":"system","content": SYSTEM},
-        {"role":"system","content": f"PROJECT SUMMARY: {json.dumps(project_summary)[:6000]}"},
+        {"role":"system","content": f"PROJECT SUMMARY: {encode_summary(project_summary, settings.summary_token_budget)}"},
     ]
-    msgs.extend(_map_conversation(conversation))
+    msgs.extend(session.messages() if session is not None else _map_conversation(conversation))
     if not msgs or not (msgs[-1].get("role") == "user" and msgs[-1].get("content") == user_prompt):
         msgs.append({"role":"user",  "content": user_prompt})
     return msgs
 
-async def generate_apply_message(client: AsyncOpenAI, plan: List[Dict[str, Any]], project_summary: Optional[Dict[str, Any]] = None) -> str:
+_COMPACT_SYSTEM = (
+    "You maintain a running summary of a conversation between a user and a DAW assistant. "
+    "Merge the summary so far with the new turns into one updated summary of at most {tokens} tokens. "
+    "Keep decisions, names, IDs and open requests; drop small talk."
+)
+
+# Strong references to fire-and-forget tasks (session compaction)
+_background: Set["asyncio.Task[None]"] = set()
+
+def _load_session(session_id: Optional[str], conversation: Optional[List[Dict[str, Any]]], prompt: str, user: Optional[str]) -> Optional[Session]:
+    """Resolve the server-side conversation for a request.
+
+    With `conversation` the session is (re)seeded from it; otherwise the stored
+    history is used. The current prompt is recorded with the reply, so a
+    trailing copy of it in `conversation` is not seeded.
+    """
+    if not session_id:
+        return None
+    owner = _owner(user)
+    session = session_store.get(session_id)
+    if session is not None and session.owner and session.owner != owner:
+        session = None
+    elif conversation is not None:
+        session = Session(owner)
+        mapped = _map_conversation(conversation)
+        if mapped and mapped[-1]["role"] == "user" and mapped[-1]["content"] == prompt:
+            mapped.pop()
+        for m in mapped:
+            session.add(m["role"], m["content"])
+        _compact_session(session, user)
+        session_store.set(session_id, session)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown session_id; re-send conversation")
+    return session
+
+def _record_turn(session_id: Optional[str], session: Optional[Session], prompt: str, reply: str, user: Optional[str]) -> None:
+    if session is None:
+        return
+    session.add("user", prompt)
+    session.add("assistant", reply)
+    _compact_session(session, user)
+    session_store.set(session_id, session)  # refreshes the TTL
+
+def _compact_session(session: Session, user: Optional[str]) -> None:
+    folded = compact(session)
+    if folded is None or session.compacting or not settings.session_llm_compaction:
+        return
+    session.compacting = True
+    task = asyncio.create_task(_summarize_session(session, folded[0], folded[1], user))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+async def _summarize_session(session: Session, previous: str, turns: List[Tuple[str, str, int]], user: Optional[str]) -> None:
+    """Replace the deterministic fold with an LLM summary, unless more turns were folded meanwhile."""
+    folded = session.summary
+    budget_chars = settings.session_summary_tokens * CHARS_PER_TOKEN
+    transcript = "\n".join(f"{role}: {content}" for role, content, _ in turns)[-6000:]
+    msgs = [
+        {"role": "system", "content": _COMPACT_SYSTEM.format(tokens=settings.session_summary_tokens)},
+        {"role": "user", "content": f"SUMMARY SO FAR:\n{previous or '(none)'}\n\nNEW TURNS:\n{transcript}"},
+    ]
     try:
-        sys_prompt = (
-            "You have successfully applied the user's requested changes in a DAW. "
-            "Given the applied action plan, reply with a concise confirmation (1-2 sentences) in past tense, "
-            "mentioning only the essentials (no code, no tool names)."
-        )
-        msgs = [
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": f"PLAN:\n{json.dumps(plan)[:6000]}\n\nPROJECT SUMMARY:\n{json.dumps(project_summary or {})[:4000]}"},
-        ]
-        resp = await client.chat.completions.create(
-            model=settings.openai_model,
-            messages=msgs,
-        )
-        return resp.choices[0].message.content or "Applied requested changes."
+        client = get_client()
+        async with llm_slot(user):
+            with upstream_timer(settings.openai_model):
+                resp = await upstream.create(client, "session.summary",
+                    model=settings.openai_model,
+                    messages=msgs,
+                    max_tokens=settings.session_summary_tokens,
+                )
+        text = (resp.choices[0].message.content or "").strip()
+        if text and session.summary == folded:
+            session.set_summary(text[:budget_chars])
     except Exception as e:
-        logger.warning("assistant.apply_message.fallback: %s", e)
-        # Fallback: simple deterministic summary
-        try:
-            parts = []
-            for a in plan:
-                t = a.get("type")
-                if t == "project.setTitle":
-                    parts.append(f"set project title to '{a.get('title')}'")
-                elif t == "transport.play":
-                    parts.append("started playback")
-                elif t == "transport.stop":
-                    parts.append("stopped playback")
-                elif t == "loop.set":
-                    parts.append(f"set loop to startBeat={a.get('startBeat')} lengthBeats={a.get('lengthBeats')}")
-                elif t == "track.add":
-                    parts.append(f"added track '{a.get('name')}'")
-                elif t == "track.rename":
-                    parts.append(f"renamed track {a.get('trackId')} to '{a.get('name')}'")
-                elif t == "track.setGain":
-                    parts.append(f"adjusted gain on track {a.get('trackId')}")
-                elif t == "track.toggleMute":
-                    parts.append(f"toggled mute on track {a.get('trackId')}")
-                elif t == "track.setColor":
-                    parts.append(f"set color of track {a.get('trackId')}")
-                elif t == "clip.addAudio":
-                    parts.append(f"added audio clip to track {a.get('trackId')} at beat {a.get('startBeat')}")
-                elif t == "clip.move":
-                    parts.append(f"moved clip {a.get('clipId')} to beat {a.get('startBeat')}")
-                elif t == "fx.setParam":
-                    parts.append(f"updated FX param on track {a.get('target',{}).get('trackId')}")
-            if not parts:
-                return "Applied requested changes."
-            if len(parts) == 1:
-                return parts[0][0].upper() + parts[0][1:] + "."
-            return (parts[0][0].upper() + parts[0][1:]) + ", then " + ", then ".join(parts[1:]) + "."
-        except:
-            return "Applied requested changes."
-
-def summarize_plan(plan: list[dict]) -> str:
-    parts: list[str] = []
-    for a in plan:
-        t = a.get("type")
-        if t == "project.setTitle":
-            parts.append(f"set project title to '{a.get('title')}'")
-        elif t == "transport.play":
-            parts.append("start playback")
-        elif t == "transport.stop":
-            parts.append("stop playback")
-        elif t == "loop.set":
-            parts.append(f"set loop to startBeat={a.get('startBeat')} lengthBeats={a.get('lengthBeats')}")
-        elif t == "track.add":
-            parts.append(f"add track '{a.get('name')}'")
-        elif t == "track.rename":
-            parts.append(f"rename track {a.get('trackId')} to '{a.get('name')}'")
-        elif t == "track.setGain":
-            parts.append(f"set gain of track {a.get('trackId')} to {a.get('gainDb')} dB")
-        elif t == "track.toggleMute":
-            parts.append(f"toggle mute on track {a.get('trackId')}")
-        elif t == "clip.addAudio":
-            parts.append(f"add audio clip to track {a.get('trackId')} at beat {a.get('startBeat')} from '{a.get('path')}'")
-        elif t == "clip.move":
-            parts.append(f"move clip {a.get('clipId')} to beat {a.get('startBeat')}")
-    if not parts:
-        return "No changes."
-    if len(parts) == 1:
-        return f"I will {parts[0]}."
-    return "I will " + ", then ".join(parts) + "."
+        logger.warning("assistant.session_compact.skip: %s", e)
+    finally:
+        session.compacting = False
+
+_APPLY_SYSTEM = (
+    "You have successfully applied the user's requested changes in a DAW. "
+    "Given the applied action plan, reply with a concise confirmation (1-2 sentences) in past tense, "
+    "mentioning only the essentials (no code, no tool names)."
+)
+
+def _apply_prompt(plan: List[Dict[str, Any]], project_summary: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": _APPLY_SYSTEM},
+        {"role": "user", "content": f"PLAN:\n{json.dumps(plan)[:6000]}\n\nPROJECT SUMMARY:\n{encode_summary(project_summary, settings.apply_summary_token_budget)}"},
+    ]
+
+def apply_message(plan: List[Dict[str, Any]], project_summary: Optional[Dict[str, Any]] = None) -> str:
+    """Deterministic past-tense confirmation (no model call)."""
+    return describe_plan(plan, past=True, summary=project_summary) or "Applied requested changes."
+
+async def _llm_apply_message(client: AsyncOpenAI, messages: List[Dict[str, str]], user: Optional[str]) -> Optional[str]:
+    async with llm_slot(user):
+        with upstream_timer(settings.openai_model):
+            resp = await upstream.create(client, "apply.polish",
+                model=settings.openai_model,
+                messages=messages,
+            )
+    return resp.choices[0].message.content
+
+def summarize_plan(plan: List[Dict[str, Any]], project_summary: Optional[Dict[str, Any]] = None) -> str:
+    text = describe_plan(plan, past=False, summary=project_summary)
+    return "I will " + text[0].lower() + text[1:] if text else "No changes."
+
+def _applied_actions(plan: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [a for a, r in zip(plan, results) if r.get("ok")]
+
+def _apply_error(results: List[Dict[str, Any]]) -> Optional[str]:
+    """Why nothing was applied, or None if some action was."""
+    if any(r.get("ok") for r in results):
+        return None
+    return next((str(r["error"]) for r in results if r.get("error")), "empty plan")
+
+# applyId -> {message, source: "summary"|"llm", user}; the deterministic text is stored
+# first and replaced when a background polish finishes
+apply_messages: TTLCache[Dict[str, Any]] = TTLCache(
+    max_entries=settings.apply_message_max_entries,
+    ttl_s=settings.apply_message_ttl_s,
+)
+_polishing: Dict[str, "asyncio.Task[None]"] = {}
+
+def _record_message(
+    apply_id: str,
+    message: str,
+    prompt: Optional[List[Dict[str, str]]],
+    user: Optional[str],
+) -> Dict[str, Any]:
+    """Store the deterministic confirmation; with a `prompt`, reword it with the LLM in the background.
+
+    Both the message and the prompt are built before the plan is committed, so
+    they name tracks and clips as they were when the user asked.
+    """
+    owner = _owner(user)
+    apply_messages.set(apply_id, {"message": message, "source": "summary", "user": owner})
+    if prompt is None or len(_polishing) >= settings.apply_polish_max_pending:
+        return {"message": message}
+    _polishing[apply_id] = asyncio.create_task(_polish(apply_id, prompt, user, owner))
+    return {"message": message, "messagePending": True}
+
+async def _polish(apply_id: str, prompt: List[Dict[str, str]], user: Optional[str], owner: Optional[str]) -> None:
+    try:
+        text = await _llm_apply_message(get_client(), prompt, user)
+        if text:
+            apply_messages.set(apply_id, {"message": text, "source": "llm", "user": owner})
+    except Exception as e:
+        logger.warning("assistant.apply_polish.skip %s: %s", apply_id, e)
+    finally:
+        _polishing.pop(apply_id, None)
 
 @router.post("/assistant")
 async def assistant(
     prompt: str = Body(...),
-    project_summary: Dict[str, Any] = Body(...),
+    project_summary: Optional[Dict[str, Any]] = Body(default=None),
+    project_id: Optional[str] = Body(default=None),
+    version: Optional[int] = Body(default=None),
     conversation: Optional[List[Dict[str, Any]]] = Body(default=None),
+    session_id: Optional[str] = Body(default=None),
     mode: str = Body("dryRun"),
-    _: None = Depends(auth_dependency),
+    no_cache: bool = Body(default=False),
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("assistant")),
 ):
-    client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=settings.openai_timeout_s, max_retries=1)
-    model = settings.openai_model
+    project_summary, version = _load_project(project_id, version, project_summary)
+    session = _load_session(session_id, conversation, prompt, user)
+    cached = _local_outcome(prompt, project_summary, project_id, version)
+    if cached is None:
+        client = get_client()
+        model = settings.openai_model
+        messages = make_messages(project_summary, prompt, conversation, session)
+        key = _cache_key(model, messages)
+        cached = None if no_cache else response_cache.get(key)
 
-    try:
-        chat = await client.chat.completions.create(
-            model=model,
-            tools=[{"type":"function","function": execute_actions_tool}],
-            tool_choice="auto",
-            messages= make_messages(project_summary, prompt, conversation)
-        )
-    except Exception as e:
-        logger.exception("assistant.openai_error: %s", e)
-        return {"type":"error","error": str(e)}
-
-    msg = chat.choices[0].message
-    tool_calls = msg.tool_calls or []
+    if cached is None:
+        async with llm_slot(user, deadline):
+            try:
+                with upstream_timer(model):
+                    chat = await upstream.create(client, "assistant", deadline,
+                        model=model,
+                        tools=[{"type":"function","function": execute_actions_tool}],
+                        tool_choice="auto",
+                        messages=messages,
+                    )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.exception("assistant.openai_error: %s", e)
+                return {"type":"error","error": str(e)}
 
-    if not tool_calls:
-        return {"type":"text","content": msg.content or ""}
+        msg = chat.choices[0].message
+        tool_calls = msg.tool_calls or []
 
-    try:
-        raw_args = tool_calls[0].function.arguments or "{}"
-        logger.info("assistant.tool_call.raw_args=%s", raw_args)
-        args = json.loads(raw_args)
-        plan = args.get("plan", [])
-        logger.info("assistant.tool_call.plan=%s", plan)
-        if not isinstance(plan, list) or len(plan)==0:
-            return {"type":"error","error":"empty plan"}
-    except Exception as e:
-        return {"type":"error","error":f"bad tool args: {e}"}
+        if not tool_calls:
+            cached = {"type":"text","content": msg.content or ""}
+        else:
+            try:
+                raw_args = tool_calls[0].function.arguments or "{}"
+                logger.info("assistant.tool_call.raw_args=%s", raw_args)
+                args = json.loads(raw_args)
+                plan = args.get("plan", [])
+                logger.info("assistant.tool_call.plan=%s", plan)
+                if not isinstance(plan, list) or len(plan)==0:
+                    return {"type":"error","error":"empty plan"}
+            except Exception as e:
+                return {"type":"error","error":f"bad tool args: {e}"}
+            cached = {"type":"plan","plan": plan}
+        response_cache.set(key, cached)
 
-    bus = ActionBus(
-        project_root=project_summary.get("projectRoot",""),
-        bpm=float(project_summary.get("bpm", 120)),
-        beat_unit=int(project_summary.get("timeSig",{}).get("denominator", 4))
-    )
+    if cached["type"] == "text":
+        _record_turn(session_id, session, prompt, cached["content"], user)
+        return {"type":"text","content": cached["content"]}
+    plan = cached["plan"]
 
-    results_preview, diffs_preview = bus.execute_plan(plan, "dryRun")
+    local: Optional[_PlanPreview] = cached.get("preview")
+    if local is not None:
+        bus, results_preview, diffs_preview = local.bus, local.results, local.mods()
+    else:
+        bus = _bus_for(project_summary, project_id)
+        results_preview, diffs_preview = bus.execute_plan(plan, "dryRun", deadline)
+    if all(r.get("ok") for r in results_preview):
+        plan = optimize_plan(plan)
 
-    SAFE = {"transport.play","transport.stop","loop.set","track.rename","track.toggleMute","track.setGain","project.setTitle"}
-    is_small_safe = len(plan) <= 3 and all(isinstance(a, dict) and a.get("type") in SAFE for a in plan)
+    is_small_safe = len(plan) <= 3 and all(isinstance(a, dict) and a.get("type") in SAFE_ACTIONS for a in plan)
     if mode == "apply" and is_small_safe:
-        results_apply, diffs_apply = bus.execute_plan(plan, "apply")
-        return {"type":"applied","preview":{"mods":diffs_preview},"results":results_apply}
+        results_apply, diffs_apply = bus.execute_plan(plan, "apply", deadline)
+        error = _apply_error(results_apply)
+        if error:
+            return {"type":"error","error": error,"preview":{"mods":diffs_preview},"results":results_apply,"version":version}
+        apply_id = str(uuid.uuid4())
+        message = apply_message(_applied_actions(plan, results_apply), project_summary)
+        version = _commit_apply(apply_id, project_id, diffs_apply, version, project_summary, user, plan)
+        _record_message(apply_id, message, None, user)
+        _record_turn(session_id, session, prompt, message, user)
+        return {"type":"applied","applyId":apply_id,"preview":{"mods":diffs_preview},"results":results_apply,"message":message,"version":version}
+
+    _record_turn(session_id, session, prompt, summarize_plan(plan, project_summary), user)
+    return {"type":"plan","preview":{"mods":diffs_preview},"plan":plan,"version":version}
+
+class _PlanPreview:
+    """Dry-run plan items one at a time as they arrive, emitting `planItem` frames.
+
+    Mirrors `ActionBus.execute_plan`: once an item fails, later items get no preview.
+    The steps are kept, so a preview of a whole plan also serves as its dry run.
+    """
+
+    def __init__(self, bus: ActionBus, version: Optional[int] = None):
+        self.bus = bus
+        self.version = version
+        self.diffs: List[Dict[str, Any]] = []
+        self.steps: List[Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]] = []  # (item, result, mods)
+        self.count = 0
+        self.failed = False
+
+    @classmethod
+    def of(cls, bus: ActionBus, plan: List[Dict[str, Any]], version: Optional[int] = None) -> "_PlanPreview":
+        preview = cls(bus, version)
+        for item in plan:
+            preview.push(item, frame=False)
+        return preview
+
+    @property
+    def results(self) -> List[Dict[str, Any]]:
+        return [r for _, r, _ in self.steps]
+
+    def mods(self) -> List[Dict[str, Any]]:
+        return coalesce_diffs(self.diffs, self.bus.state)
+
+    def push(self, item: Dict[str, Any], frame: bool = True) -> Optional[bytes]:
+        self.count += 1
+        if self.failed:
+            return None
+        r, ds = self.bus.step(item, "dryRun")
+        if r.get("ok"):
+            self.diffs.extend(ds)
+        else:
+            self.failed = True
+            ds = []
+        self.steps.append((item, r, ds))
+        return self._frame(len(self.steps) - 1) if frame else None
 
-    return {"type":"plan","preview":{"mods":diffs_preview},"plan":plan}
+    def _frame(self, index: int) -> bytes:
+        item, r, ds = self.steps[index]
+        return sse({"type":"planItem", "index": index, "item": item, "result": r, "mods": ds})
 
-def _sse(data: dict) -> str:
-    return f"data: {json.dumps(data)}\n\n"
+    def frames(self) -> Iterator[bytes]:
+        """`planItem` frames of the steps so far."""
+        return map(self._frame, range(len(self.steps)))
+
+    def final(self, plan: List[Dict[str, Any]], project_summary: Dict[str, Any], project_id: Optional[str]) -> bytes:
+        """The closing `plan` frame: coalesced preview diffs and, if every item passed, the optimized plan."""
+        if self.count == len(plan):
+            diffs = self.mods()
+            ok = not self.failed
+        else:
+            # Streamed items did not match the final plan; preview it from scratch
+            results, diffs = _bus_for(project_summary, project_id).execute_plan(plan, "dryRun")
+            ok = all(r.get("ok") for r in results)
+        return sse({"type":"plan", "preview": {"mods": diffs}, "plan": optimize_plan(plan) if ok else plan, "version": self.version})
 
 @router.post("/assistant/stream")
 async def assistant_stream(
     request: Request,
     prompt: str = Body(...),
-    project_summary: Dict[str, Any] = Body(...),
+    project_summary: Optional[Dict[str, Any]] = Body(default=None),
+    project_id: Optional[str] = Body(default=None),
+    version: Optional[int] = Body(default=None),
     conversation: Optional[List[Dict[str, Any]]] = Body(default=None),
+    session_id: Optional[str] = Body(default=None),
     mode: str = Body("dryRun"),
-    _: None = Depends(auth_dependency),
+    no_cache: bool = Body(default=False),
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("assistant.stream")),
 ):
-    client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=settings.openai_timeout_s, max_retries=1)
+    project_summary, version = _load_project(project_id, version, project_summary)
+    session = _load_session(session_id, conversation, prompt, user)
     model = settings.openai_model
 
+    # Recognized simple commands are replayed like cache hits, without the model
+    cached = _local_outcome(prompt, project_summary, project_id, version)
+    if cached is None:
+        messages = make_messages(project_summary, prompt, conversation, session)
+        key = _cache_key(model, messages)
+        cached = None if no_cache else response_cache.get(key)
+    # Only live upstream calls take a slot; cache replays are free
+    release = await acquire_llm_slot(user, deadline) if cached is None else None
+
+    async def replay():
+        # Cache hit: same frames the live path would have produced
+        if cached["type"] == "text":
+            if cached["content"]:
+                yield sse_delta(cached["content"])
+            _record_turn(session_id, session, prompt, cached["content"], user)
+            yield DONE
+            return
+        plan = cached["plan"]
+        _record_turn(session_id, session, prompt, summarize_plan(plan, project_summary), user)
+        preview = cached.get("preview")
+        if preview is not None:
+            for frame in preview.frames():
+                yield frame
+        else:
+            preview = _PlanPreview(_bus_for(project_summary, project_id), version)
+            for item in plan:
+                frame = preview.push(item)
+                if frame:
+                    yield frame
+        yield preview.final(plan, project_summary, project_id)
+
     async def gen():
+        watch = DisconnectWatch(request)
+        timer = StreamTimer("/v1/assistant/stream")
         try:
-            stream = await client.chat.completions.create(
-                model=model,
-                messages= make_messages(project_summary, prompt, conversation),
-                tools=[{"type":"function","function": execute_actions_tool}],
-                tool_choice="auto",
-                stream=True,
-            )
+            client = get_client()
+            with upstream_timer(model):
+                stream = watch.track(await upstream.create(client, "assistant.stream", deadline,
+                    model=model,
+                    messages=messages,
+                    tools=[{"type":"function","function": execute_actions_tool}],
+                    tool_choice="auto",
+                    stream=True,
+                ))
 
             saw_tool = False
             tool_name = None
             tool_args_buf = ""
-            streamed_any_text = False
+            # Speculative preview: dry-run each plan item as soon as its JSON is complete
+            parser = PlanItemParser()
+            preview = _PlanPreview(_bus_for(project_summary, project_id), version)
+            text_parts: List[str] = []
+            deltas = DeltaCoalescer()
 
-            async for chunk in stream:
-                if await request.is_disconnected():
+            async for chunk in deltas.paced(upstream.guard(stream, deadline)):
+                if watch.disconnected:
                     break
+                if chunk is None:
+                    frame = deltas.flush()
+                    if frame:
+                        yield frame
+                    continue
                 if not chunk.choices:
                     continue
                 d = chunk.choices[0].delta
@@ -227,12 +604,17 @@ async def assistant_stream(
                 # Accumulate tool call arguments if present
                 if getattr(d, "tool_calls", None):
                     saw_tool = True
+                    timer.token()
                     for tc in d.tool_calls:
                         if getattr(tc, "function", None):
                             if getattr(tc.function, "name", None):
                                 tool_name = tc.function.name
                             if getattr(tc.function, "arguments", None):
                                 tool_args_buf += tc.function.arguments
+                                for item in parser.feed(tc.function.arguments):
+                                    frame = preview.push(item)
+                                    if frame:
+                                        yield frame
                     # skip sending text when tool engaged
                     continue
 
@@ -240,13 +622,22 @@ async def assistant_stream(
                 if not saw_tool:
                     delta = d.content
                     if delta:
-                        streamed_any_text = True
-                        yield _sse({"delta": delta})
+                        timer.token()
+                        text_parts.append(delta)
+                        frame = deltas.push(delta)
+                        if frame:
+                            yield frame
 
             # End of stream
             if not saw_tool:
                 # pure text path
-                yield _sse({"done": True})
+                frame = deltas.flush()
+                if frame:
+                    yield frame
+                if not watch.disconnected:
+                    response_cache.set(key, {"type":"text","content": "".join(text_parts)})
+                    _record_turn(session_id, session, prompt, "".join(text_parts), user)
+                yield DONE
                 return
 
             # tool path: parse args and emit plan frame
@@ -256,53 +647,209 @@ async def assistant_stream(
                 plan = args.get("plan", [])
                 logger.info("assistant.stream.tool_call.plan=%s", plan)
                 if not isinstance(plan, list) or len(plan)==0:
-                    yield _sse({"error":"empty plan"})
+                    yield sse_error("empty plan")
                     return
             except Exception as e:
-                yield _sse({"error": f"bad tool args: {e}"})
+                yield sse_error(f"bad tool args: {e}")
                 return
 
-            bus = ActionBus(
-                project_root=project_summary.get("projectRoot",""),
-                bpm=float(project_summary.get("bpm", 120)),
-                beat_unit=int(project_summary.get("timeSig",{}).get("denominator", 4))
-            )
-            _, diffs_preview = bus.execute_plan(plan, "dryRun")
-            yield _sse({"type":"plan", "preview": {"mods": diffs_preview}, "plan": plan})
+            if watch.disconnected:
+                return
+            response_cache.set(key, {"type":"plan","plan": plan})
+            _record_turn(session_id, session, prompt, summarize_plan(plan, project_summary), user)
+            yield preview.final(plan, project_summary, project_id)
         except Exception as e:
+            if watch.disconnected:
+                return
             logger.exception("assistant.stream.openai_error: %s", e)
-            yield _sse({"error": str(e)})
+            yield sse_error(str(e))
+        finally:
+            timer.done()
+            await watch.close()
 
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "X-Accel-Buffering": "no",
-    }
-    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
+    return event_stream(gen() if cached is None else replay(), on_close=release)
 
 
 
+def _idempotency_key(request: Request, apply_id: Optional[str], route: str, user: Optional[str]) -> Optional[Tuple[str, Optional[str], str]]:
+    """`Idempotency-Key` header, else the client-supplied applyId; scoped by route and caller."""
+    key = request.headers.get("idempotency-key") or apply_id
+    return (route, _owner(user), key[:256]) if key else None
+
+def _check_apply_id(apply_id: Optional[str]) -> None:
+    # A client-chosen applyId must not take over another apply's undo log or message
+    if apply_id and (undo_log.get(apply_id) is not None or apply_messages.get(apply_id) is not None):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="applyId already used")
+
+def _key_reused() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Idempotency-Key reused with a different request")
+
+def _apply_once(
+    apply_id: str,
+    plan: List[Dict[str, Any]],
+    project_summary: Optional[Dict[str, Any]],
+    project_id: Optional[str],
+    version: Optional[int],
+    mode: str,
+    polish: Optional[bool],
+    user: Optional[str],
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    project_summary, version = _load_project(project_id, version, project_summary)
+    logger.info("assistant.apply.plan=%s", plan)
+    bus = _bus_for(project_summary, project_id)
+    results, diffs = bus.execute_plan(plan, "apply" if mode == "apply" else "dryRun", deadline)
+    if mode == "apply":
+        error = _apply_error(results)
+        if error:
+            return {"type":"error", "error": error, "preview": {"mods": diffs}, "results": results, "version": version}
+        applied = _applied_actions(plan, results)
+        message = apply_message(applied, project_summary)
+        polish = settings.apply_polish if polish is None else polish
+        prompt = _apply_prompt(applied, project_summary) if polish and applied else None
+        version = _commit_apply(apply_id, project_id, diffs, version, project_summary, user, plan)
+        return {"type":"applied", "applyId": apply_id, "preview": {"mods": diffs}, "results": results,
+                **_record_message(apply_id, message, prompt, user), "version": version}
+    return {"type":"plan", "preview": {"mods": diffs}, "plan": plan, "version": version}
+
 @router.post("/apply")
 async def apply_plan(
+    request: Request,
     plan: List[Dict[str, Any]] = Body(...),
-    project_summary: Dict[str, Any] = Body(default_factory=dict),
+    project_summary: Optional[Dict[str, Any]] = Body(default=None),
+    project_id: Optional[str] = Body(default=None),
+    version: Optional[int] = Body(default=None),
     mode: str = Body("apply"),
-    _: None = Depends(auth_dependency),
+    polish: Optional[bool] = Body(default=None),
+    applyId: Optional[str] = Body(default=None),
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("apply")),
 ):
-    logger.info("assistant.apply.plan=%s", plan)
-    bus = ActionBus(
-        project_root=project_summary.get("projectRoot",""),
-        bpm=float(project_summary.get("bpm", 120)),
-        beat_unit=int(project_summary.get("timeSig",{}).get("denominator", 4))
-    )
-    results, diffs = bus.execute_plan(plan, "apply" if mode == "apply" else "dryRun")
-    apply_id = str(uuid.uuid4()) if mode == "apply" else None
+    """Execute a plan. The confirmation `message` is deterministic; with `"polish": true`
+    (default `APPLY_POLISH`) an LLM rewording is fetched in the background and served by
+    `GET /v1/apply/{applyId}/message`.
+
+    With an `Idempotency-Key` header or a client `applyId`, repeats within
+    `IDEMPOTENCY_TTL_S` return the first result without executing again.
+    """
+    key = _idempotency_key(request, applyId, "/v1/apply", user) if mode == "apply" else None
+    if key is None:
+        return _apply_once(str(uuid.uuid4()), plan, project_summary, project_id, version, mode, polish, user, deadline)
+
+    async def run() -> Dict[str, Any]:
+        _check_apply_id(applyId)
+        return _apply_once(applyId or str(uuid.uuid4()), plan, project_summary, project_id, version, mode, polish, user, deadline)
+
+    # Before loading the project: a retry must neither hit a stale version nor re-upload its snapshot
+    fingerprint = hash_key(plan, project_summary, project_id, version, polish)
+    try:
+        return await idempotency.run(key, fingerprint, run)
+    except KeyReused:
+        raise _key_reused()
+
+
+def _batch_item(
+    index: int,
+    item: Any,
+    mode: str,
+    buses: Dict[Tuple[Any, ...], ActionBus],
+    user: Optional[str] = None,
+    polish: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    """Run one batch entry and return its result line."""
+    out: Dict[str, Any] = {"index": index}
+    if not isinstance(item, dict) or not isinstance(item.get("plan"), list):
+        out.update({"ok": False, "error": "item needs a plan list"})
+        return out
+    if item.get("id") is not None:
+        out["id"] = item["id"]
+    if deadline is not None and deadline.expired():
+        out.update({"ok": False, "status": 504, "error": "deadline exceeded"})
+        return out
+    plan = item["plan"]
+    project_id = item.get("project_id")
+    try:
+        summary, version = _load_project(project_id, item.get("version"), item.get("project_summary"))
+    except HTTPException as e:
+        out.update({"ok": False, "status": e.status_code, "error": e.detail})
+        return out
+
+    # Plans with the same tempo map and meter share one bus
+    tempo = TempoMap.from_summary(summary)
+    key = (summary.get("projectRoot", ""), tempo.key)
+    bus = buses.get(key)
+    if bus is None:
+        bus = buses[key] = _bus_for(summary, tempo=tempo)
+    bus.state = summary if project_id is not None else None
+
+    try:
+        results, diffs = bus.execute_plan(plan, mode, deadline)
+    except DeadlineExceeded as e:
+        out.update({"ok": False, "status": 504, "error": str(e)})
+        return out
+    out["ok"] = all(r.get("ok") for r in results)
+    out.update({"results": results, "preview": {"mods": diffs}})
     if mode == "apply":
-        # Generate a brief confirmation message from the LLM
-        client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=settings.openai_timeout_s, max_retries=1)
-        message = await generate_apply_message(client, plan, project_summary)
-        return {"type":"applied", "applyId": apply_id, "preview": {"mods": diffs}, "results": results, "message": message}
-    return {"type":"plan", "preview": {"mods": diffs}, "plan": plan}
+        error = _apply_error(results)
+        if error:
+            out.update({"error": error, "version": version})
+            return out
+        apply_id = str(uuid.uuid4())
+        applied = _applied_actions(plan, results)
+        message = apply_message(applied, summary)
+        prompt = _apply_prompt(applied, summary) if polish and applied else None
+        try:
+            out["version"] = _commit_apply(apply_id, project_id, diffs, version, summary, user, plan)
+        except HTTPException as e:
+            out.update({"ok": False, "status": e.status_code, "error": e.detail, "version": version})
+            return out
+        out["applyId"] = apply_id
+        out.update(_record_message(apply_id, message, prompt, user))
+        return out
+    out["version"] = version
+    return out
+
+
+@router.post("/apply/batch")
+async def apply_batch(
+    request: Request,
+    items: List[Dict[str, Any]] = Body(...),
+    mode: str = Body("apply"),
+    polish: bool = Body(False),
+    stream: bool = Body(False),
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("apply.batch")),
+):
+    """Apply or preview many (project, plan) pairs in one request.
+
+    Each item is `{plan, project_summary?, project_id?, version?, id?}` and gets a
+    result line `{index, id, ok, results, preview, version, applyId, message}`. Items
+    run in order, so several items for one `project_id` chain their versions. With
+    `"polish": true` LLM rewordings of the messages are fetched in the background
+    (`GET /v1/apply/{applyId}/message`). With `"stream": true` (or
+    `Accept: application/x-ndjson`) lines are sent as NDJSON as each finishes.
+    Items not finished by the request deadline get `{ok: false, status: 504}`.
+    """
+    if len(items) > settings.apply_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"at most {settings.apply_batch_max_items} items per batch",
+        )
+    mode = "apply" if mode == "apply" else "dryRun"
+    buses: Dict[Tuple[Any, ...], ActionBus] = {}
+
+    if not (stream or "application/x-ndjson" in request.headers.get("accept", "")):
+        return {"type": "batch", "items": [_batch_item(i, item, mode, buses, user, polish, deadline) for i, item in enumerate(items)]}
+
+    async def gen():
+        for i, item in enumerate(items):
+            yield orjson.dumps(_batch_item(i, item, mode, buses, user, polish, deadline)) + b"\n"
+            # Let other requests run between plans of a large batch
+            await asyncio.sleep(0)
+
+    return StreamingResponse(gen(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
 
 
 @router.post("/apply/confirm")
@@ -313,8 +860,10 @@ async def apply_confirm(
     preview: Optional[Dict[str, Any]] = Body(default=None),
     project: Optional[Dict[str, Any]] = Body(default=None),
     project_summary: Optional[Dict[str, Any]] = Body(default=None),
-    _: None = Depends(auth_dependency),
+    user: Optional[str] = Depends(auth_dependency),
 ):
+    """Log the client's view of an apply; reports whether this worker applied `applyId`,
+    so a client unsure after a dropped connection can tell before retrying."""
     payload = {
         "applyId": applyId,
         "plan": plan,
@@ -323,67 +872,191 @@ async def apply_confirm(
         "project": project,
         "project_summary": project_summary,
     }
-    logger.info("assistant.apply.confirm=%s", json.dumps(payload)[:4000])
-    return {"ok": True}
+    # The full payload goes to the journal; the log line stays small
+    logger.info("assistant.apply.confirm %s", applyId)
+    journal.append({"type": "confirm", "user": _owner(user), **payload})
+    entry = apply_messages.get(applyId) if applyId else None
+    if entry is None or (entry["user"] and entry["user"] != _owner(user)):
+        return {"ok": True, "applied": False}
+    raw = undo_log.get(applyId)
+    logged = orjson.loads(raw) if raw is not None else {}
+    return {"ok": True, "applied": True, "version": logged.get("version"), "undone": logged.get("undone", False)}
 
 
 @router.post("/apply/stream")
 async def apply_stream(
     request: Request,
     plan: List[Dict[str, Any]] = Body(...),
-    project_summary: Dict[str, Any] = Body(default_factory=dict),
-    _: None = Depends(auth_dependency),
+    project_summary: Optional[Dict[str, Any]] = Body(default=None),
+    project_id: Optional[str] = Body(default=None),
+    version: Optional[int] = Body(default=None),
+    polish: Optional[bool] = Body(default=None),
+    applyId: Optional[str] = Body(default=None),
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("apply.stream")),
 ):
+    """Apply, send an `applied` frame carrying the deterministic `message`, then (with
+    `"polish": true`, default `APPLY_POLISH`) stream an LLM-worded confirmation as delta frames.
+
+    With an `Idempotency-Key` header or a client `applyId`, repeats replay the
+    recorded frames (following along if the first request is still streaming).
+    """
+    key = _idempotency_key(request, applyId, "/v1/apply/stream", user)
+    fingerprint = hash_key(plan, project_summary, project_id, version, polish) if key else b""
+    try:
+        recording = idempotency.lookup(key, fingerprint) if key else None
+    except KeyReused:
+        raise _key_reused()
+    if recording is not None:
+        return event_stream(recording.follow())
+    if key:
+        _check_apply_id(applyId)
+    project_summary, version = _load_project(project_id, version, project_summary)
+    apply_id = applyId or str(uuid.uuid4())
+    polish = settings.apply_polish if polish is None else polish
+
     async def gen():
-        apply_id = str(uuid.uuid4())
+        watch = DisconnectWatch(request)
+        release = None
         try:
-            bus = ActionBus(
-                project_root=project_summary.get("projectRoot",""),
-                bpm=float(project_summary.get("bpm", 120)),
-                beat_unit=int(project_summary.get("timeSig",{}).get("denominator", 4))
-            )
-            results, diffs = bus.execute_plan(plan, "apply")
+            bus = _bus_for(project_summary, project_id)
+            results, diffs = bus.execute_plan(plan, "apply", deadline)
+            error = _apply_error(results)
+            if error:
+                yield sse_error(error)
+                return
+            applied = _applied_actions(plan, results)
+            message = apply_message(applied, project_summary)
+            msgs = _apply_prompt(applied, project_summary) if polish and applied else None
+            new_version = _commit_apply(apply_id, project_id, diffs, version, project_summary, user, plan)
+            _record_message(apply_id, message, None, user)
             # Emit immediate applied frame so UI can update
-            yield _sse({
+            yield sse({
                 "type": "applied",
                 "applyId": apply_id,
                 "preview": {"mods": diffs},
                 "results": results,
+                "message": message,
+                "version": new_version,
             })
 
-            # Now stream a short confirmation message
-            client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=settings.openai_timeout_s, max_retries=1)
-            sys_prompt = (
-                "You have successfully applied the user's requested changes in a DAW. "
-                "Given the applied action plan, reply with a concise confirmation (1-2 sentences) in past tense, "
-                "mentioning only the essentials (no code, no tool names)."
-            )
-            msgs = [
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": f"PLAN:\n{json.dumps(plan)[:6000]}\n\nPROJECT SUMMARY:\n{json.dumps(project_summary or {})[:4000]}"},
-            ]
-            stream = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=msgs,
-                stream=True,
-            )
-            async for chunk in stream:
-                if await request.is_disconnected():
+            # Now stream the optional LLM wording of the confirmation
+            if msgs is None:
+                yield DONE
+                return
+            client = get_client()
+            if watch.disconnected:
+                return
+            try:
+                release = await llm_gate.acquire(user, deadline.check() if deadline is not None else None)
+            except (Overloaded, DeadlineExceeded):
+                # The plan is applied; skip the optional confirmation text
+                yield DONE
+                return
+            with upstream_timer(settings.openai_model):
+                stream = watch.track(await upstream.create(client, "apply.stream", deadline,
+                    model=settings.openai_model,
+                    messages=msgs,
+                    stream=True,
+                ))
+            timer = StreamTimer("/v1/apply/stream")
+            deltas = DeltaCoalescer()
+            text: List[str] = []
+            async for chunk in deltas.paced(upstream.guard(stream, deadline)):
+                if watch.disconnected:
                     break
+                if chunk is None:
+                    frame = deltas.flush()
+                    if frame:
+                        yield frame
+                    continue
                 if not chunk.choices:
                     continue
                 d = chunk.choices[0].delta
                 if d and getattr(d, "content", None):
-                    yield _sse({"delta": d.content})
-            yield _sse({"done": True})
+                    timer.token()
+                    text.append(d.content)
+                    frame = deltas.push(d.content)
+                    if frame:
+                        yield frame
+            frame = deltas.flush()
+            if frame:
+                yield frame
+            timer.done()
+            if text and not watch.disconnected:
+                apply_messages.set(apply_id, {"message": "".join(text), "source": "llm", "user": _owner(user)})
+            yield DONE
         except Exception as e:
+            if watch.disconnected:
+                return
             logger.exception("assistant.apply_stream.error: %s", e)
-            yield _sse({"error": str(e)})
+            yield sse_error(str(e))
+        finally:
+            if release is not None:
+                release()
+            await watch.close()
+
+    if not key:
+        return event_stream(gen())
+    frames, on_close = idempotency.stream(key, fingerprint, gen)
+    return event_stream(frames, on_close=on_close)
+
+
+def _undo_entry(apply_id: str, user: Optional[str]) -> Dict[str, Any]:
+    raw = undo_log.get(apply_id)
+    entry = orjson.loads(raw) if raw is not None else None
+    if entry is None or (entry["user"] and entry["user"] != _owner(user)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired applyId")
+    return entry
+
+def _undo_redo(apply_id: str, user: Optional[str], undo: bool) -> Dict[str, Any]:
+    entry = _undo_entry(apply_id, user)
+    if entry["undone"] == undo:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="already undone" if undo else "not undone")
+    mods = entry["inverse"] if undo else entry["diffs"]
+    version = entry["version"]
+    if entry["project_id"]:
+        # Only valid on exactly the state the log entry left behind
+        version = _commit_project(entry["project_id"], mods, version)
+        if version is None:
+            undo_log.pop(apply_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project state is gone; re-send project_summary")
+    journal.append({
+        "type": "undo" if undo else "redo", "applyId": apply_id, "project_id": entry["project_id"],
+        "user": entry["user"], "base_version": entry["version"], "version": version, "diffs": mods,
+    })
+    entry["undone"] = undo
+    entry["version"] = version
+    undo_log.set(apply_id, orjson.dumps(entry))
+    return {"type": "undo" if undo else "redo", "applyId": apply_id, "preview": {"mods": mods}, "version": version}
+
+
+@router.get("/apply/{apply_id}/message")
+async def apply_message_get(
+    apply_id: str,
+    wait: float = Query(0.0, ge=0.0, le=30.0),
+    user: Optional[str] = Depends(auth_dependency),
+):
+    """Confirmation text for an applied plan: the LLM wording once a background polish
+    finished, otherwise the deterministic one. `wait` (seconds) long-polls a pending polish."""
+    entry = apply_messages.get(apply_id)
+    if entry is None or (entry["user"] and entry["user"] != _owner(user)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired applyId")
+    task = _polishing.get(apply_id)
+    if task is not None and wait > 0:
+        # asyncio.wait never cancels the task, so a client giving up does not stop the polish
+        await asyncio.wait([task], timeout=wait)
+        entry = apply_messages.get(apply_id) or entry
+    return {"applyId": apply_id, "message": entry["message"], "source": entry["source"], "pending": apply_id in _polishing}
+
+
+@router.post("/apply/{apply_id}/undo")
+async def apply_undo(apply_id: str, user: Optional[str] = Depends(auth_dependency)):
+    """Inverse patch of an applied plan (no model call). With `project_id` state it is applied server-side."""
+    return _undo_redo(apply_id, user, undo=True)
 
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "X-Accel-Buffering": "no",
-    }
-    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
 
+@router.post("/apply/{apply_id}/redo")
+async def apply_redo(apply_id: str, user: Optional[str] = Depends(auth_dependency)):
+    """Re-apply a plan undone with `/undo`."""
+    return _undo_redo(apply_id, user, undo=False)
@@ -1,66 +1,95 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import StreamingResponse
-from openai import AsyncOpenAI
-import json
-from ..models import ChatRequest, ChatChunk
+from ..models import ChatRequest
 from ..deps import auth_dependency
 from ..config import settings
+from ..deadline import Deadline, deadline_dependency
+from ..llm import get_client
+from ..limiter import acquire_llm_slot, llm_slot
+from ..metrics import StreamTimer, upstream_timer
+from .. import upstream
+from ..responses import ORJSONRoute
+from ..sse import DONE, DeltaCoalescer, DisconnectWatch, event_stream, sse_error
 
-router = APIRouter(prefix="/v1", tags=["chat"])
-
-def _sse(data: dict) -> str:
-    return f"data: {json.dumps(data)}\n\n"
+router = APIRouter(prefix="/v1", tags=["chat"], route_class=ORJSONRoute)
 
 @router.post("/chat", response_model=dict)
-async def chat(body: ChatRequest, _: None = Depends(auth_dependency)):
-    client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=settings.openai_timeout_s)
+async def chat(
+    body: ChatRequest,
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("chat")),
+):
+    client = get_client()
     model = body.model or settings.openai_model
 
-    resp = await client.chat.completions.create(
-        model=model,
-        messages=[m.model_dump() for m in body.messages],
-        temperature=body.temperature,
-        stream=False,
-    )
+    async with llm_slot(user, deadline):
+        with upstream_timer(model):
+            resp = await upstream.create(client, "chat", deadline,
+                model=model,
+                messages=[m.model_dump() for m in body.messages],
+                temperature=body.temperature,
+                stream=False,
+            )
     text = resp.choices[0].message.content or ""
     return {"text": text}
 
 @router.post("/chat/stream")
-async def chat_stream(request: Request, _: None = Depends(auth_dependency)):
+async def chat_stream(
+    request: Request,
+    body: ChatRequest,
+    user: Optional[str] = Depends(auth_dependency),
+    deadline: Optional[Deadline] = Depends(deadline_dependency("chat.stream")),
+):
     """
     SSE stream. Returns `text/event-stream` with frames like:
       data: {"delta":"..."}
       data: {"done":true}
+    Responds 503 + Retry-After when the worker's upstream capacity is exhausted.
+    A stalled upstream or the request deadline ends the stream with an error frame.
     """
+    release = await acquire_llm_slot(user, deadline)
+
     async def gen():
-        client = AsyncOpenAI(api_key=settings.openai_api_key, timeout=settings.openai_timeout_s)
-        payload = await request.json()
-        body = ChatRequest(**payload)
+        client = get_client()
         model = body.model or settings.openai_model
+        watch = DisconnectWatch(request)
+        timer = StreamTimer("/v1/chat/stream")
 
         try:
-            stream = await client.chat.completions.create(
-                model=model,
-                messages=[m.model_dump() for m in body.messages],
-                temperature=body.temperature,
-                stream=True,
-            )
+            with upstream_timer(model):
+                stream = watch.track(await upstream.create(client, "chat.stream", deadline,
+                    model=model,
+                    messages=[m.model_dump() for m in body.messages],
+                    temperature=body.temperature,
+                    stream=True,
+                ))
 
-            async for chunk in stream:
-                if await request.is_disconnected():
+            deltas = DeltaCoalescer()
+            async for chunk in deltas.paced(upstream.guard(stream, deadline)):
+                if watch.disconnected:
                     break
+                if chunk is None:
+                    frame = deltas.flush()
+                    if frame:
+                        yield frame
+                    continue
                 delta = chunk.choices[0].delta.content if chunk.choices and chunk.choices[0].delta else None
                 if delta:
-                    yield _sse(ChatChunk(delta=delta).model_dump())
-            yield _sse(ChatChunk(done=True).model_dump())
+                    timer.token()
+                    frame = deltas.push(delta)
+                    if frame:
+                        yield frame
+            frame = deltas.flush()
+            if frame:
+                yield frame
+            yield DONE
         except Exception as e:
-            yield _sse(ChatChunk(error=str(e)).model_dump())
+            if not watch.disconnected:
+                yield sse_error(str(e))
+        finally:
+            timer.done()
+            await watch.close()
 
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        # tip: if using server-wide compression, disable it for this route at proxy layer
-    }
-    return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
+    return event_stream(gen(), on_close=release)
 
 
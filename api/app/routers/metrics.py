@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..metrics import render_prometheus
+
+router = APIRouter(prefix="", tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Per-worker numbers; scrape each worker or aggregate upstream
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,32 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from ..cache import hash_key
+from ..deps import auth_dependency
+from ..responses import ORJSONRoute
+from ..sessions import Session, session_store
+
+router = APIRouter(prefix="/v1", tags=["sessions"], route_class=ORJSONRoute)
+
+def _session(session_id: str, user: Optional[str]) -> Session:
+    session = session_store.get(session_id)
+    if session is None or (session.owner and session.owner != (hash_key(user).hex() if user else None)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown session_id")
+    return session
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str, user: Optional[str] = Depends(auth_dependency)):
+    """History the next turn will be sent with: rolling summary plus the recent turns."""
+    s = _session(session_id, user)
+    return {
+        "session_id": session_id,
+        "summary": s.summary,
+        "messages": [{"role": role, "content": content} for role, content, _ in s.turns],
+        "compacted": s.compacted,
+        "tokens": s.tokens,
+    }
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, user: Optional[str] = Depends(auth_dependency)):
+    _session(session_id, user)
+    session_store.pop(session_id)
+    return {"ok": True}
@@ -0,0 +1,95 @@
+"""Server-side conversation sessions (per worker).
+
+A session holds the mapped chat history, so clients send only the new turn.
+Every turn keeps its token estimate, computed once. When the history goes
+over the token budget, the oldest turns are folded into a rolling summary
+that is sent upstream as a single system message.
+"""
+from typing import Dict, List, Optional, Tuple
+from .cache import TTLCache
+from .config import settings
+from .daw.summary import CHARS_PER_TOKEN
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role and framing per chat message
+_LINE_CHARS = 240  # per folded turn in the deterministic summary
+
+def count_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+class Session:
+    """Chat history as (role, content, tokens) turns plus a summary of compacted ones."""
+
+    __slots__ = ("owner", "summary", "turns", "tokens", "compacted", "compacting")
+
+    def __init__(self, owner: Optional[str] = None):
+        self.owner = owner
+        self.summary = ""
+        self.turns: List[Tuple[str, str, int]] = []
+        self.tokens = 0  # history tokens, summary included
+        self.compacted = 0  # number of turns folded into the summary so far
+        self.compacting = False
+
+    def add(self, role: str, content: str) -> None:
+        n = count_tokens(content)
+        self.turns.append((role, content, n))
+        self.tokens += n
+
+    def set_summary(self, text: str) -> None:
+        if self.summary:
+            self.tokens -= count_tokens(self.summary)
+        self.summary = text
+        if text:
+            self.tokens += count_tokens(text)
+
+    def messages(self) -> List[Dict[str, str]]:
+        out = [{"role": "system", "content": f"EARLIER CONVERSATION (summary): {self.summary}"}] if self.summary else []
+        out.extend({"role": role, "content": content} for role, content, _ in self.turns)
+        return out
+
+    def over_budget(self) -> bool:
+        return self.tokens > settings.session_token_budget
+
+    def take_oldest(self) -> List[Tuple[str, str, int]]:
+        """Remove the oldest turns until the history is back to half the budget (at least
+        the newest two turns stay)."""
+        target = settings.session_token_budget // 2
+        i, tokens = 0, self.tokens
+        while i < len(self.turns) - 2 and tokens > target:
+            tokens -= self.turns[i][2]
+            i += 1
+        old, self.turns = self.turns[:i], self.turns[i:]
+        self.tokens -= sum(t[2] for t in old)
+        self.compacted += len(old)
+        return old
+
+def fold(summary: str, turns: List[Tuple[str, str, int]]) -> str:
+    """Deterministic rolling summary: one clipped line per turn, oldest lines dropped first."""
+    lines = [summary] if summary else []
+    for role, content, _ in turns:
+        text = " ".join(content.split())
+        lines.append(f"{role}: {text[:_LINE_CHARS]}{'…' if len(text) > _LINE_CHARS else ''}")
+    out = "\n".join(lines)
+    budget = settings.session_summary_tokens * CHARS_PER_TOKEN
+    if len(out) > budget:
+        out = "…" + out[len(out) - budget:]
+    return out
+
+def compact(session: Session) -> Optional[Tuple[str, List[Tuple[str, str, int]]]]:
+    """Fold the oldest turns into the summary if over budget.
+
+    Returns (previous summary, folded turns) so a caller can replace the
+    deterministic summary with a better one, or None if nothing was folded.
+    """
+    if not session.over_budget():
+        return None
+    old = session.take_oldest()
+    if not old:
+        return None
+    previous = session.summary
+    session.set_summary(fold(previous, old))
+    return previous, old
+
+session_store: TTLCache[Session] = TTLCache(
+    max_entries=settings.session_max_entries,
+    ttl_s=settings.session_ttl_s,
+)
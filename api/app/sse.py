@@ -0,0 +1,172 @@
+"""Server-Sent Events framing shared by the streaming routes.
+
+Frames are written as bytes with orjson; constant frames are pre-encoded.
+"""
+from typing import Any, AsyncIterator, Callable, List, Optional
+import asyncio
+import logging
+import time
+import anyio
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from .config import settings
+from .metrics import sse_bytes, sse_frames
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # tip: if using server-wide compression, disable it for these routes at proxy layer
+    "X-Accel-Buffering": "no",
+}
+
+def sse(data: Any) -> bytes:
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+def sse_delta(text: str) -> bytes:
+    return b'data: {"delta":' + orjson.dumps(text) + b"}\n\n"
+
+def sse_error(error: str) -> bytes:
+    return b'data: {"error":' + orjson.dumps(error) + b"}\n\n"
+
+DONE = sse({"done": True})
+
+class DeltaCoalescer:
+    """Merge small text deltas into fewer frames.
+
+    A buffered delta is released once `window_s` has passed since the first
+    buffered piece or the buffer reaches `max_chars`. Iterate upstream through
+    `paced()` so text is also released when upstream goes quiet, and call
+    `flush()` when it ends. A window of 0 disables merging.
+    """
+
+    __slots__ = ("window_s", "max_chars", "_parts", "_size", "_since")
+
+    def __init__(self, window_s: Optional[float] = None, max_chars: int = 256):
+        self.window_s = settings.sse_flush_window_ms / 1000.0 if window_s is None else window_s
+        self.max_chars = max_chars
+        self._parts: List[str] = []
+        self._size = 0
+        self._since = 0.0
+
+    def push(self, text: str) -> Optional[bytes]:
+        if self.window_s <= 0:
+            return sse_delta(text)
+        if not self._parts:
+            self._since = time.monotonic()
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.max_chars or time.monotonic() - self._since >= self.window_s:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        return sse_delta(text)
+
+    async def paced(self, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Iterate `chunks`, yielding None when buffered text is due and no chunk
+        has arrived in time; the caller then sends `flush()`."""
+        it = chunks.__aiter__()
+        pending: Optional["asyncio.Future[Any]"] = None
+        try:
+            while True:
+                if not self._parts:
+                    # Nothing held back: wait for upstream as usual
+                    if pending is None:
+                        try:
+                            chunk = await it.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        yield chunk
+                        continue
+                    await asyncio.wait((pending,))
+                else:
+                    if pending is None:
+                        pending = asyncio.ensure_future(it.__anext__())
+                    due = self._since + self.window_s - time.monotonic()
+                    done, _ = await asyncio.wait((pending,), timeout=max(0.0, due))
+                    if not done:
+                        yield None
+                        continue
+                fut, pending = pending, None
+                try:
+                    chunk = fut.result()
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+class DisconnectWatch:
+    """Background watcher for `http.disconnect` on a streaming request.
+
+    Replaces polling `request.is_disconnected()` per chunk: loops check the
+    `disconnected` flag, and upstream streams registered with `track()` are
+    closed as soon as the client goes away (and again in `close()`, which the
+    generator must call from `finally`).
+    """
+
+    def __init__(self, request: Request):
+        self.disconnected = False
+        self._receive = request.receive
+        self._streams: List[Any] = []
+        self._task = asyncio.create_task(self._run())
+
+    def track(self, stream: Any) -> Any:
+        self._streams.append(stream)
+        return stream
+
+    async def _run(self) -> None:
+        while True:
+            message = await self._receive()
+            if message["type"] == "http.disconnect":
+                break
+        self.disconnected = True
+        await self._close_streams()
+
+    async def _close_streams(self) -> None:
+        streams, self._streams = self._streams, []
+        for s in streams:
+            try:
+                await s.close()
+            except Exception as e:
+                logger.debug("sse.upstream_close: %s", e)
+
+    async def close(self) -> None:
+        self._task.cancel()
+        # Shielded: this runs while the response task may already be cancelled
+        with anyio.CancelScope(shield=True):
+            await self._close_streams()
+
+class _EventStream(StreamingResponse):
+    def __init__(self, frames: AsyncIterator[bytes], on_close: Optional[Callable[[], None]] = None):
+        super().__init__(frames, media_type="text/event-stream", headers=SSE_HEADERS)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.body_iterator = _counted(self.body_iterator, scope["path"])
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Runs even if the generator never started (client gone before the first frame)
+            if self.on_close is not None:
+                self.on_close()
+
+async def _counted(frames: AsyncIterator[bytes], route: str) -> AsyncIterator[bytes]:
+    n_frames = sse_frames.labels(route)
+    n_bytes = sse_bytes.labels(route)
+    async for frame in frames:
+        n_frames.value += 1
+        n_bytes.value += len(frame)
+        yield frame
+
+def event_stream(frames: AsyncIterator[bytes], on_close: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    return _EventStream(frames, on_close)
@@ -0,0 +1,260 @@
+"""Upstream (OpenAI) calls with per-route timeouts, retries and optional hedging.
+
+`create(client, route, **kwargs)` stands in for `client.chat.completions.create`:
+
+- 429/5xx responses are retried up to `UPSTREAM_RETRIES` times with full-jitter
+  exponential backoff (a Retry-After within the cap is honoured).
+- Streams must deliver their first chunk within `UPSTREAM_FIRST_TOKEN_TIMEOUT_S`
+  of the request; `UPSTREAM_TIMEOUT_S` is the client timeout as before.
+- With `UPSTREAM_HEDGE_QUANTILE` set for a route, a second identical request is
+  started when the first has not answered (the response, or a stream's first
+  chunk) within that quantile of the route's recent latencies, provided an
+  upstream slot is free right away. The first to answer wins; the other is
+  cancelled and its stream closed.
+
+`guard(stream, deadline)` iterates a stream, ending it when upstream goes quiet
+for `STREAM_IDLE_TIMEOUT_S` or the request deadline passes.
+
+Settings are "default,route=value" lists (see `config.route_value`). Routes:
+chat, chat.stream, assistant, assistant.stream, apply.stream, apply.polish,
+session.summary.
+"""
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import random
+import time
+import openai
+from .config import route_value, settings
+from .deadline import Deadline, DeadlineExceeded
+from .limiter import llm_gate
+from .metrics import upstream_hedges, upstream_retries
+
+class FirstTokenTimeout(Exception):
+    pass
+
+class RoutePolicy:
+    __slots__ = ("route", "timeout_s", "first_token_s", "retries", "hedge_quantile")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.timeout_s = float(route_value(settings.upstream_timeout_s, route, float, settings.openai_timeout_s))
+        self.first_token_s = float(route_value(settings.upstream_first_token_timeout_s, route, float, 0.0))
+        self.retries = int(route_value(settings.upstream_retries, route, int, 0))
+        self.hedge_quantile = float(route_value(settings.upstream_hedge_quantile, route, float, 0.0))
+
+_policies: Dict[str, RoutePolicy] = {}
+
+def policy(route: str) -> RoutePolicy:
+    pol = _policies.get(route)
+    if pol is None:
+        pol = _policies[route] = RoutePolicy(route)
+    return pol
+
+class LatencyWindow:
+    """Most recent first-answer latencies of one route."""
+
+    __slots__ = ("samples", "_sorted")
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self._sorted: Optional[List[float]] = None
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """None until there are enough samples to trust."""
+        n = len(self.samples)
+        if n < max(1, settings.upstream_hedge_min_samples):
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        return self._sorted[min(n - 1, int(q * n))]
+
+_windows: Dict[str, LatencyWindow] = {}
+
+def window(route: str) -> LatencyWindow:
+    w = _windows.get(route)
+    if w is None:
+        w = _windows[route] = LatencyWindow(settings.upstream_hedge_window)
+    return w
+
+def hedge_delay(pol: RoutePolicy) -> Optional[float]:
+    if not 0 < pol.hedge_quantile < 1:
+        return None
+    q = window(pol.route).quantile(pol.hedge_quantile)
+    return None if q is None else max(q, settings.upstream_hedge_min_delay_ms / 1000.0)
+
+def _retriable(e: BaseException) -> bool:
+    return isinstance(e, openai.APIStatusError) and (e.status_code == 429 or e.status_code >= 500)
+
+def backoff_s(attempt: int, e: BaseException) -> float:
+    cap = settings.upstream_backoff_max_ms / 1000.0
+    delay = random.uniform(0, min(cap, settings.upstream_backoff_base_ms / 1000.0 * 2 ** attempt))
+    response = getattr(e, "response", None)
+    try:
+        retry_after = float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after is not None and retry_after <= cap:
+        delay = max(delay, retry_after)
+    return delay
+
+_END = object()
+
+class _Primed:
+    """An upstream stream whose first chunk was already read (to time and race it)."""
+
+    __slots__ = ("_stream", "_chunks", "_first")
+
+    def __init__(self, stream: Any, chunks: Any, first: Any):
+        self._stream = stream
+        self._chunks = chunks
+        self._first = first
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        if self._first is not _END:
+            yield self._first
+        async for chunk in self._chunks:
+            yield chunk
+
+    async def close(self) -> None:
+        await self._stream.close()
+
+async def _close(resp: Any) -> None:
+    try:
+        await resp.close()
+    except Exception:
+        pass
+
+async def _open_stream(client: Any, kwargs: Dict[str, Any]) -> _Primed:
+    stream = await client.chat.completions.create(**kwargs)
+    chunks = stream.__aiter__()
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = _END
+    except BaseException:
+        await _close(stream)
+        raise
+    return _Primed(stream, chunks, first)
+
+async def _attempt(client: Any, pol: RoutePolicy, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+    """One request; (response or primed stream, seconds to the first answer)."""
+    t0 = time.perf_counter()
+    if not kwargs.get("stream"):
+        resp = await client.chat.completions.create(**kwargs)
+    elif pol.first_token_s > 0:
+        try:
+            resp = await asyncio.wait_for(_open_stream(client, kwargs), pol.first_token_s)
+        except asyncio.TimeoutError:
+            raise FirstTokenTimeout(f"no upstream token within {pol.first_token_s:g}s")
+    else:
+        resp = await _open_stream(client, kwargs)
+    return resp, time.perf_counter() - t0
+
+async def _race(client: Any, pol: RoutePolicy, kwargs: Dict[str, Any]) -> Any:
+    """The first successful answer of the request and, past the hedge delay, a copy of it."""
+    delay = hedge_delay(pol)
+    tasks = [asyncio.create_task(_attempt(client, pol, kwargs))]
+    pending = set(tasks)
+    winner: Optional[asyncio.Task] = None
+    release: Optional[Callable[[], None]] = None
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                delay = None
+                release = llm_gate.try_acquire()
+                if release is None:
+                    upstream_hedges.labels(pol.route, "no_slot").inc()
+                    continue
+                upstream_hedges.labels(pol.route, "started").inc()
+                hedge = asyncio.create_task(_attempt(client, pol, kwargs))
+                tasks.append(hedge)
+                pending.add(hedge)
+                continue
+            for t in done:
+                if t.exception() is None:
+                    winner = t
+                    break
+                error = t.exception()
+            if winner is not None:
+                resp, seconds = winner.result()
+                window(pol.route).add(seconds)
+                if winner is not tasks[0]:
+                    upstream_hedges.labels(pol.route, "won").inc()
+                return resp
+        raise error  # type: ignore[misc]
+    finally:
+        for t in tasks:
+            if t is winner:
+                continue
+            if not t.done():
+                t.cancel()
+            elif not t.cancelled() and t.exception() is None:
+                await _close(t.result()[0])
+        if release is not None:
+            release()
+
+async def create(client: Any, route: str, deadline: Optional[Deadline] = None, **kwargs: Any) -> Any:
+    """`client.chat.completions.create(**kwargs)` under the route's policy.
+
+    With a `deadline`, the client timeout, the wait for the answer (a stream's
+    first chunk) and retry backoff all stop at it.
+    """
+    pol = policy(route)
+    attempt = 0
+    while True:
+        timeout = pol.timeout_s
+        left = deadline.check() if deadline is not None else None
+        if left is not None and left < timeout:
+            timeout = left
+        try:
+            race = _race(client.with_options(max_retries=0, timeout=timeout), pol, kwargs)
+            if left is None:
+                return await race
+            try:
+                return await asyncio.wait_for(race, left)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded()
+        except Exception as e:
+            if attempt >= pol.retries or not _retriable(e):
+                raise
+            delay = backoff_s(attempt, e)
+            if deadline is not None and delay >= deadline.remaining():
+                raise
+            upstream_retries.labels(route, str(e.status_code)).inc()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+class StreamIdle(Exception):
+    pass
+
+async def guard(stream: Any, deadline: Optional[Deadline] = None) -> AsyncIterator[Any]:
+    """Iterate an upstream stream, raising `StreamIdle` when no chunk arrives within
+    `STREAM_IDLE_TIMEOUT_S` and `DeadlineExceeded` at the deadline."""
+    idle = settings.stream_idle_timeout_s
+    chunks = stream.__aiter__()
+    while True:
+        limit = idle if idle > 0 else None
+        if deadline is not None:
+            left = deadline.check()
+            if limit is None or left < limit:
+                limit = left
+        try:
+            async with asyncio.timeout(limit):
+                chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return
+        except TimeoutError:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded()
+            raise StreamIdle(f"upstream sent nothing for {idle:g}s")
+        yield chunk
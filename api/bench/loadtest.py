@@ -0,0 +1,244 @@
+"""Load-test the API routes at fixed concurrency levels.
+
+    # start the stub and a single-worker API, then drive them
+    python -m bench.loadtest --spawn --routes chat_stream,assistant,assistant_stream,apply --concurrency 1,8,32
+
+    # or point at a running server (pass its pid for CPU/memory numbers)
+    python -m bench.loadtest --base-url http://localhost:8000 --server-pid 1234
+
+Reports RPS, TTFB and latency percentiles, and server CPU ms and RSS per
+request (read from /proc, Linux only). The `bus` route benchmarks
+`ActionBus.execute_plan` in-process, with no server needed.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+import orjson
+
+SUMMARY: Dict[str, Any] = {
+    "title": "Bench Song",
+    "bpm": 120,
+    "timeSig": {"numerator": 4, "denominator": 4},
+    "tracks": [{"id": f"t{i}", "name": f"Track {i}", "gain": 0.0, "mute": False} for i in range(1, 17)],
+    "clips": [{"id": f"c{i}", "trackId": f"t{i % 16 + 1}", "startBeat": i * 4, "lengthBeats": 4} for i in range(200)],
+}
+PLAN: List[Dict[str, Any]] = [
+    {"type": "transport.stop"},
+    {"type": "loop.set", "startBeat": 8, "lengthBeats": 8},
+    {"type": "track.rename", "trackId": "t1", "name": "Lead Vox"},
+    {"type": "track.setGain", "trackId": "t2", "gain": -3},
+    {"type": "clip.move", "clipId": "c3", "startBeat": 16},
+    {"type": "fx.setParam", "target": {"trackId": "t1", "unit": "reverb", "path": "mix"}, "value": 0.25},
+]
+
+def _payload(route: str, i: int) -> Tuple[str, Dict[str, Any], bool]:
+    """(path, json body, is_stream) for request number i."""
+    if route == "chat_stream":
+        return "/v1/chat/stream", {"messages": [{"role": "user", "content": f"Say hi #{i}"}]}, True
+    if route == "assistant":
+        return "/v1/assistant", {"prompt": f"Loop the chorus #{i}", "project_summary": SUMMARY, "no_cache": True}, False
+    if route == "assistant_stream":
+        return "/v1/assistant/stream", {"prompt": f"Loop the chorus #{i}", "project_summary": SUMMARY, "no_cache": True}, True
+    if route == "apply":
+        return "/v1/apply", {"plan": PLAN, "project_summary": SUMMARY, "mode": "apply"}, False
+    raise SystemExit(f"unknown route: {route}")
+
+# --- /proc sampling ---
+
+_TICK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+def _proc_cpu_s(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _TICK
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _proc_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))]
+
+# --- HTTP load ---
+
+async def _one(client: httpx.AsyncClient, route: str, i: int) -> Tuple[float, float, int]:
+    path, body, stream = _payload(route, i)
+    t0 = time.perf_counter()
+    ttfb = 0.0
+    if stream:
+        async with client.stream("POST", path, json=body) as r:
+            async for _ in r.aiter_raw():
+                if not ttfb:
+                    ttfb = time.perf_counter() - t0
+            status = r.status_code
+    else:
+        r = await client.post(path, content=orjson.dumps(body), headers={"content-type": "application/json"})
+        ttfb = time.perf_counter() - t0
+        status = r.status_code
+    return ttfb, time.perf_counter() - t0, status
+
+async def run_level(base_url: str, route: str, concurrency: int, requests: int, pid: Optional[int]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await _one(client, route, -1)  # warm-up
+        counter = iter(range(requests))
+        ttfbs: List[float] = []
+        lats: List[float] = []
+        errors = 0
+        peak_rss = 0.0
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                try:
+                    ttfb, lat, status = await _one(client, route, i)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if status >= 400:
+                    errors += 1
+                ttfbs.append(ttfb)
+                lats.append(lat)
+
+        async def sampler():
+            nonlocal peak_rss
+            while True:
+                peak_rss = max(peak_rss, _proc_rss_mb(pid) or 0.0)
+                await asyncio.sleep(0.05)
+
+        cpu0 = _proc_cpu_s(pid) if pid else None
+        rss0 = _proc_rss_mb(pid) if pid else None
+        sample = asyncio.create_task(sampler()) if pid else None
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+        if sample:
+            sample.cancel()
+        cpu1 = _proc_cpu_s(pid) if pid else None
+
+    row: Dict[str, Any] = {
+        "route": route, "c": concurrency, "n": len(lats), "err": errors,
+        "rps": len(lats) / wall if wall else 0.0,
+        "ttfb_p50_ms": _pct(ttfbs, 50) * 1000, "ttfb_p99_ms": _pct(ttfbs, 99) * 1000,
+        "p50_ms": _pct(lats, 50) * 1000, "p99_ms": _pct(lats, 99) * 1000,
+    }
+    if cpu0 is not None and cpu1 is not None and lats:
+        row["cpu_ms_per_req"] = (cpu1 - cpu0) * 1000 / len(lats)
+    if rss0 is not None:
+        row["rss_mb"] = rss0
+        row["peak_rss_mb"] = peak_rss
+    return row
+
+# --- in-process ActionBus ---
+
+def run_bus(requests: int) -> Dict[str, Any]:
+    from app.daw.action_bus import ActionBus
+    plan = (PLAN * 6)[:32]
+    bus = ActionBus(bpm=120, beat_unit=4)
+    for _ in range(100):
+        bus.execute_plan(plan, "dryRun")
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        bus.execute_plan(plan, "dryRun")
+    dt = time.perf_counter() - t0
+    return {"route": "bus", "c": 1, "n": requests, "err": 0, "rps": requests / dt,
+            "p50_ms": dt / requests * 1000, "actions_per_s": requests * len(plan) / dt}
+
+# --- spawning ---
+
+def _wait_ready(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"not ready: {url}")
+
+def spawn(args: argparse.Namespace) -> Tuple[List[subprocess.Popen], str, int]:
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "bench.stub_openai", "--port", str(args.stub_port),
+         "--latency-ms", str(args.stub_latency_ms), "--tokens-per-s", str(args.stub_tokens_per_s), "--mode", "mixed"],
+        cwd=here,
+    )
+    env = dict(os.environ, OPENAI_API_KEY="stub", OPENAI_BASE_URL=f"http://127.0.0.1:{args.stub_port}/v1")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.api_port), "--log-level", "warning", "--no-access-log"],
+        cwd=here, env=env, stdout=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{args.api_port}"
+    _wait_ready(f"http://127.0.0.1:{args.stub_port}/docs")
+    _wait_ready(base + "/healthz")
+    return [api, stub], base, api.pid
+
+def _print(rows: List[Dict[str, Any]]) -> None:
+    cols = ["route", "c", "n", "err", "rps", "ttfb_p50_ms", "ttfb_p99_ms", "p50_ms", "p99_ms", "cpu_ms_per_req", "peak_rss_mb"]
+    print(" ".join(f"{c:>16}" for c in cols))
+    for r in rows:
+        cells = []
+        for c in cols:
+            v = r.get(c, "")
+            cells.append(f"{v:>16.2f}" if isinstance(v, float) else f"{v!s:>16}")
+        print(" ".join(cells))
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--routes", default="chat_stream,assistant,assistant_stream,apply,bus")
+    ap.add_argument("--concurrency", default="1,8,32")
+    ap.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    ap.add_argument("--server-pid", type=int, default=None)
+    ap.add_argument("--spawn", action="store_true", help="start the OpenAI stub and a single-worker API")
+    ap.add_argument("--api-port", type=int, default=8011)
+    ap.add_argument("--stub-port", type=int, default=8900)
+    ap.add_argument("--stub-latency-ms", type=float, default=50)
+    ap.add_argument("--stub-tokens-per-s", type=float, default=500)
+    ap.add_argument("--json", action="store_true", help="print rows as JSON lines")
+    args = ap.parse_args()
+
+    procs: List[subprocess.Popen] = []
+    base, pid = args.base_url, args.server_pid
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    if args.spawn and any(r != "bus" for r in routes):
+        procs, base, pid = spawn(args)
+    rows: List[Dict[str, Any]] = []
+    try:
+        for route in routes:
+            if route == "bus":
+                rows.append(run_bus(args.requests * 50))
+                continue
+            for c in levels:
+                rows.append(asyncio.run(run_level(base, route, c, args.requests, pid)))
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+    if args.json:
+        for r in rows:
+            print(orjson.dumps(r).decode())
+    else:
+        _print(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Local stand-in for the OpenAI chat completions API (benchmarks and offline dev).
+
+    python -m bench.stub_openai --port 8900 --latency-ms 300 --tokens-per-s 50 --mode mixed
+    OPENAI_BASE_URL=http://localhost:8900/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+
+Supports streaming and non-streaming responses, and `execute_actions` tool
+calls when the request offers tools. With `--mode mixed`, prompts ending in
+"?" get text and everything else gets a plan.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+PLAN = [
+    {"type": "transport.stop"},
+    {"type": "loop.set", "startBeat": 8, "lengthBeats": 8},
+    {"type": "track.rename", "trackId": "t1", "name": "Lead Vox"},
+    {"type": "fx.setParam", "target": {"trackId": "t1", "unit": "reverb", "path": "mix"}, "value": 0.25},
+]
+TEXT = "Sure. Try doubling the chorus vocal, tightening the kick and bass, and adding a short plate reverb on the snare."
+
+class StubConfig:
+    latency_ms: float = 200.0
+    tokens_per_s: float = 100.0
+    mode: str = "mixed"  # text | tool | mixed
+    arg_chunk_chars: int = 12
+
+cfg = StubConfig()
+app = FastAPI(title="OpenAI stub")
+
+def _wants_tool(body: Dict[str, Any]) -> bool:
+    if not body.get("tools") or cfg.mode == "text":
+        return False
+    if cfg.mode == "tool":
+        return True
+    last = next((m for m in reversed(body.get("messages", [])) if m.get("role") == "user"), {})
+    return not str(last.get("content", "")).rstrip().endswith("?")
+
+def _chunks(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Deltas for one completion: text words, or tool-call argument fragments."""
+    if _wants_tool(body):
+        args = orjson.dumps({"plan": PLAN}).decode()
+        step = cfg.arg_chunk_chars
+        out: List[Dict[str, Any]] = []
+        for i in range(0, len(args), step):
+            fn: Dict[str, Any] = {"arguments": args[i:i + step]}
+            tc: Dict[str, Any] = {"index": 0, "function": fn}
+            if i == 0:
+                fn["name"] = "execute_actions"
+                tc.update({"id": "call_" + uuid.uuid4().hex[:12], "type": "function"})
+            out.append({"tool_calls": [tc]})
+        return out
+    words = TEXT.split(" ")
+    return [{"content": w if i == 0 else " " + w} for i, w in enumerate(words)]
+
+def _envelope(model: str, cid: str, obj: str) -> Dict[str, Any]:
+    return {"id": cid, "object": obj, "created": int(time.time()), "model": model}
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = orjson.loads(await request.body())
+    model = body.get("model", "stub")
+    cid = "chatcmpl-" + uuid.uuid4().hex[:16]
+    chunks = _chunks(body)
+    tool = bool(chunks and "tool_calls" in chunks[0])
+    per_token = 1.0 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0.0
+
+    if not body.get("stream"):
+        await asyncio.sleep(cfg.latency_ms / 1000.0 + per_token * len(chunks))
+        if tool:
+            first = chunks[0]["tool_calls"][0]
+            args = "".join(c["tool_calls"][0]["function"]["arguments"] for c in chunks)
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": first["id"], "type": "function",
+                "function": {"name": "execute_actions", "arguments": args},
+            }]}
+        else:
+            message = {"role": "assistant", "content": "".join(c["content"] for c in chunks)}
+        payload = _envelope(model, cid, "chat.completion")
+        payload["choices"] = [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool else "stop"}]
+        payload["usage"] = {"prompt_tokens": 0, "completion_tokens": len(chunks), "total_tokens": len(chunks)}
+        return Response(orjson.dumps(payload), media_type="application/json")
+
+    async def gen():
+        await asyncio.sleep(cfg.latency_ms / 1000.0)
+        head = _envelope(model, cid, "chat.completion.chunk")
+        for i, delta in enumerate(chunks):
+            if i == 0:
+                delta = {"role": "assistant", **delta}
+            yield b"data: " + orjson.dumps({**head, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + b"\n\n"
+            if per_token:
+                await asyncio.sleep(per_token)
+        end = {"index": 0, "delta": {}, "finish_reason": "tool_calls" if tool else "stop"}
+        yield b"data: " + orjson.dumps({**head, "choices": [end]}) + b"\n\n"
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(gen(), media_type="text/event-stream")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency-ms", type=float, default=cfg.latency_ms, help="delay before the first token")
+    ap.add_argument("--tokens-per-s", type=float, default=cfg.tokens_per_s, help="0 = no per-token delay")
+    ap.add_argument("--mode", choices=["text", "tool", "mixed"], default=cfg.mode)
+    a = ap.parse_args()
+    cfg.latency_ms, cfg.tokens_per_s, cfg.mode = a.latency_ms, a.tokens_per_s, a.mode
+    uvicorn.run(app, host=a.host, port=a.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
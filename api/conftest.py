@@ -0,0 +1 @@
+# Lets `pytest` run from api/ import the `app` package.
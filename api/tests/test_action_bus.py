@@ -0,0 +1,61 @@
+from app.daw.action_bus import ActionBus
+from app.daw.state import ProjectStore
+
+
+def _summary():
+    return {
+        "tracks": [{"id": "t1"}],
+        "clips": [{"id": "a", "trackId": "t1", "startBeat": 0, "lengthBeats": 8}],
+    }
+
+
+def _ids(diffs):
+    return [d["value"]["id"] for d in diffs if d["path"] == "/clips/-"]
+
+
+def test_duplicate_twice_in_one_plan_gets_distinct_ids():
+    for state in (_summary(), None):
+        bus = ActionBus(state=state)
+        results, diffs = bus.execute_plan(
+            [{"type": "clip.duplicate", "clipId": "a"}, {"type": "clip.duplicate", "clipId": "a"}], "apply"
+        )
+        assert [r["meta"]["clipId"] for r in results] == ["a_dup", "a_dup_2"]
+        assert _ids(diffs) == ["a_dup", "a_dup_2"]
+
+
+def test_duplicate_again_after_apply_skips_existing_id():
+    store = ProjectStore()
+    store.put("p", _summary())
+    for expected in ("a_dup", "a_dup_2", "a_dup_3"):
+        doc = store.get("p")[0]
+        bus = ActionBus(state=doc, timeline=store.timeline("p"))
+        results, diffs = bus.execute_plan([{"type": "clip.duplicate", "clipId": "a"}], "apply")
+        assert results[0]["meta"]["clipId"] == expected
+        store.apply("p", diffs)
+
+
+def test_split_twice_gets_distinct_ids():
+    store = ProjectStore()
+    store.put("p", _summary())
+    bus = ActionBus(state=store.get("p")[0], timeline=store.timeline("p"))
+    results, diffs = bus.execute_plan(
+        [{"type": "clip.splitAtBeat", "clipId": "a", "beat": 6}, {"type": "clip.splitAtBeat", "clipId": "a", "beat": 2}],
+        "apply",
+    )
+    assert all(r["ok"] for r in results)
+    assert _ids(diffs) == ["a_r", "a_r_2"]
+    store.apply("p", diffs)
+    bus = ActionBus(state=store.get("p")[0], timeline=store.timeline("p"))
+    results, diffs = bus.execute_plan([{"type": "clip.splitAtBeat", "clipId": "a", "beat": 1}], "apply")
+    assert _ids(diffs) == ["a_r_3"]
+
+
+def test_add_audio_twice_gets_distinct_stable_ids():
+    plan = [
+        {"type": "clip.addAudio", "trackId": "t1", "path": "/samples/Kick 01.wav", "startBeat": 0},
+        {"type": "clip.addAudio", "trackId": "t1", "path": "/samples/Kick 01.wav", "startBeat": 8},
+    ]
+    for state in (_summary(), None):
+        results, diffs = ActionBus(state=state).execute_plan(plan, "apply")
+        assert [r["meta"]["clipId"] for r in results] == ["c_kick_01", "c_kick_01_2"]
+        assert _ids(diffs) == ["c_kick_01", "c_kick_01_2"]
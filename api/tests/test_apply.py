@@ -0,0 +1,80 @@
+from fastapi.testclient import TestClient
+
+import app.routers.assistant as assistant
+from app.daw.action_bus import ActionBus
+from app.daw.state import project_store
+from app.main import app
+
+SUMMARY = {"bpm": 120, "tracks": [{"id": "t1", "name": "Bass"}, {"id": "t2", "name": "Drums"}]}
+
+
+def test_apply_with_failing_first_action_applies_nothing():
+    client = TestClient(app)
+    r = client.post("/v1/apply", json={
+        "plan": [{"type": "nope"}, {"type": "track.rename", "trackId": "t1", "name": "Sub"}],
+        "project_summary": SUMMARY, "polish": False, "applyId": "failed-apply",
+    })
+    body = r.json()
+    assert body["type"] == "error"
+    assert body["error"] == "unsupported: nope"
+    assert body["preview"]["mods"] == []
+    assert assistant.undo_log.get("failed-apply") is None
+    assert client.post("/v1/apply/failed-apply/undo").status_code == 404
+
+
+def test_apply_with_failing_first_action_keeps_stored_version():
+    client = TestClient(app)
+    version = project_store.put("p-failed", {**SUMMARY, "tracks": list(SUMMARY["tracks"])})
+    r = client.post("/v1/apply", json={
+        "plan": [{"type": "nope"}], "project_id": "p-failed", "version": version, "polish": False,
+    })
+    assert r.json()["type"] == "error"
+    assert r.json()["version"] == version
+    assert project_store.get("p-failed")[1] == version
+
+
+def test_local_intent_is_dry_run_once(monkeypatch):
+    runs = []
+    execute_plan = ActionBus.execute_plan
+
+    def counted(self, plan, mode="apply", deadline=None):
+        runs.append(mode)
+        return execute_plan(self, plan, mode, deadline)
+
+    monkeypatch.setattr(ActionBus, "execute_plan", counted)
+    client = TestClient(app)
+    r = client.post("/v1/assistant", json={"prompt": "mute drums", "project_summary": SUMMARY})
+    assert r.json()["type"] == "plan"
+    assert r.json()["preview"]["mods"]
+    assert runs == []
+    r = client.post("/v1/assistant", json={"prompt": "mute drums", "project_summary": SUMMARY, "mode": "apply"})
+    assert r.json()["type"] == "applied"
+    assert runs == ["apply"]
+
+
+def test_apply_stream_does_not_polish_by_default(monkeypatch):
+    def no_client():
+        raise AssertionError("no LLM call expected")
+
+    monkeypatch.setattr(assistant, "get_client", no_client)
+    monkeypatch.setattr(assistant.settings, "apply_polish", False)
+    client = TestClient(app)
+    plan = [{"type": "track.rename", "trackId": "t1", "name": "Sub"}]
+    with client.stream("POST", "/v1/apply/stream", json={"plan": plan, "project_summary": SUMMARY}) as r:
+        body = "".join(r.iter_text())
+    assert '"type":"applied"' in body
+    assert body.rstrip().endswith('data: {"done":true}')
+
+
+def test_assistant_stream_local_intent_needs_no_client(monkeypatch):
+    def no_client():
+        raise RuntimeError("no OpenAI client configured")
+
+    monkeypatch.setattr(assistant, "get_client", no_client)
+    client = TestClient(app)
+    with client.stream("POST", "/v1/assistant/stream", json={"prompt": "mute drums", "project_summary": SUMMARY}) as r:
+        body = "".join(r.iter_text())
+    assert '"type":"plan"' in body
+    with client.stream("POST", "/v1/assistant/stream", json={"prompt": "write a song", "project_summary": SUMMARY}) as r:
+        body = "".join(r.iter_text())
+    assert "no OpenAI client configured" in body
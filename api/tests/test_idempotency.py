@@ -0,0 +1,33 @@
+import asyncio
+
+from app.idempotency import IdempotencyStore
+
+
+async def _collect(frames):
+    return [f async for f in frames]
+
+
+def test_stream_never_started_releases_key():
+    async def main():
+        store = IdempotencyStore()
+        runs = []
+
+        async def gen():
+            runs.append(1)
+            yield b"data: 1\n\n"
+
+        frames, on_close = store.stream("k", b"fp", gen)
+        follower = store.lookup("k", b"fp")
+        waiting = asyncio.ensure_future(_collect(follower.follow()))
+        on_close()  # client gone before the first frame
+        followed = await asyncio.wait_for(waiting, 1)
+        assert b"retry" in followed[0]
+        assert store.lookup("k", b"fp") is None
+
+        frames, on_close = store.stream("k", b"fp", gen)
+        assert await _collect(frames) == [b"data: 1\n\n"]
+        on_close()
+        assert runs == [1]
+        assert await asyncio.wait_for(_collect(store.lookup("k", b"fp").follow()), 1) == [b"data: 1\n\n"]
+
+    asyncio.run(main())
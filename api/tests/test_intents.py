@@ -0,0 +1,31 @@
+import pytest
+
+from app.daw.intents import match_intent
+
+SUMMARY = {"tracks": [{"id": "t_drums", "name": "Drums"}, {"id": "t_bass", "name": "Bass", "mute": True}]}
+
+
+def _gain(prompt):
+    hit = match_intent(prompt, SUMMARY)
+    return None if hit is None else hit[1]["plan"][0]["gain"]
+
+
+@pytest.mark.parametrize("prompt, gain", [
+    ("set gain of drums to -3 dB", -3.0),
+    ("drums volume -6db", -6.0),
+    ("set drums volume to 6", 6.0),
+    ("set the volume of drums to -80 dB", -80.0),
+])
+def test_gain_in_decibels(prompt, gain):
+    assert _gain(prompt) == gain
+
+
+@pytest.mark.parametrize("prompt", ["set drums volume to 80", "drums volume 100", "set gain of drums to 40 dB"])
+def test_implausible_gain_goes_to_the_model(prompt):
+    assert match_intent(prompt, SUMMARY) is None
+
+
+def test_simple_commands():
+    assert match_intent("play", SUMMARY)[1] == {"type": "plan", "plan": [{"type": "transport.play"}]}
+    assert match_intent("mute bass", SUMMARY)[1]["type"] == "text"
+    assert match_intent("make it groovy", SUMMARY) is None
@@ -0,0 +1,30 @@
+import logging
+
+from app.journal import Journal
+
+
+def test_write_failure_is_logged(tmp_path, monkeypatch, caplog):
+    journal = Journal(str(tmp_path), fsync_interval_s=0)
+
+    def fail(batch):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(journal, "_commit", fail)
+    journal.start()
+    with caplog.at_level(logging.ERROR, logger="app.journal"):
+        assert journal.append({"type": "apply"})
+        journal.stop()
+    assert any(r.levelno == logging.ERROR and "disk full" in r.getMessage() for r in caplog.records)
+
+
+def test_writer_thread_metrics_render(tmp_path):
+    from app.journal import journal_records
+    from app.metrics import render_prometheus
+
+    journal = Journal(str(tmp_path), fsync_interval_s=0, fsync=False)
+    journal.start()
+    for i in range(200):
+        journal.append({"type": f"t{i}"})
+        render_prometheus()
+    journal.stop()
+    assert sum(c.value for _, c in journal_records._items()) >= 200
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.deadline import DeadlineExceeded
+from app.limiter import AdmissionController, Overloaded
+
+
+def test_wait_ended_by_deadline_raises_deadline_exceeded():
+    async def main():
+        gate = AdmissionController(max_inflight=1, max_queue=4, queue_timeout_s=5)
+        release = await gate.acquire()
+        with pytest.raises(DeadlineExceeded):
+            await gate.acquire("u", timeout_s=0.05)
+        assert gate.queued == 0
+        release()
+        assert gate.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_wait_ended_by_queue_timeout_raises_overloaded():
+    async def main():
+        gate = AdmissionController(max_inflight=1, max_queue=4, queue_timeout_s=0.05)
+        release = await gate.acquire()
+        with pytest.raises(Overloaded):
+            await gate.acquire("u", timeout_s=5)
+        with pytest.raises(Overloaded):
+            await gate.acquire("u")
+        release()
+
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+import threading
+
+from app.metrics import Counter, REGISTRY, render_prometheus
+
+
+def test_labels_created_from_threads_while_rendering():
+    counter = Counter("test_thread_labels_total", "test", ("n",), shared=True)
+    try:
+        stop = threading.Event()
+
+        def writer(offset):
+            for i in range(5000):
+                counter.labels(str(offset + i)).inc()
+            stop.set()
+
+        threads = [threading.Thread(target=writer, args=(k * 100000,)) for k in range(2)]
+        for t in threads:
+            t.start()
+        while not stop.is_set():
+            render_prometheus()
+        for t in threads:
+            t.join()
+        assert len(counter._items()) == 10000
+    finally:
+        REGISTRY.remove(counter)
+
+
+def test_shared_counter_keeps_every_increment():
+    counter = Counter("test_shared_total", "test", shared=True)
+    try:
+        threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(20000)]) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert counter.labels().value == 80000
+    finally:
+        REGISTRY.remove(counter)
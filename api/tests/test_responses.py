@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.responses import CompressionMiddleware
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_size=100, preference=("gzip",))
+
+    @app.get("/big")
+    def big():
+        return PlainTextResponse("x" * 1000)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("x", headers={"Vary": "Origin"})
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: 1\n\n"]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_vary_on_compressed_and_uncompressed_responses():
+    client = _client()
+    r = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    r = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+    r = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_no_vary_on_event_streams():
+    r = _client().get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "vary" not in r.headers
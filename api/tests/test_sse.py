@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from app.sse import DeltaCoalescer, sse_delta
+
+
+def test_buffered_delta_is_released_while_upstream_stalls():
+    async def upstream():
+        yield "Hel"
+        yield "lo"
+        await asyncio.sleep(0.3)
+        yield " world"
+
+    async def main():
+        deltas = DeltaCoalescer(window_s=0.05)
+        t0 = time.monotonic()
+        frames = []
+        async for chunk in deltas.paced(upstream()):
+            frame = deltas.flush() if chunk is None else deltas.push(chunk)
+            if frame:
+                frames.append((frame, time.monotonic() - t0))
+        frame = deltas.flush()
+        if frame:
+            frames.append((frame, time.monotonic() - t0))
+        return frames
+
+    frames = asyncio.run(main())
+    assert [f for f, _ in frames] == [sse_delta("Hello"), sse_delta(" world")]
+    assert frames[0][1] < 0.2
+
+
+def test_paced_passes_chunks_through_without_window():
+    async def upstream():
+        for text in ("a", "b"):
+            yield text
+
+    async def main():
+        deltas = DeltaCoalescer(window_s=0)
+        return [deltas.push(c) async for c in deltas.paced(upstream())]
+
+    assert asyncio.run(main()) == [sse_delta("a"), sse_delta("b")]
@@ -0,0 +1,77 @@
+import copy
+
+from app.daw.state import apply_patch, invert_patch, resolve, ProjectStore
+
+CLIP = {"id": "c1", "trackId": "t1", "startBeat": 0}
+
+
+def test_append_creates_missing_list():
+    doc = apply_patch({}, [{"op": "add", "path": "/clips/-", "value": CLIP}])
+    assert doc == {"clips": [CLIP]}
+    doc = apply_patch({}, [{"op": "add", "path": "/tracks/0", "value": {"id": "t1"}}])
+    assert doc == {"tracks": [{"id": "t1"}]}
+
+
+def test_missing_object_parent_is_still_an_object():
+    doc = apply_patch({}, [{"op": "add", "path": "/meta/tempo", "value": 90}])
+    assert doc == {"meta": {"tempo": 90}}
+
+
+def test_append_into_missing_list_undo_stored():
+    store = ProjectStore()
+    store.put("p", {"name": "x"})
+    diffs = [{"op": "add", "path": "/clips/-", "value": CLIP}, {"op": "add", "path": "/clips/-", "value": dict(CLIP, id="c2")}]
+    undo = []
+    store.apply("p", diffs, undo=undo)
+    doc, _ = store.get("p")
+    assert [c["id"] for c in doc["clips"]] == ["c1", "c2"]
+    store.apply("p", undo)
+    assert store.get("p")[0] == {"name": "x"}
+
+
+def test_append_into_missing_list_undo_stateless():
+    summary = {"name": "x"}
+    diffs = [{"op": "add", "path": "/tracks/-", "value": {"id": "t1"}}]
+    inverse = invert_patch(summary, diffs)
+    assert summary == {"name": "x"}
+    doc = apply_patch(copy.deepcopy(summary), diffs)
+    assert resolve(doc, "/tracks/t1") == {"id": "t1"}
+    assert apply_patch(doc, inverse) == summary
+
+
+def test_size_does_not_grow_with_add_remove_churn():
+    store = ProjectStore()
+    store.put("p", {"clips": [dict(CLIP)]})
+    before = store.total_bytes
+    for _ in range(100):
+        store.apply("p", [{"op": "add", "path": "/clips/-", "value": dict(CLIP, id="c2")}])
+        store.apply("p", [{"op": "remove", "path": "/clips/c2"}])
+    assert store.total_bytes == before
+    store.apply("p", [{"op": "replace", "path": "/clips/c1/startBeat", "value": 12345}])
+    assert store.total_bytes == before + 4
+
+
+def test_undo_names_list_elements_by_id():
+    summary = {"tracks": [{"id": "t1", "gain": 0}, {"id": "t2", "gain": 0}, {"gain": 1}]}
+    inverse = invert_patch(summary, [
+        {"op": "replace", "path": "/tracks/t2/gain", "value": -6},
+        {"op": "add", "path": "/tracks/-", "value": {"id": "t3"}},
+        {"op": "replace", "path": "/tracks/2/gain", "value": 2},
+    ])
+    assert [u["path"] for u in inverse] == ["/tracks/2/gain", "/tracks/t3", "/tracks/t2/gain"]
+
+
+def test_undo_still_hits_its_element_after_reorder():
+    store = ProjectStore()
+    store.put("p", {"clips": [dict(CLIP), dict(CLIP, id="c2", startBeat=8)]})
+    timeline = store.timeline("p")
+    undo = []
+    store.apply("p", [{"op": "replace", "path": "/clips/c2/startBeat", "value": 16}], undo=undo)
+    # Another apply moves c2 to the front of the list
+    store.apply("p", [{"op": "remove", "path": "/clips/c2"}, {"op": "add", "path": "/clips/0", "value": dict(CLIP, id="c2", startBeat=16)}])
+    store.apply("p", undo)
+    doc = store.get("p")[0]
+    assert resolve(doc, "/clips/c2/startBeat") == 8
+    assert resolve(doc, "/clips/c1/startBeat") == 0
+    assert store.timeline("p") is timeline
+    assert timeline.span("c2") == ("t1", 8.0, 8.0)
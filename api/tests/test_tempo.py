@@ -0,0 +1,27 @@
+import pytest
+
+from app.daw.tempo import TempoMap
+
+
+def test_conversions_follow_tempo_changes():
+    tempo = TempoMap([(0, 120), (8, 60)])
+    assert tempo.seconds(8) == pytest.approx(4.0)
+    assert tempo.seconds(10) == pytest.approx(6.0)
+    assert tempo.beats_at(6.0) == pytest.approx(10.0)
+    assert tempo.seconds_many([0, 8, 10]) == pytest.approx([0.0, 4.0, 6.0])
+    assert tempo.beats_many([0.0, 4.0, 6.0]) == pytest.approx([0.0, 8.0, 10.0])
+
+
+@pytest.mark.parametrize("bad", [None, "fast", 0, -90, True, float("nan"), float("inf")])
+def test_invalid_tempo_events_are_skipped(bad):
+    tempo = TempoMap.from_summary({"tempoMap": [{"beat": 0, "bpm": 100}, {"beat": 4, "bpm": bad}]})
+    assert tempo.bpms == [100.0]
+    tempo = TempoMap.from_summary({"tempoMap": [{"beat": 0, "bpm": bad}], "bpm": 90})
+    assert tempo.bpms == [90.0]
+
+
+def test_invalid_fallback_tempo_uses_default():
+    assert TempoMap.from_summary({"project": {"tempo": None}, "bpm": "x"}).bpms == [120.0]
+    assert TempoMap.from_summary({"bpm": -1}).bpms == [120.0]
+    assert TempoMap.constant(0).bpms == [120.0]
+    assert TempoMap.from_summary({"timeSig": {"denominator": 0}}).beat_unit == 4
@@ -0,0 +1,35 @@
+from app.daw.action_bus import ActionBus
+from app.daw.timeline import Timeline, TimelineView
+
+CLIPS = [
+    {"id": "a", "trackId": "t1", "startBeat": 0, "lengthBeats": 4},
+    {"id": "b", "trackId": "t1", "startBeat": 4, "lengthBeats": 4},
+    {"id": "p", "trackId": "t1", "startBeat": 10},
+]
+
+
+def test_overlapping_half_open_range():
+    tl = Timeline.from_clips(CLIPS)
+    assert sorted(tl.overlapping("t1", 2, 6)) == ["a", "b"]
+    assert tl.overlapping("t1", 4, 8) == ["b"]
+    assert tl.overlapping("t1", 8, 10) == []
+
+
+def test_point_query_at_clip_start():
+    tl = Timeline.from_clips(CLIPS)
+    assert tl.overlapping("t1", 4, 4) == ["b"]
+    assert tl.overlapping("t1", 0, 0) == ["a"]
+    assert tl.overlapping("t1", 2, 2) == ["a"]
+    assert tl.overlapping("t1", 10, 10) == ["p"]
+    view = TimelineView(tl)
+    view.apply([{"op": "add", "path": "/clips/-", "value": {"id": "c", "trackId": "t1", "startBeat": 12, "lengthBeats": 2}}])
+    assert view.overlapping("t1", 12, 12) == ["c"]
+    assert view.overlapping("t1", 4, 4, exclude="b") == []
+
+
+def test_add_audio_at_clip_start_reports_overlap():
+    summary = {"tracks": [{"id": "t1"}], "clips": [dict(c) for c in CLIPS]}
+    bus = ActionBus(state=summary)
+    results, _ = bus.execute_plan([{"type": "clip.addAudio", "trackId": "t1", "path": "x.wav", "startBeat": 4}], "dryRun")
+    assert results[0]["ok"]
+    assert results[0]["meta"]["overlaps"] == ["b"]